@@ -2,16 +2,13 @@ import os
 from flask import Flask
 from flask_restx import Api
 from flask_sqlalchemy import SQLAlchemy
-from dotenv import load_dotenv
-from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager
 from flask_caching import Cache
 from flask_cors import CORS
-
-load_dotenv()
+from utils.db_routing import RoutingSession
 
 # Initialize components
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 api = Api(
     prefix="/api/v1",
     title="Tiberbu Healthcare Interview Challenge",
@@ -19,17 +16,19 @@ api = Api(
     description="API for managing healthcare data",
     doc="/api/v1/docs",
 )
-migrate = Migrate()
 jwt = JWTManager()
 cache = Cache()
 
 
-def create_app():
+def create_app(test_config=None):
     """
     Create and configure the Flask application.
     This function initializes the Flask app, configures extensions such as
     SQLAlchemy, Flask-Migrate, JWTManager, and Flask-Caching, and registers
     API namespaces for patients, doctors, and appointments.
+    Args:
+        test_config (dict, optional): Settings applied on top of the
+            environment configuration, used by the test suite.
     Returns:
         Flask: The configured Flask application instance.
     """
@@ -60,12 +59,84 @@ def create_app():
     app.config['CACHE_REDIS_DB'] = 0
     app.config['CACHE_DEFAULT_TIMEOUT'] = 300
 
+    if test_config:
+        app.config.update(test_config)
+
+    # Connection pool sizing and timeouts, explicit engine options win
+    from utils.db_pool import engine_options, configure_pools, pool_metrics
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        **engine_options(app.config),
+        **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}),
+    }
+
+    # Read replicas are extra binds, see utils.db_routing
+    from utils.db_routing import replica_binds, db_router
+    app.config['SQLALCHEMY_BINDS'] = {
+        **replica_binds(app.config),
+        **app.config.get('SQLALCHEMY_BINDS', {}),
+    }
+
     # Initialize components
     db.init_app(app)
-    migrate.init_app(app, db)
+    configure_pools(app)
     jwt.init_app(app)
     cache.init_app(app)
-    api.init_app(app)
+    # Without docs neither the Swagger UI nor swagger.json are served
+    api.init_app(app, add_specs=app.config['API_DOCS_ENABLED'])
+    db_router.init_app(app, cache)
+
+    # Prometheus metrics of requests, SQL statements, caches, the outbox and
+    # the connection pools.
+    # Registered first so its timing wraps every other request hook.
+    from utils.metrics import metrics
+    from app.doctors.cache import cache_metrics
+    from app.notifications.outbox import outbox_metrics
+    metrics.init_app(app)
+    metrics.register_collector(cache_metrics, per_process=True)
+    metrics.register_collector(outbox_metrics)
+    metrics.register_collector(pool_metrics, per_process=True)
+
+    # Outbound emails are queued in the outbox and delivered in the background
+    from app.notifications.outbox import email_dispatcher
+    from app.notifications.cli import mail_cli
+    email_dispatcher.init_app(app)
+    app.cli.add_command(mail_cli)
+
+    # Flask-Migrate imports alembic, which only the flask db commands need
+    from utils.cli import LazyGroup
+
+    def load_migrate_cli():
+        from flask_migrate import Migrate
+        from flask_migrate.cli import db as db_cli
+        Migrate(app, db)
+        return db_cli
+
+    app.cli.add_command(LazyGroup("db", load_migrate_cli, help="Perform database migrations."))
+
+    # Password hashing runs in a pool of worker processes
+    from app.auth.passwords import password_hasher
+    password_hasher.init_app(app)
+
+    # Bulk patient and doctor imports
+    from app.onboarding.cli import users_cli
+    app.cli.add_command(users_cli)
+
+    # Content-addressed storage for profile images
+    from app.images.service import blob_store, require_pillow
+    require_pillow()
+    blob_store.init_app(app)
+
+    # API responses are rendered with orjson when it is installed
+    from utils.serializers import output_json
+    api.representation("application/json")(output_json)
+
+    # ETags, conditional GET and compression of API responses
+    from utils.http import response_layer
+    response_layer.init_app(app)
+
+    # In-process cache tier for doctor read models
+    from app.doctors.cache import configure_doctor_caches
+    configure_doctor_caches(app)
 
     # Register API namespaces
     from app.patients.routes import patient_namespace
@@ -77,4 +148,37 @@ def create_app():
     from app.appointments.routes import appointment_namespace
     api.add_namespace(appointment_namespace, path="/appointments")
 
-    return app
\ No newline at end of file
+    from app.images.routes import image_namespace
+    api.add_namespace(image_namespace, path="/images")
+
+    from app.onboarding.routes import onboarding_namespace
+    api.add_namespace(onboarding_namespace, path="/onboarding")
+
+    from app.admin.routes import admin_namespace
+    api.add_namespace(admin_namespace, path="/admin")
+
+    # Started last, its thread must not configure the mappers before every
+    # model module is imported
+    if app.config['MAIL_DISPATCHER_AUTOSTART'] and not app.testing:
+        email_dispatcher.start()
+
+    return app
+
+
+def create_asgi_app(test_config=None):
+    """
+    Create the application wrapped for ASGI servers such as uvicorn.
+
+    Each worker runs up to ASGI_THREADS requests at once on a thread pool,
+    and async views (see utils.aio) await their blocking calls
+    concurrently. Needs asgiref.
+    Args:
+        test_config (dict, optional): Passed on to create_app.
+    Returns:
+        ThreadedWsgiToAsgi: The ASGI application.
+    """
+    from utils.asgi import ThreadedWsgiToAsgi
+    from app.notifications.outbox import email_dispatcher
+
+    app = create_app(test_config)
+    return ThreadedWsgiToAsgi(app, app.config['ASGI_THREADS'], on_shutdown=[email_dispatcher.stop])
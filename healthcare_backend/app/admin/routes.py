@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+from flask import current_app
+from flask_restx import Namespace, Resource
+from app import db
+from app.auth.identity import admin_required
+from utils.db_pool import pool_status
+
+admin_namespace = Namespace("admin", description="Operational endpoints")
+
+POOL_SETTINGS = (
+    "DATABASE_POOL_SIZE",
+    "DATABASE_POOL_MAX_OVERFLOW",
+    "DATABASE_POOL_TIMEOUT",
+    "DATABASE_POOL_PRE_PING",
+    "DATABASE_POOL_RECYCLE",
+    "DATABASE_POOL_SLOW_CHECKOUT_MS",
+    "DATABASE_STATEMENT_TIMEOUT",
+)
+
+
+@admin_namespace.route("/pool")
+class PoolStatus(Resource):
+    @admin_required
+    @admin_namespace.response(200, "Pool status of this worker process")
+    @admin_namespace.response(403, "Unauthorized, admin only")
+    def get(self):
+        """
+        Show the database connection pools of the worker serving the request (Admin only).
+
+        Occupancy is current; checkout counts, waits, timeouts and overflow
+        checkouts are totals since the process started.
+        """
+        return {
+            "status": "success",
+            "data": {
+                "pools": pool_status(db.engines),
+                "settings": {name: current_app.config[name] for name in POOL_SETTINGS},
+            },
+        }, 200
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+import csv
+import io
+import json
+from sqlalchemy import select
+from app import db
+from app.appointments.models import Appointment
+
+EXPORT_FIELDS = ["appointmentId", "patientId", "doctorId", "date", "time", "status"]
+
+_columns = (
+    Appointment.appointment_id,
+    Appointment.patient_id,
+    Appointment.doctor_id,
+    Appointment.date,
+    Appointment.time,
+    Appointment.status,
+)
+
+
+def iter_appointment_rows(*criteria, batch_size=1000):
+    """
+    Yield appointments matching the criteria as plain tuples.
+
+    Rows are fetched through a server-side cursor in batches of batch_size,
+    and no ORM objects are built, so memory use does not grow with the
+    number of rows exported.
+    """
+    statement = (
+        select(*_columns)
+        .where(*criteria)
+        .order_by(Appointment.date, Appointment.time, Appointment.appointment_id)
+        .execution_options(yield_per=batch_size)
+    )
+    for appointment_id, patient_id, doctor_id, date, time, status in db.session.execute(statement):
+        yield (
+            str(appointment_id),
+            str(patient_id),
+            str(doctor_id),
+            date.strftime("%Y-%m-%d"),
+            time.strftime("%H:%M"),
+            status,
+        )
+
+
+def ndjson_lines(rows, chunk_rows=500):
+    """Render rows as newline delimited JSON objects, chunk_rows per chunk."""
+    chunk = []
+    for row in rows:
+        chunk.append(json.dumps(dict(zip(EXPORT_FIELDS, row))))
+        if len(chunk) == chunk_rows:
+            yield "\n".join(chunk) + "\n"
+            chunk = []
+    if chunk:
+        yield "\n".join(chunk) + "\n"
+
+
+def csv_lines(rows, chunk_rows=500):
+    """Render rows as CSV with a header line, chunk_rows per chunk."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if count % chunk_rows == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
@@ -1,9 +1,9 @@
 # -*- coding: utf-8 -*-
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Date, Time
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Date, Time, UniqueConstraint, Index
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, load_only
 from app import db
 
 
@@ -11,6 +11,13 @@ class Appointment(db.Model):
     """
     Represents an appointment in the healthcare system.
     """
+    __table_args__ = (
+        # A doctor can only hold one appointment per slot; see reservations.py.
+        # Its index also serves every doctor_id and (doctor_id, date) lookup.
+        UniqueConstraint('doctor_id', 'date', 'time', name='uq_appointment_doctor_slot'),
+        Index('ix_appointment_patient_id_date_time', 'patient_id', 'date', 'time'),
+    )
+
     appointment_id = Column(UUID, primary_key=True, default=uuid.uuid4, unique=True)
     patient_id = Column(UUID, ForeignKey('patients.patient_id'), nullable=False)
     doctor_id = Column(UUID, ForeignKey('doctors.doctor_id'), nullable=True)
@@ -22,5 +29,10 @@ class Appointment(db.Model):
     doctor = relationship("Doctor", back_populates="appointments")
     patient = relationship("Patient", back_populates="appointments")
 
+    @classmethod
+    def load_listing(cls):
+        """Query option loading only the columns appointment listings show."""
+        return load_only(cls.appointment_id, cls.patient_id, cls.doctor_id, cls.date, cls.time, cls.status)
+
     def __repr__(self):
         return f"<Appointment {self.appointment_id}>"
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+import uuid
+from sqlalchemy import update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.appointments.models import Appointment
+from app.doctors.cache import mark_slots_stale
+
+_dialect_inserts = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+class SlotUnavailable(Exception):
+    """Raised when a doctor's slot is already taken by another appointment."""
+
+
+def _as_uuid(value):
+    return value if isinstance(value, uuid.UUID) else uuid.UUID(str(value))
+
+
+def reserve_slot(patient_id, doctor_id, date, time, status="booked"):
+    """
+    Book a doctor's slot with a single INSERT ... ON CONFLICT DO NOTHING.
+
+    The uq_appointment_doctor_slot constraint on (doctor_id, date, time) is
+    what guarantees a slot is only handed out once: concurrent callers wait
+    on the database and exactly one of them gets a row back.
+
+    Args:
+        patient_id: The booking patient's ID.
+        doctor_id: The doctor's ID, as a UUID or string.
+        date (datetime.date): The appointment date.
+        time (datetime.time): The appointment time.
+        status (str): The initial appointment status.
+
+    Returns:
+        Appointment: The newly created appointment.
+
+    Raises:
+        ValueError: If doctor_id is not a valid UUID.
+        SlotUnavailable: If the slot is already booked.
+    """
+    dialect = db.session.get_bind().dialect.name
+    insert = _dialect_inserts[dialect]
+
+    statement = (
+        insert(Appointment)
+        .values(
+            appointment_id=uuid.uuid4(),
+            patient_id=_as_uuid(patient_id),
+            doctor_id=_as_uuid(doctor_id),
+            date=date,
+            time=time,
+            status=status,
+        )
+        .on_conflict_do_nothing(index_elements=["doctor_id", "date", "time"])
+        .returning(Appointment)
+    )
+    appointment = db.session.scalars(statement).first()
+
+    if appointment is None:
+        raise SlotUnavailable()
+    mark_slots_stale(db.session, appointment.doctor_id)
+    return appointment
+
+
+def move_slot(appointment, date, time):
+    """
+    Move an appointment to a new slot with a single guarded UPDATE.
+
+    Raises:
+        SlotUnavailable: If the doctor already has an appointment in the new slot.
+    """
+    try:
+        with db.session.begin_nested():
+            db.session.execute(
+                update(Appointment)
+                .where(Appointment.appointment_id == appointment.appointment_id)
+                .values(date=date, time=time)
+            )
+    except IntegrityError:
+        raise SlotUnavailable()
+
+    # The ORM-enabled UPDATE synchronises the in-session appointment for us.
+    mark_slots_stale(db.session, appointment.doctor_id)
+    return appointment
@@ -1,14 +1,17 @@
 from flask_restx import Namespace, Resource
-from flask import request, jsonify
-from flask_jwt_extended import get_jwt_identity, jwt_required
-import jwt
+from flask import request, jsonify, current_app, Response, stream_with_context
+from flask_jwt_extended import jwt_required
+import uuid
+from sqlalchemy import tuple_
 from app.appointments.models import Appointment
 from app import db
 from datetime import datetime
-from utils.mail import send_email
-from config import Config
-from app.patients.models import Patient
-from app.doctors.models import Doctor
+from app.notifications.outbox import queue_email, email_dispatcher
+from app.appointments.reservations import reserve_slot, move_slot, SlotUnavailable
+from app.appointments.export import iter_appointment_rows, ndjson_lines, csv_lines
+from utils.pagination import encode_cursor, decode_cursor, parse_limit
+from app.appointments.serializers import appointment_serializer
+from app.auth.identity import current_patient, current_doctor
 from app.appointments.schemas import (
     appointment_model,
     book_appointment_model,
@@ -31,54 +34,134 @@ appointment_namespace.add_model("AppointmentsList", appointments_list_model)
 @appointment_namespace.route("/")
 class AppointmentsResource(Resource):
     @jwt_required()
+    @appointment_namespace.doc(params={
+        "limit": "Maximum number of appointments to return",
+        "cursor": "The next_cursor value from the previous page",
+        "date_from": "Only appointments on or after this date (YYYY-MM-DD)",
+        "date_to": "Only appointments on or before this date (YYYY-MM-DD)",
+        "status": "Only appointments with this status",
+    })
     @appointment_namespace.response(200, "Success", appointments_list_model)
+    @appointment_namespace.response(400, "Invalid input", error_response_model)
     def get(self):
         """
-        Get all appointments related to the logged-in user.
+        Get a page of appointments related to the logged-in user, ordered by date and time.
         """
-        current_user_id = get_jwt_identity()
-        user = Patient.query.filter_by(patient_id=current_user_id).first() or Doctor.query.filter_by(doctor_id=current_user_id).first()
-
-        if not user:
-            return {"status": "error", "message": "User not found"}, 404
+        patient, doctor = current_patient(), current_doctor()
 
-        user_role = "patient" if isinstance(user, Patient) else "doctor"
-        user_id = user.patient_id if isinstance(user, Patient) else user.doctor_id
-
-        if user_role == "doctor":
-            appointments = Appointment.query.filter_by(doctor_id=user_id).all()
-        elif user_role == "patient":
-            appointments = Appointment.query.filter_by(patient_id=user_id).all()
+        if doctor:
+            query = Appointment.query.options(Appointment.load_listing()).filter_by(doctor_id=doctor.doctor_id)
+        elif patient:
+            query = Appointment.query.options(Appointment.load_listing()).filter_by(patient_id=patient.patient_id)
         else:
             return {"status": "error", "message": "Unauthorized"}, 403
 
+        args = request.args
+        try:
+            limit = parse_limit(
+                args.get("limit"),
+                default=current_app.config["APPOINTMENTS_PAGE_SIZE"],
+                maximum=current_app.config["APPOINTMENTS_MAX_PAGE_SIZE"],
+            )
+            if args.get("date_from"):
+                query = query.filter(Appointment.date >= datetime.strptime(args["date_from"], "%Y-%m-%d").date())
+            if args.get("date_to"):
+                query = query.filter(Appointment.date <= datetime.strptime(args["date_to"], "%Y-%m-%d").date())
+            if args.get("cursor"):
+                cursor_date, cursor_time, cursor_id = decode_cursor(args["cursor"], (str, str, str))
+                query = query.filter(
+                    tuple_(Appointment.date, Appointment.time, Appointment.appointment_id) > tuple_(
+                        datetime.strptime(cursor_date, "%Y-%m-%d").date(),
+                        datetime.strptime(cursor_time, "%H:%M:%S").time(),
+                        uuid.UUID(cursor_id),
+                    )
+                )
+        except (ValueError, TypeError) as e:
+            return {"status": "error", "message": str(e)}, 400
+
+        if args.get("status"):
+            query = query.filter(Appointment.status == args["status"])
+
+        # Fetch one extra row to know whether another page exists
+        appointments = (
+            query.order_by(Appointment.date, Appointment.time, Appointment.appointment_id)
+            .limit(limit + 1)
+            .all()
+        )
+        next_cursor = None
+        if len(appointments) > limit:
+            appointments = appointments[:limit]
+            last = appointments[-1]
+            next_cursor = encode_cursor([
+                last.date.strftime("%Y-%m-%d"),
+                last.time.strftime("%H:%M:%S"),
+                str(last.appointment_id),
+            ])
+
         # If no appointments, return an empty list with a success message
         if not appointments:
             return {
                 "status": "success",
                 "message": "Here is where we will display the appointments",
-                "data": {"appointments": []},
+                "data": {"appointments": [], "next_cursor": None},
             }, 200
 
-        appointment_list = [
-            {
-                "appointmentId": str(appointment.appointment_id),
-                "patientId": str(appointment.patient_id),
-                "doctorId": str(appointment.doctor_id),
-                "date": appointment.date.strftime("%Y-%m-%d"),
-                "time": appointment.time.strftime("%H:%M"),
-                "status": appointment.status,
-            }
-            for appointment in appointments
-        ]
-
         return {
             "status": "success",
             "message": "Appointments retrieved successfully",
-            "data": {"appointments": appointment_list},
+            "data": {"appointments": appointment_serializer.many(appointments), "next_cursor": next_cursor},
         }, 200
 
 
+@appointment_namespace.route("/export")
+class ExportAppointmentsResource(Resource):
+    @jwt_required()
+    @appointment_namespace.doc(params={
+        "format": "ndjson (default) or csv",
+        "date_from": "Only appointments on or after this date (YYYY-MM-DD)",
+        "date_to": "Only appointments on or before this date (YYYY-MM-DD)",
+    })
+    @appointment_namespace.response(200, "Appointments streamed successfully")
+    @appointment_namespace.response(400, "Invalid input", error_response_model)
+    def get(self):
+        """
+        Stream every appointment related to the logged-in user as NDJSON or CSV.
+        """
+        patient, doctor = current_patient(), current_doctor()
+
+        if doctor:
+            criteria = [Appointment.doctor_id == doctor.doctor_id]
+        elif patient:
+            criteria = [Appointment.patient_id == patient.patient_id]
+        else:
+            return {"status": "error", "message": "Unauthorized"}, 403
+
+        args = request.args
+        export_format = args.get("format", "ndjson")
+        if export_format not in ("ndjson", "csv"):
+            return {"status": "error", "message": "format must be ndjson or csv"}, 400
+
+        try:
+            if args.get("date_from"):
+                criteria.append(Appointment.date >= datetime.strptime(args["date_from"], "%Y-%m-%d").date())
+            if args.get("date_to"):
+                criteria.append(Appointment.date <= datetime.strptime(args["date_to"], "%Y-%m-%d").date())
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}, 400
+
+        rows = iter_appointment_rows(*criteria)
+        if export_format == "csv":
+            body, mimetype = csv_lines(rows), "text/csv"
+        else:
+            body, mimetype = ndjson_lines(rows), "application/x-ndjson"
+
+        return Response(
+            stream_with_context(body),
+            mimetype=mimetype,
+            headers={"Content-Disposition": f"attachment; filename=appointments.{export_format}"},
+        )
+
+
 @appointment_namespace.route("/book")
 class BookAppointmentResource(Resource):
     @jwt_required()
@@ -91,14 +174,8 @@ class BookAppointmentResource(Resource):
         """
         Book an appointment (Patient only).
         """
-        current_user = get_jwt_identity()
-        user_role = current_user.get("role")
-        user = Patient.query.filter_by(patient_id=current_user.get("id")).first() or Doctor.query.filter_by(doctor_id=current_user.get("id")).first()
-
+        user = current_patient()
         if not user:
-            return {"status": "error", "message": "User not found"}, 404
-
-        if user_role != "patient":
             return {"status": "error", "message": "Unauthorized, only patients can book appointments"}, 403
 
         data = request.get_json()
@@ -112,41 +189,31 @@ class BookAppointmentResource(Resource):
         except ValueError as e:
             return {"status": "error", "message": str(e)}, 400
 
-        existing_appointment = Appointment.query.filter_by(
-            date=appointment_date, time=appointment_time, doctor_id=doctor_id
-        ).first()
-
-        if existing_appointment:
+        try:
+            new_appointment = reserve_slot(
+                patient_id=user.patient_id,
+                doctor_id=doctor_id,
+                date=appointment_date,
+                time=appointment_time,
+            )
+        except ValueError:
+            return {"status": "error", "message": "Invalid doctor ID format"}, 400
+        except SlotUnavailable:
+            db.session.rollback()
             return {"status": "error", "message": "Appointment already exists"}, 409
 
-        new_appointment = Appointment(
-            patient_id=user.patient_id,
-            doctor_id=doctor_id,
-            date=appointment_date,
-            time=appointment_time,
-            status="booked",
-        )
-
-        db.session.add(new_appointment)
-        db.session.commit()
-
-        send_email(
+        queue_email(
             recipient=user.email,
             subject="Appointment Confirmation",
             body=f"Your appointment is booked for {date} at {time}.",
         )
+        db.session.commit()
+        email_dispatcher.wake()
 
         return {
             "status": "success",
             "message": "Appointment booked successfully",
-            "data": {
-                "appointmentId": str(new_appointment.appointment_id),
-                "patientId": str(new_appointment.patient_id),
-                "doctorId": str(new_appointment.doctor_id),
-                "date": new_appointment.date.strftime("%Y-%m-%d"),
-                "time": new_appointment.time.strftime("%H:%M"),
-                "status": new_appointment.status,
-            },
+            "data": appointment_serializer.one(new_appointment),
         }, 201
 
 
@@ -160,35 +227,25 @@ class CancelAppointmentResource(Resource):
         """
         Cancel an appointment (Patient only).
         """
-        current_user_id = get_jwt_identity()
-        user = Patient.query.filter_by(patient_id=current_user_id).first()
-
-        if not user:
-            return {"status": "error", "message": "User not found"}, 404
-
-        user_role = "patient" if isinstance(user, Patient) else "doctor"
-        if user_role != "patient":
+        patient = current_patient()
+        if not patient:
             return {"status": "error", "message": "Unauthorized, only patients can cancel appointments"}, 403
 
-        appointment = Appointment.query.get(appointment_id)
+        appointment = db.session.get(Appointment, appointment_id)
         if not appointment:
             return {"status": "error", "message": f"Appointment with ID {appointment_id} not found"}, 404
 
-        if str(appointment.patient_id) != str(current_user_id):
+        if appointment.patient_id != patient.patient_id:
             return {"status": "error", "message": "You are not authorized to cancel this appointment"}, 403
 
-        patient = Patient.query.filter_by(patient_id=appointment.patient_id).first()
-        if not patient:
-            return {"status": "error", "message": "Patient not found"}, 404
-
         db.session.delete(appointment)
-        db.session.commit()
-
-        send_email(
+        queue_email(
             recipient=patient.email,
             subject="Appointment Cancellation",
             body="Your appointment has been cancelled.",
         )
+        db.session.commit()
+        email_dispatcher.wake()
 
         return {
             "status": "success",
@@ -209,21 +266,15 @@ class RescheduleAppointmentResource(Resource):
         """
         Reschedule an appointment (Patient only).
         """
-        current_user_id = get_jwt_identity()
-        user = Patient.query.filter_by(patient_id=current_user_id).first()
-
-        if not user:
-            return {"status": "error", "message": "User not found"}, 404
-
-        user_role = "patient" if isinstance(user, Patient) else "doctor"
-        if user_role != "patient":
+        patient = current_patient()
+        if not patient:
             return {"status": "error", "message": "Unauthorized, only patients can reschedule appointments"}, 403
 
-        appointment = Appointment.query.get(appointment_id)
+        appointment = db.session.get(Appointment, appointment_id)
         if not appointment:
             return {"status": "error", "message": f"Appointment with ID {appointment_id} not found"}, 404
 
-        if str(appointment.patient_id) != str(current_user_id):
+        if appointment.patient_id != patient.patient_id:
             return {"status": "error", "message": "You are not authorized to reschedule this appointment"}, 403
 
         data = request.get_json()
@@ -236,43 +287,30 @@ class RescheduleAppointmentResource(Resource):
         except ValueError as e:
             return {"status": "error", "message": str(e)}, 400
 
-        existing_appointment = Appointment.query.filter_by(
-            date=new_date, time=new_time, doctor_id=appointment.doctor_id
-        ).first()
-
-        if existing_appointment:
+        try:
+            move_slot(appointment, new_date, new_time)
+        except SlotUnavailable:
+            db.session.rollback()
             return {"status": "error", "message": "Appointment already exists at this time"}, 409
 
-        appointment.date = new_date
-        appointment.time = new_time
-        db.session.commit()
-
-        patient = Patient.query.filter_by(patient_id=appointment.patient_id).first()
-        if not patient:
-            return {"status": "error", "message": "Patient not found"}, 404
-
-        send_email(
+        queue_email(
             recipient=patient.email,
             subject="Appointment Rescheduled",
             body=f"Your appointment has been rescheduled to {new_date} at {new_time}.",
         )
+        db.session.commit()
+        email_dispatcher.wake()
 
         return {
             "status": "success",
             "message": "Appointment rescheduled successfully",
-            "data": {
-                "appointmentId": str(appointment.appointment_id),
-                "patientId": str(appointment.patient_id),
-                "doctorId": str(appointment.doctor_id),
-                "date": appointment.date.strftime("%Y-%m-%d"),
-                "time": appointment.time.strftime("%H:%M"),
-                "status": appointment.status,
-            },
+            "data": appointment_serializer.one(appointment),
         }, 200
 
 
 @appointment_namespace.route("/<uuid:appointment_id>")
 class ViewAppointmentResource(Resource):
+    @jwt_required()
     @appointment_namespace.response(200, "Appointment details retrieved successfully", appointment_model)
     @appointment_namespace.response(404, "Appointment not found", error_response_model)
     @appointment_namespace.response(403, "You are not authorized to view this appointment", error_response_model)
@@ -280,43 +318,19 @@ class ViewAppointmentResource(Resource):
         """
         Get appointment details (Patient only).
         """
-        current_user = get_jwt_identity()
-        user_role = current_user.get("role")
-        user = Patient.query.filter_by(patient_id=current_user.get("id")).first() or Doctor.query.filter_by(doctor_id=current_user.get("id")).first()
-
-        if not user:
-            return {"status": "error", "message": "User not found"}, 404
-
-        if user_role != "patient":
+        patient = current_patient()
+        if not patient:
             return {"status": "error", "message": "Unauthorized, only patients can view appointment details"}, 403
 
-        appointment = Appointment.query.get(appointment_id)
+        appointment = db.session.get(Appointment, appointment_id)
         if not appointment:
             return {"status": "error", "message": f"Appointment with ID {appointment_id} not found"}, 404
 
-        auth_header = request.headers.get("Authorization")
-        if not auth_header:
-            return {"status": "error", "message": "Authorization header missing"}, 400
-
-        try:
-            token = auth_header.split(" ")[1]
-            decoded_token = jwt.decode(token, Config.JWT_SECRET_KEY, algorithms=["HS256"])
-            patient_id_from_token = decoded_token.get("sub")
-        except (IndexError, jwt.ExpiredSignatureError, jwt.InvalidTokenError):
-            return {"status": "error", "message": "Invalid or expired token"}, 401
-
-        if str(appointment.patient_id) != str(patient_id_from_token):
+        if appointment.patient_id != patient.patient_id:
             return {"status": "error", "message": "You are not authorized to view this appointment"}, 403
 
         return {
             "status": "success",
             "message": "Appointment details retrieved successfully",
-            "data": {
-                "appointmentId": str(appointment.appointment_id),
-                "patientId": str(appointment.patient_id),
-                "doctorId": str(appointment.doctor_id),
-                "date": appointment.date.strftime("%Y-%m-%d"),
-                "time": appointment.time.strftime("%H:%M"),
-                "status": appointment.status,
-            },
+            "data": appointment_serializer.one(appointment),
         }, 200
@@ -14,7 +14,8 @@ appointments_list_model = api.model("AppointmentsList", {
     "status": fields.String(example="success"),
     "message": fields.String(example="Appointments retrieved successfully"),
     "data": fields.Nested(api.model("AppointmentsData", {
-        "appointments": fields.List(fields.Nested(appointment_model))
+        "appointments": fields.List(fields.Nested(appointment_model)),
+        "next_cursor": fields.String(description="Cursor for the next page, null on the last page"),
     }))
 })
 
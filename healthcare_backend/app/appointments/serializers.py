@@ -0,0 +1,10 @@
+from utils.serializers import Serializer, iso_date, hours_minutes
+
+appointment_serializer = Serializer(
+    appointmentId=("appointment_id", str),
+    patientId=("patient_id", str),
+    doctorId=("doctor_id", str),
+    date=("date", iso_date),
+    time=("time", hours_minutes),
+    status="status",
+)
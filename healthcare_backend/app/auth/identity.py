@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+import uuid
+from functools import wraps
+from flask_jwt_extended import get_current_user, jwt_required
+from app import db, jwt
+from app.doctors.models import Doctor
+from app.patients.models import Patient
+from utils.db_routing import db_router
+
+
+class Admin:
+    """An administrator. Admins have no table and are identified by their token alone."""
+
+    def __init__(self, admin_id):
+        self.admin_id = admin_id
+
+
+ROLE_MODELS = {
+    "patient": Patient,
+    "doctor": Doctor,
+}
+
+
+@jwt.user_lookup_loader
+def load_principal(jwt_header, jwt_data):
+    """
+    Resolve the caller of a JWT protected request.
+
+    The token's role claim selects the one table to look in, so each
+    request costs a single primary key lookup. flask_jwt_extended runs this
+    once per request and memoizes the result on flask.g, where every
+    namespace reads it through get_current_user() or the helpers below.
+
+    The caller is also handed to the replica router first, so a caller who
+    just wrote is looked up on the primary.
+    """
+    db_router.set_caller(jwt_data.get("sub"))
+    if jwt_data.get("role") == "admin":
+        return Admin(jwt_data.get("sub"))
+
+    model = ROLE_MODELS.get(jwt_data.get("role"))
+    if model is None:
+        return None
+    try:
+        user_id = uuid.UUID(jwt_data["sub"])
+    except (KeyError, ValueError):
+        return None
+    return db.session.get(model, user_id)
+
+
+@jwt.user_lookup_error_loader
+def principal_not_found(jwt_header, jwt_data):
+    return {"status": "error", "message": "User not found"}, 404
+
+
+def current_patient():
+    """Return the calling patient, or None when the caller is not a patient."""
+    user = get_current_user()
+    return user if isinstance(user, Patient) else None
+
+
+def current_doctor():
+    """Return the calling doctor, or None when the caller is not a doctor."""
+    user = get_current_user()
+    return user if isinstance(user, Doctor) else None
+
+
+def admin_required(fn):
+    """Restrict a resource method to callers with the admin role."""
+    @wraps(fn)
+    @jwt_required()
+    def wrapper(*args, **kwargs):
+        if not isinstance(get_current_user(), Admin):
+            return {"status": "error", "message": "Unauthorized, admin only"}, 403
+        return fn(*args, **kwargs)
+    return wrapper
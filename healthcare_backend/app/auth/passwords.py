@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from itertools import repeat
+from werkzeug.security import generate_password_hash, check_password_hash
+
+logger = logging.getLogger(__name__)
+
+START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+class HasherBusy(Exception):
+    """
+    Raised when a hash cannot be computed in time.
+
+    That is when every hashing slot is taken for longer than
+    PASSWORD_HASH_TIMEOUT, the hash itself takes longer, or a worker
+    process died.
+    """
+
+
+class PasswordHasher:
+    """
+    Hashes and verifies passwords in a bounded pool of worker processes.
+
+    Password hashing is deliberately CPU bound, so running it in processes
+    rather than on the request thread lets a burst of logins use every core
+    instead of queueing behind the GIL. At most PASSWORD_HASH_MAX_PENDING
+    hashes are queued at once; callers beyond that wait up to
+    PASSWORD_HASH_TIMEOUT seconds and then get HasherBusy. A hash counts
+    against the limit until its worker finishes it, even after its caller
+    timed out.
+
+    PASSWORD_HASH_METHOD is a werkzeug method string including its cost
+    parameters, such as "scrypt:32768:8:1" or "pbkdf2:sha256:600000".
+    Setting PASSWORD_HASH_WORKERS to 0 hashes inline, which the tests use.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._executor = None
+        self._pid = None
+        self._slots = None
+        self._lock = threading.Lock()
+        self._canonical_method = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self._canonical_method = None
+        app.extensions["password_hasher"] = self
+
+    @property
+    def method(self):
+        return self.app.config["PASSWORD_HASH_METHOD"]
+
+    def _pool(self):
+        # Created lazily and per process, so a forked server worker never
+        # inherits its parent's pool.
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                config = self.app.config
+                # Not forked from here: other threads, such as the email
+                # dispatcher, the invalidation listener or other requests,
+                # may hold locks (logging, SQLAlchemy pools, the allocator)
+                # that a forked child would inherit locked. Workers only
+                # import werkzeug, so starting them fresh is cheap.
+                self._executor = ProcessPoolExecutor(
+                    max_workers=config["PASSWORD_HASH_WORKERS"],
+                    mp_context=multiprocessing.get_context(START_METHOD),
+                )
+                self._slots = threading.BoundedSemaphore(config["PASSWORD_HASH_MAX_PENDING"])
+                self._pid = os.getpid()
+            return self._executor, self._slots
+
+    def _call(self, function, *args):
+        if not self.app.config["PASSWORD_HASH_WORKERS"]:
+            return function(*args)
+
+        executor, slots = self._pool()
+        timeout = self.app.config["PASSWORD_HASH_TIMEOUT"]
+        if not slots.acquire(timeout=timeout):
+            raise HasherBusy()
+        try:
+            future = executor.submit(function, *args)
+        except BrokenProcessPool:
+            slots.release()
+            self._discard(executor)
+            raise HasherBusy()
+        # A hash that outlives its caller's timeout keeps running in its
+        # worker, so it keeps its slot until it is done
+        future.add_done_callback(lambda _: slots.release())
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # Only drops the hash if no worker has picked it up yet
+            future.cancel()
+            raise HasherBusy()
+        except BrokenProcessPool:
+            self._discard(executor)
+            raise HasherBusy()
+
+    def _discard(self, executor):
+        # A worker died and the pool refuses new work, the next call starts
+        # a fresh one.
+        logger.error("Password hashing pool broke, starting a new one")
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False)
+
+    def hash(self, password):
+        """Return a hash of password using the configured method and cost."""
+        return self._call(generate_password_hash, password, self.method)
+
+    def hash_many(self, passwords):
+        """
+        Hash a batch of passwords, spread across every worker process.
+
+        Meant for bulk imports: the batch is submitted in a few large chunks
+        and does not count against PASSWORD_HASH_MAX_PENDING.
+        """
+        passwords = list(passwords)
+        method = self.method
+        workers = self.app.config["PASSWORD_HASH_WORKERS"]
+        if not workers:
+            return [generate_password_hash(password, method) for password in passwords]
+
+        executor, _ = self._pool()
+        chunksize = max(len(passwords) // (workers * 4), 1)
+        try:
+            return list(executor.map(generate_password_hash, passwords, repeat(method), chunksize=chunksize))
+        except BrokenProcessPool:
+            self._discard(executor)
+            raise
+
+    def verify(self, pwhash, password):
+        """Return whether password matches pwhash."""
+        return self._call(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """Return whether pwhash was made with a different method or cost than configured."""
+        if self._canonical_method is None:
+            # werkzeug expands bare names such as "scrypt" to their full
+            # parameters, so compare against a hash it actually produced.
+            self._canonical_method = self.hash("").split("$", 1)[0]
+        return pwhash.split("$", 1)[0] != self._canonical_method
+
+    def shutdown(self):
+        """Stop this process's worker pool, if one was started."""
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=True)
+            self._executor = None
+            self._pid = None
+
+
+password_hasher = PasswordHasher()
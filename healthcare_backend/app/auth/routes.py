@@ -1,13 +1,19 @@
 # -*- coding: utf-8 -*-
-import re
 from flask import request
 from flask_restx import Namespace, Resource
-from werkzeug.security import generate_password_hash, check_password_hash
 from app import db, api
+from app.auth.passwords import password_hasher, HasherBusy
 from app.auth.utils import generate_jwt_token
-from utils.error_list import add_error_to_list
+from sqlalchemy.exc import IntegrityError
+from app.auth.validation import validate_registration, find_taken_fields, integrity_error_fields
 from utils.mail import send_email
 
+BUSY_RESPONSE = (
+    {"status": "Service Unavailable", "message": "Too many requests, please retry shortly"},
+    503,
+    {"Retry-After": "1"},
+)
+
 
 class UserRegister(Resource):
     def __init__(self, model, role):
@@ -17,34 +23,17 @@ class UserRegister(Resource):
     def post(self):
         """Register a new user (generic for patient and doctor)"""
         data = request.json
-        errors_list = []
-
-        required_fields = ["firstname", "lastname", "email", "phone", "password"]
-        if self.role == "doctor":
-            required_fields.append("specialization")
-        else:
-            required_fields.append("date_of_birth")
-
-        for field in required_fields:
-            if not data.get(field):
-                add_error_to_list(errors_list, field, f"{field.replace('_', ' ').capitalize()} is required")
-
-        if self.model.query.filter_by(email=data.get("email")).first():
-            add_error_to_list(errors_list, "email", "Email already in use")
-
-        if self.model.query.filter_by(phone=data.get("phone")).first():
-            add_error_to_list(errors_list, "phone", "Phone number already in use")
-
-        if data.get("phone") and not re.match(r"^(\+2547\d{8}|07\d{8})$", data["phone"]):
-            add_error_to_list(errors_list, "phone", "Phone number is invalid")
-
-        if data.get("email") and not re.match(r"^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$", data["email"]):
-            add_error_to_list(errors_list, "email", "Email is invalid")
+        errors_list = validate_registration(data, self.role)
+        if not errors_list:
+            errors_list = find_taken_fields(self.model, data["email"], data["phone"])
 
         if errors_list:
             return {"status": "Bad Request", "message": "Registration unsuccessful", "errors": errors_list}, 400
 
-        hashed_password = generate_password_hash(data.get("password"))
+        try:
+            hashed_password = password_hasher.hash(data.get("password"))
+        except HasherBusy:
+            return BUSY_RESPONSE
 
         user_data = {
             "firstname": data.get("firstname"),
@@ -63,8 +52,9 @@ class UserRegister(Resource):
 
         try:
             db.session.add(new_user)
-            db.session.commit()
-            db.session.refresh(new_user)
+            # Flushing runs the INSERT, which also returns server defaults
+            # such as employee_id, so the response needs no extra query.
+            db.session.flush()
 
             response_data = {
                 "Id": str(new_user.doctor_id) if self.role == "doctor" else str(new_user.patient_id),
@@ -80,12 +70,24 @@ class UserRegister(Resource):
             else:
                 response_data["dateOfBirth"] = new_user.date_of_birth.strftime('%Y-%m-%d')
 
+            db.session.commit()
             return {
                 "status": "Success",
                 "message": "Registration successful",
                 "data": {self.role: response_data}
             }, 201
 
+        except IntegrityError as e:
+            db.session.rollback()
+            errors_list = integrity_error_fields(e)
+            if errors_list:
+                return {"status": "Bad Request", "message": "Registration unsuccessful", "errors": errors_list}, 400
+            return {
+                "status": "Internal Server Error",
+                "message": "Registration unsuccessful",
+                "errors": str(e),
+            }, 500
+
         except Exception as e:
             db.session.rollback()
             return {
@@ -116,7 +118,7 @@ class UserLogin(Resource):
         password = data['password']
         employee_id = data.get('employee_id')
 
-        user = self.model.query.filter_by(email=email).first()
+        user = self.model.query.options(self.model.load_credentials()).filter_by(email=email).first()
 
         if not user:
             return {"message": f"{self.role.capitalize()} not found"}, 404
@@ -124,8 +126,19 @@ class UserLogin(Resource):
         if self.role == "doctor" and user.employee_id != employee_id:
             return {"message": "Invalid employee ID"}, 400
 
-        if not check_password_hash(user.password, password):
-            return {"message": "Invalid password"}, 400
+        try:
+            if not password_hasher.verify(user.password, password):
+                return {"message": "Invalid password"}, 400
+        except HasherBusy:
+            return BUSY_RESPONSE
+
+        # Upgrade hashes made with older parameters while we know the password
+        try:
+            if password_hasher.needs_rehash(user.password):
+                user.password = password_hasher.hash(password)
+                db.session.commit()
+        except HasherBusy:
+            pass  # Retried on a later login
 
         try:
             if self.role == "doctor":
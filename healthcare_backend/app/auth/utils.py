@@ -1,7 +1,6 @@
 from datetime import datetime, timedelta
 import jwt
 from flask import current_app
-from config import Config
 
 def generate_jwt_token(user_id, role):
     """
@@ -15,7 +14,7 @@ def generate_jwt_token(user_id, role):
         str: The generated JWT token.
     """
     try:
-        jwt_secret_key = Config.JWT_SECRET_KEY
+        jwt_secret_key = current_app.config.get("JWT_SECRET_KEY")
         if not jwt_secret_key:
             raise Exception("JWT_SECRET_KEY is not set in the environment variables.")
         
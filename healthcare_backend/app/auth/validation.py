@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+import re
+from datetime import datetime
+from sqlalchemy import select, or_
+from app import db
+from utils.error_list import add_error_to_list
+
+PHONE_RE = re.compile(r"^(\+2547\d{8}|07\d{8})$")
+EMAIL_RE = re.compile(r"^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$")
+
+UNIQUE_FIELD_MESSAGES = {
+    "email": "Email already in use",
+    "phone": "Phone number already in use",
+}
+
+
+def required_fields(role):
+    """Return the fields a registration for role must provide."""
+    fields = ["firstname", "lastname", "email", "phone", "password"]
+    fields.append("specialization" if role == "doctor" else "date_of_birth")
+    return fields
+
+
+def optional_fields(role):
+    """Return the profile fields a bulk import for role may also provide."""
+    return ["address", "age", "weight", "height", "blood_group"] if role == "patient" else []
+
+
+def validate_registration(data, role):
+    """
+    Check a registration payload without touching the database.
+
+    A valid date_of_birth is replaced in data by the parsed datetime.
+
+    Returns:
+        list: Field-level errors, empty when the payload is valid.
+    """
+    errors_list = []
+
+    for field in required_fields(role):
+        label = field.replace('_', ' ').capitalize()
+        if not data.get(field):
+            add_error_to_list(errors_list, field, f"{label} is required")
+        elif not isinstance(data[field], str):
+            add_error_to_list(errors_list, field, f"{label} must be a string")
+
+    if isinstance(data.get("phone"), str) and data["phone"] and not PHONE_RE.match(data["phone"]):
+        add_error_to_list(errors_list, "phone", "Phone number is invalid")
+
+    if isinstance(data.get("email"), str) and data["email"] and not EMAIL_RE.match(data["email"]):
+        add_error_to_list(errors_list, "email", "Email is invalid")
+
+    if role != "doctor" and isinstance(data.get("date_of_birth"), str):
+        try:
+            data["date_of_birth"] = datetime.strptime(data["date_of_birth"], "%Y-%m-%d")
+        except ValueError:
+            add_error_to_list(errors_list, "date_of_birth", "Date of birth is invalid")
+
+    return errors_list
+
+
+def find_taken_fields(model, email, phone):
+    """
+    Look up whether an email or phone number is already registered, in one query.
+
+    Returns:
+        list: Field-level errors for every value already in use.
+    """
+    rows = db.session.execute(
+        select(model.email, model.phone).where(or_(model.email == email, model.phone == phone))
+    ).all()
+
+    errors_list = []
+    if any(row.email == email for row in rows):
+        add_error_to_list(errors_list, "email", UNIQUE_FIELD_MESSAGES["email"])
+    if any(row.phone == phone for row in rows):
+        add_error_to_list(errors_list, "phone", UNIQUE_FIELD_MESSAGES["phone"])
+    return errors_list
+
+
+def integrity_error_fields(error):
+    """
+    Map a unique violation raised by an insert back to field-level errors.
+
+    This covers the race where a concurrent registration commits the same
+    email or phone number between find_taken_fields and the insert.
+
+    Returns:
+        list: Field-level errors, empty when the violation is not on a
+        registration field.
+    """
+    diag = getattr(error.orig, "diag", None)
+    # Postgres names the violated constraint, e.g. patients_email_key;
+    # SQLite only reports it in the message, e.g. "patients.email".
+    detail = getattr(diag, "constraint_name", None) or str(error.orig)
+
+    errors_list = []
+    for field, message in UNIQUE_FIELD_MESSAGES.items():
+        if field in detail:
+            add_error_to_list(errors_list, field, message)
+    return errors_list
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+import logging
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from app import cache
+from app.appointments.models import Appointment
+from app.doctors.models import Doctor
+from utils.db_routing import db_router
+from utils.read_cache import ReadModelCache, LRUCache, LocalInvalidationBus, RedisInvalidationBus
+
+logger = logging.getLogger(__name__)
+
+# Loaders read from the primary, see ReadModelCache. Details and
+# availability are cached as {"data": ..., "etag": ...}.
+doctor_details_cache = ReadModelCache(cache, "doctor_details", schema=3, load_context=db_router.primary)
+doctor_availability_cache = ReadModelCache(cache, "doctor_availability", schema=3, load_context=db_router.primary)
+doctor_slots_cache = ReadModelCache(cache, "doctor_slots", timeout=60, load_context=db_router.primary)
+# First pages of the doctor directory, all kept under the DIRECTORY entity
+doctor_directory_cache = ReadModelCache(cache, "doctor_directory", load_context=db_router.primary)
+DIRECTORY = "all"
+
+# Read models cached per doctor
+DOCTOR_CACHES = (doctor_details_cache, doctor_availability_cache, doctor_slots_cache)
+READ_CACHES = DOCTOR_CACHES + (doctor_directory_cache,)
+
+_PENDING_KEY = "stale_doctor_caches"
+
+
+def configure_doctor_caches(app):
+    """
+    Put a per-process LRU cache in front of Redis for every doctor read model.
+
+    With the Redis backend, invalidations are broadcast to the other workers
+    over pub/sub. Other backends are process-local, so an in-process bus is
+    enough. If the pub/sub listener cannot start, the local tier is left
+    off rather than risk serving stale data.
+    """
+    if not app.config["CACHE_L1_ENABLED"]:
+        for read_cache in READ_CACHES:
+            read_cache.use_local_cache(None, None)
+        return
+
+    bus = LocalInvalidationBus()
+    if app.config["CACHE_TYPE"] == "redis":
+        import redis
+        bus = RedisInvalidationBus(
+            redis.Redis(
+                host=app.config["CACHE_REDIS_HOST"],
+                port=app.config["CACHE_REDIS_PORT"],
+                db=app.config["CACHE_REDIS_DB"],
+            ),
+            app.config["CACHE_INVALIDATION_CHANNEL"],
+        )
+
+    try:
+        for read_cache in READ_CACHES:
+            read_cache.use_local_cache(
+                LRUCache(app.config["CACHE_L1_MAXSIZE"], app.config["CACHE_L1_TTL"]), bus
+            )
+    except Exception:
+        logger.exception("Cache invalidation bus unavailable, local doctor caches disabled")
+        for read_cache in READ_CACHES:
+            read_cache.use_local_cache(None, None)
+        return
+
+    app.extensions["cache_invalidation_bus"] = bus
+
+
+def mark_stale(session, read_cache, doctor_id):
+    """Invalidate a doctor's read model once the session's transaction commits."""
+    if doctor_id is not None:
+        session.info.setdefault(_PENDING_KEY, set()).add((read_cache, doctor_id))
+
+
+def mark_slots_stale(session, doctor_id):
+    """
+    Invalidate a doctor's cached slots on commit.
+
+    Needed after ORM-enabled INSERT/UPDATE statements, which do not go
+    through the flush and are therefore not seen by the after_flush hook.
+    """
+    mark_stale(session, doctor_slots_cache, doctor_id)
+
+
+def mark_directory_stale(session):
+    """
+    Invalidate the cached directory pages on commit.
+
+    Needed after Core inserts of doctors, which bypass the flush.
+    """
+    mark_stale(session, doctor_directory_cache, DIRECTORY)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_stale_doctors(session, flush_context):
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(instance, Doctor):
+            for read_cache in DOCTOR_CACHES:
+                mark_stale(session, read_cache, instance.doctor_id)
+            mark_directory_stale(session)
+        elif isinstance(instance, Appointment):
+            mark_slots_stale(session, instance.doctor_id)
+            # A reassigned appointment frees a slot of the previous doctor
+            for previous in inspect(instance).attrs.doctor_id.history.deleted:
+                mark_slots_stale(session, previous)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_stale_doctors(session):
+    for read_cache, doctor_id in session.info.pop(_PENDING_KEY, ()):
+        read_cache.invalidate(doctor_id)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_stale_doctors(session, transaction):
+    # Runs after after_commit, so this only discards marks from a rolled back transaction
+    if transaction.parent is None:
+        session.info.pop(_PENDING_KEY, None)
+
+
+def cache_stats():
+    """Return hit and miss counters for every doctor read model cache."""
+    return {read_cache.name: read_cache.stats() for read_cache in READ_CACHES}
+
+
+def cache_metrics():
+    """Metrics collector reporting the lookups and hit ratio of every read model cache."""
+    lookups, ratios, entries = [], [], []
+    for name, stats in cache_stats().items():
+        tiers = [("shared", stats)]
+        if "local" in stats:
+            tiers.append(("local", stats["local"]))
+            entries.append(({"cache": name}, stats["local"]["size"]))
+        for tier, tier_stats in tiers:
+            lookups.append(({"cache": name, "tier": tier, "result": "hit"}, tier_stats["hits"]))
+            lookups.append(({"cache": name, "tier": tier, "result": "miss"}, tier_stats["misses"]))
+        ratios.append(({"cache": name}, stats["hit_ratio"]))
+    return [
+        ("cache_lookups_total", "counter", "Read model cache lookups by tier and result.", lookups),
+        ("cache_hit_ratio", "gauge", "Share of read model lookups served from either cache tier.", ratios),
+        ("cache_local_entries", "gauge", "Entries held in the in-process cache tier.", entries),
+    ]
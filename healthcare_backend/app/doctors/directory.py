@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+from sqlalchemy import func, or_, tuple_
+from app.doctors.models import Doctor
+from utils.http import content_etag
+from utils.pagination import encode_cursor
+from app.doctors.serializers import doctor_summary_serializer
+
+_sort_key = (func.lower(Doctor.lastname), func.lower(Doctor.firstname), Doctor.doctor_id)
+
+
+def _escape_like(value):
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def directory_page(prefix, limit, after=None):
+    """
+    Load one page of the doctor directory, ordered by last then first name.
+
+    Args:
+        prefix (str): Only doctors whose first name, last name or
+            specialization starts with this lowercased text. Empty for all.
+        limit (int): Page size.
+        after (tuple, optional): The (lowercased last name, lowercased
+            first name, doctor_id) sort key of the previous page's last row.
+
+    Returns:
+        dict: The doctors, the cursor of the next page (None on the last
+        page) and an ETag of the page's content.
+    """
+    query = Doctor.query.options(Doctor.load_summary())
+    if prefix:
+        pattern = _escape_like(prefix) + "%"
+        query = query.filter(or_(
+            func.lower(Doctor.firstname).like(pattern, escape="\\"),
+            func.lower(Doctor.lastname).like(pattern, escape="\\"),
+            func.lower(Doctor.specialization).like(pattern, escape="\\"),
+        ))
+    if after is not None:
+        query = query.filter(tuple_(*_sort_key) > tuple_(*after))
+
+    # Fetch one extra row to know whether another page exists. The cursor
+    # takes the lowercased names from the database, whose lower() may not
+    # agree with Python's for every alphabet.
+    rows = query.add_columns(*_sort_key[:2]).order_by(*_sort_key).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last, lastname, firstname = rows[-1]
+        next_cursor = encode_cursor([lastname, firstname, str(last.doctor_id)])
+    doctors = [row[0] for row in rows]
+
+    page = {
+        "doctors": doctor_summary_serializer.many(doctors),
+        "next_cursor": next_cursor,
+    }
+    page["etag"] = content_etag(page)
+    return page
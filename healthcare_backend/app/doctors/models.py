@@ -1,36 +1,113 @@
 # -*- coding: utf-8 -*-
 import uuid
 from datetime import datetime, time
-from sqlalchemy import Column, Integer, String, DateTime, Sequence, Time, Text
+from sqlalchemy import Column, Integer, SmallInteger, String, DateTime, Sequence, Time, Index, func
+from sqlalchemy.ext.hybrid import hybrid_method
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred, load_only, undefer_group
 from app import db
 
 employee_id_seq = Sequence('employee_id_seq')
 
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+def weekday_index(name):
+    """
+    Return the weekday number (Monday is 0) for a day name, ignoring case.
+
+    Raises:
+        ValueError: If name is not a day of the week.
+    """
+    return [day.lower() for day in WEEKDAYS].index(name.strip().lower())
+
 
 class Doctor(db.Model):
     """
     Represents a doctor in the healthcare system.
     """
     __tablename__ = 'doctors'
+    # Fetch employee_id with RETURNING when inserting instead of on first access
+    __mapper_args__ = {"eager_defaults": True}
 
     doctor_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True)
     employee_id = Column(Integer, unique=True, nullable=False, server_default=employee_id_seq.next_value())
-    image = Column(Text, nullable=True)
+    # Blob store key of the profile image, see app.images
+    image_key = Column(String(80), nullable=True)
     firstname = Column(String(100), nullable=False)
     lastname = Column(String(100), nullable=False)
     specialization = Column(String(100), nullable=False)
     email = Column(String(100), unique=True, nullable=False)
     phone = Column(String(15), unique=True, nullable=False)
-    password = Column(String(255), nullable=False)
+    # Only login needs the hash, see load_credentials
+    password = deferred(Column(String(255), nullable=False), group="credentials")
     created_at = Column(DateTime, default=datetime.utcnow)
 
     availability_start = Column(Time, nullable=True)
     availability_end = Column(Time, nullable=True)
-    days_available = Column(String(100), nullable=True)
+    # Bit n is set when the doctor works on weekday n (Monday is 0)
+    days_available_mask = Column(SmallInteger, nullable=False, default=0, server_default='0')
 
     appointments = relationship("Appointment", back_populates="doctor")
 
+    @classmethod
+    def load_summary(cls):
+        """Query option loading only the columns doctor listings show."""
+        return load_only(cls.doctor_id, cls.firstname, cls.lastname, cls.specialization)
+
+    @classmethod
+    def load_availability(cls):
+        """Query option loading only the columns slot computations need."""
+        return load_only(cls.doctor_id, cls.availability_start, cls.availability_end, cls.days_available_mask)
+
+    @classmethod
+    def load_details(cls):
+        """Query option loading a doctor's public details and availability."""
+        return load_only(
+            cls.doctor_id, cls.firstname, cls.lastname, cls.specialization,
+            cls.availability_start, cls.availability_end, cls.days_available_mask,
+        )
+
+    @classmethod
+    def load_credentials(cls):
+        """Query option loading the deferred password hash along with the row."""
+        return undefer_group("credentials")
+
+    @property
+    def days_available(self):
+        """The names of the days the doctor works, Monday first."""
+        mask = self.days_available_mask or 0
+        return [day for n, day in enumerate(WEEKDAYS) if mask >> n & 1]
+
+    @days_available.setter
+    def days_available(self, days):
+        mask = 0
+        for day in days:
+            mask |= 1 << weekday_index(day)
+        self.days_available_mask = mask
+
+    @hybrid_method
+    def available_on(self, weekday):
+        return bool((self.days_available_mask or 0) >> weekday & 1)
+
+    @available_on.expression
+    def available_on(cls, weekday):
+        return cls.days_available_mask.bitwise_and(1 << weekday) != 0
+
     def __repr__(self):
         return f"<Doctor {self.firstname} {self.lastname}>"
+
+
+# The doctor directory is ordered by name and searched by lowercased prefix.
+# text_pattern_ops lets Postgres use the prefix indexes for LIKE 'abc%'
+# whatever the database collation.
+Index(
+    'ix_doctors_directory_order',
+    func.lower(Doctor.lastname), func.lower(Doctor.firstname), Doctor.doctor_id,
+)
+for _column in ('firstname', 'lastname', 'specialization'):
+    Index(
+        f'ix_doctors_lower_{_column}_prefix',
+        func.lower(getattr(Doctor, _column)).label(f'{_column}_lower'),
+        postgresql_ops={f'{_column}_lower': 'text_pattern_ops'},
+    )
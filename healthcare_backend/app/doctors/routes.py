@@ -1,17 +1,31 @@
 # -*- coding: utf-8 -*-
 from flask_restx import Namespace, Resource
-from app.doctors.models import Doctor
+from app.doctors.models import Doctor, weekday_index
 from app.auth.routes import UserRegister, UserLogin
-from flask_jwt_extended import get_jwt_identity, jwt_required
-from flask import request
-from datetime import datetime
-from app import db, cache
+from flask_jwt_extended import jwt_required
+from app.auth.identity import current_doctor
+from flask import request, current_app
+from datetime import datetime, date, timedelta
+from app import db
 from app.doctors.schemas import DoctorAvailabilitySchema
+from app.doctors.slots import free_slots, search_free_slots, booked_times, booked_in_window
+from app.images.service import save_image, save_image_data, image_url, ImageRejected
+from app.doctors.cache import doctor_details_cache, doctor_availability_cache, doctor_slots_cache, doctor_directory_cache, DIRECTORY
+from app.doctors.directory import directory_page
+from utils.pagination import decode_cursor, parse_limit
+from utils.http import content_etag, not_modified
+from utils.aio import run_blocking
+from app.doctors.serializers import (
+    doctor_summary_serializer,
+    doctor_availability_serializer,
+    doctor_details_serializer,
+    doctor_profile_serializer,
+)
+from sqlalchemy import func
+import asyncio
 import uuid
 import logging
-import json
 
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 doctor_namespace = Namespace('doctors', description='Doctors related operations')
@@ -32,36 +46,115 @@ class DoctorLogin(UserLogin):
 @doctor_namespace.route('/')
 class GetAllDoctors(Resource):
     @jwt_required()
+    @doctor_namespace.doc(params={
+        "q": "Only doctors whose first name, last name or specialization starts with this text",
+        "limit": "Maximum number of doctors to return",
+        "cursor": "The next_cursor value from the previous page",
+    })
     def get(self):
-        current_user = get_jwt_identity()
-        logger.debug(f"Fetching all doctors for user: {current_user}")
-
-        doctors = Doctor.query.all()
-        if not doctors:
-            return {"message": "No doctors found."}, 404
-
-        doctor_list = [{
-            "doctor_id": str(doctor.doctor_id),
-            "firstname": doctor.firstname,
-            "lastname": doctor.lastname,
-            "specialization": doctor.specialization
-        } for doctor in doctors]
+        """
+        Get a page of the doctor directory, ordered by name.
+
+        First pages are cached until a doctor changes. Every page carries an
+        ETag, so clients can revalidate with If-None-Match.
+        """
+        args = request.args
+        prefix = args.get("q", "").strip().lower()
+        try:
+            limit = parse_limit(
+                args.get("limit"),
+                default=current_app.config["DOCTOR_DIRECTORY_PAGE_SIZE"],
+                maximum=current_app.config["DOCTOR_DIRECTORY_MAX_PAGE_SIZE"],
+            )
+            after = None
+            if args.get("cursor"):
+                lastname, firstname, cursor_id = decode_cursor(args["cursor"], (str, str, str))
+                after = (lastname, firstname, uuid.UUID(cursor_id))
+        except (ValueError, TypeError) as e:
+            return {"message": "Invalid input", "errors": str(e)}, 400
+
+        if after is None:
+            page = doctor_directory_cache.get_or_set(
+                DIRECTORY, lambda: directory_page(prefix, limit), variant=f"{limit}:{prefix}"
+            )
+        else:
+            page = directory_page(prefix, limit, after)
+
+        unchanged = not_modified(page["etag"])
+        if unchanged is not None:
+            return unchanged
+
+        body = {"status": "success", "data": page["doctors"], "next_cursor": page["next_cursor"]}
+        return body, 200, {"ETag": f'"{page["etag"]}"'}
+
+
+@doctor_namespace.route('/search')
+class SearchDoctorSlots(Resource):
+    @jwt_required()
+    @doctor_namespace.doc(params={
+        "specialization": "Only doctors with this specialization",
+        "date": "Day to search (YYYY-MM-DD)",
+        "day": "Weekday name, searches its next occurrence when date is not given",
+        "start": "Earliest slot start (HH:MM), defaults to 00:00",
+        "end": "Slots must start before this time (HH:MM), defaults to 23:59",
+    })
+    async def get(self):
+        args = request.args
+        try:
+            if args.get("date"):
+                search_date = datetime.strptime(args["date"], "%Y-%m-%d").date()
+            elif args.get("day"):
+                weekday = weekday_index(args["day"])
+                today = date.today()
+                search_date = today + timedelta(days=(weekday - today.weekday()) % 7)
+            else:
+                return {"message": "Invalid input", "errors": "date or day is required"}, 400
+            window_start = datetime.strptime(args.get("start", "00:00"), "%H:%M").time()
+            window_end = datetime.strptime(args.get("end", "23:59"), "%H:%M").time()
+        except ValueError as e:
+            return {"message": "Invalid input", "errors": str(e)}, 400
+
+        query = Doctor.query.filter(
+            Doctor.availability_start.isnot(None),
+            Doctor.available_on(search_date.weekday()),
+        )
+        if args.get("specialization"):
+            query = query.filter(func.lower(Doctor.specialization) == args["specialization"].strip().lower())
+
+        # The candidates and their bookings are independent queries, run them
+        # at once. Each gets its own connection, so give back the request's.
+        db.session.close()
+        doctor_ids = query.with_entities(Doctor.doctor_id).statement
+        doctors, booked = await asyncio.gather(
+            run_blocking(lambda: query.options(Doctor.load_details()).with_session(db.session()).all()),
+            run_blocking(booked_in_window, doctor_ids, search_date, window_start, window_end),
+        )
+        matches = search_free_slots(
+            doctors,
+            doctor_ids,
+            search_date,
+            window_start,
+            window_end,
+            current_app.config["APPOINTMENT_SLOT_MINUTES"],
+            booked=booked,
+        )
 
-        return {"status": "success", "data": doctor_list}, 200
+        return {
+            "status": "success",
+            "data": {
+                "date": search_date.strftime("%Y-%m-%d"),
+                "doctors": [
+                    {**doctor_summary_serializer.one(doctor), "slots": slots} for doctor, slots in matches
+                ]
+            }
+        }, 200
 
 
 @doctor_namespace.route("/availability")
 class SetAvailability(Resource):
     @jwt_required()
     def post(self):
-        current_user = get_jwt_identity()
-
-        try:
-            doctor_id = uuid.UUID(current_user)
-        except ValueError:
-            return {"message": "Invalid doctor ID format."}, 400
-
-        doctor = Doctor.query.filter_by(doctor_id=doctor_id).first()
+        doctor = current_doctor()
         if not doctor:
             return {"message": "Doctor not found."}, 403
 
@@ -79,21 +172,18 @@ class SetAvailability(Resource):
         doctor.availability_end = datetime.strptime(
             data["availability_end"], "%H:%M"
         ).time()
-        doctor.days_available = ",".join(data["days_available"])
+        doctor.days_available = data["days_available"]
 
+        # Cached doctor read models are invalidated when this commits
         db.session.commit()
 
-        cache.delete(f"doctor_details:{doctor.doctor_id}")
-        cache.delete(f"doctor_availability:{doctor.doctor_id}")
-        logger.debug(f"Cache invalidated for doctor {doctor.doctor_id}")
-
         return {
             "status": "success",
             "message": "Availability updated successfully.",
             "data": {
                 "availability_start": str(data["availability_start"]),
                 "availability_end": str(data["availability_end"]),
-                "days_available": data["days_available"]
+                "days_available": doctor.days_available
             }
         }, 200
 
@@ -101,105 +191,118 @@ class SetAvailability(Resource):
 @doctor_namespace.route("/availability/<uuid:doctor_id>")
 class GetAvailability(Resource):
     @jwt_required()
-    @cache.cached(timeout=300, key_prefix="doctor_availability")
     def get(self, doctor_id):
-        current_user = get_jwt_identity()
-        logger.debug(f"Fetching cache for doctor availability: {doctor_id}")
-        cached_availability = cache.get(f"doctor_availability:{doctor_id}")
-        if cached_availability:
-            logger.debug(f"Cache hit for doctor availability: {doctor_id}")
-            return {
-                "status": "success",
-                "data": json.loads(cached_availability)
-            }, 200
-
-        requested_doctor = Doctor.query.filter_by(doctor_id=doctor_id).first()
-        if not requested_doctor:
+        def load():
+            requested_doctor = Doctor.query.options(Doctor.load_availability()).filter_by(doctor_id=doctor_id).first()
+            if not requested_doctor:
+                return None
+            data = doctor_availability_serializer.one(requested_doctor)
+            return {"data": data, "etag": content_etag(data)}
+
+        availability = doctor_availability_cache.get_or_set(doctor_id, load)
+        if availability is None:
             return {"message": "Requested doctor not found."}, 404
 
-        data = {
-            "doctor_id": str(requested_doctor.doctor_id),
-            "availability_start": str(requested_doctor.availability_start),
-            "availability_end": str(requested_doctor.availability_end),
-            "days_available": requested_doctor.days_available.split(",")
-            if requested_doctor.days_available else []
-        }
-
-        cache.set(f"doctor_availability:{doctor_id}", json.dumps(data), timeout=300)
-        logger.debug(f"Cache set for doctor availability: {doctor_id}")
-
-        return {"status": "success", "data": data}, 200
+        unchanged = not_modified(availability["etag"])
+        if unchanged is not None:
+            return unchanged
+        return {"status": "success", "data": availability["data"]}, 200, {"ETag": f'"{availability["etag"]}"'}
 
 
 @doctor_namespace.route("/<uuid:doctor_id>")
 class GetDoctorDetails(Resource):
     @jwt_required()
-    @cache.cached(timeout=300, key_prefix="doctor_details")
     def get(self, doctor_id):
-        current_user = get_jwt_identity()
-        logger.debug(f"Fetching cache for doctor details: {doctor_id}")
-        cached_details = cache.get(f"doctor_details:{doctor_id}")
-        if cached_details:
-            logger.debug(f"Cache hit for doctor details: {doctor_id}")
-            return {"status": "success", "data": json.loads(cached_details)}, 200
-
-        requested_doctor = Doctor.query.filter_by(doctor_id=doctor_id).first()
-        if not requested_doctor:
+        def load():
+            requested_doctor = Doctor.query.options(Doctor.load_details()).filter_by(doctor_id=doctor_id).first()
+            if not requested_doctor:
+                return None
+            data = doctor_details_serializer.one(requested_doctor)
+            return {"data": data, "etag": content_etag(data)}
+
+        doctor_details = doctor_details_cache.get_or_set(doctor_id, load)
+        if doctor_details is None:
             return {"message": "Requested doctor not found."}, 404
 
-        doctor_details = {
-            "doctor_id": str(requested_doctor.doctor_id),
-            "firstname": requested_doctor.firstname,
-            "lastname": requested_doctor.lastname,
-            "specialization": requested_doctor.specialization,
-            "availability_start": str(requested_doctor.availability_start),
-            "availability_end": str(requested_doctor.availability_end),
-            "days_available": requested_doctor.days_available.split(",")
-            if requested_doctor.days_available else []
-        }
+        unchanged = not_modified(doctor_details["etag"])
+        if unchanged is not None:
+            return unchanged
+        return {"status": "success", "data": doctor_details["data"]}, 200, {"ETag": f'"{doctor_details["etag"]}"'}
+
 
-        cache.set(f"doctor_details:{doctor_id}", json.dumps(doctor_details), timeout=300)
-        logger.debug(f"Cache set for doctor details: {doctor_id}")
+@doctor_namespace.route("/<uuid:doctor_id>/slots")
+class GetFreeSlots(Resource):
+    @jwt_required()
+    @doctor_namespace.doc(params={
+        "start_date": "First day to search (YYYY-MM-DD), defaults to today",
+        "end_date": "Last day to search (YYYY-MM-DD), defaults to a week after start_date",
+    })
+    async def get(self, doctor_id):
+        try:
+            start_date = datetime.strptime(
+                request.args.get("start_date", date.today().strftime("%Y-%m-%d")), "%Y-%m-%d"
+            ).date()
+            end_date = datetime.strptime(
+                request.args.get("end_date", (start_date + timedelta(days=6)).strftime("%Y-%m-%d")), "%Y-%m-%d"
+            ).date()
+        except ValueError as e:
+            return {"message": "Invalid input", "errors": str(e)}, 400
+
+        max_days = current_app.config["SLOT_SEARCH_MAX_DAYS"]
+        if end_date < start_date or (end_date - start_date).days >= max_days:
+            return {"message": f"end_date must be within {max_days} days after start_date."}, 400
+
+        # The doctor and their bookings are independent lookups, run them at
+        # once. Each gets its own connection, so give back the request's.
+        db.session.close()
+        requested_doctor, booked = await asyncio.gather(
+            run_blocking(lambda: Doctor.query.options(Doctor.load_availability()).filter_by(doctor_id=doctor_id).first()),
+            run_blocking(
+                doctor_slots_cache.get_or_set,
+                doctor_id,
+                lambda: booked_times(doctor_id, start_date, end_date),
+                variant=f"{start_date}:{end_date}",
+            ),
+        )
+        if not requested_doctor:
+            return {"message": "Requested doctor not found."}, 404
 
-        return {"status": "success", "data": doctor_details}, 200
+        minutes = current_app.config["APPOINTMENT_SLOT_MINUTES"]
+        return {
+            "status": "success",
+            "data": {
+                "doctor_id": str(requested_doctor.doctor_id),
+                "slot_minutes": minutes,
+                "days": free_slots(requested_doctor, start_date, end_date, minutes, booked=booked),
+            }
+        }, 200
 
 
 @doctor_namespace.route("/profile")
 class DoctorProfile(Resource):
     @jwt_required()
     def get(self):
-        current_user = get_jwt_identity()
-        logger.debug(f"Fetching profile for user: {current_user}")
-
-        doctor = Doctor.query.filter_by(doctor_id=current_user).first()
+        doctor = current_doctor()
         if not doctor:
             return {"message": "Doctor not found."}, 404
+        logger.debug(f"Fetching profile for user: {doctor.doctor_id}")
 
-        doctor_details = {
-            "doctor_id": str(doctor.doctor_id),
-            "employee_id": doctor.employee_id,
-            "firstname": doctor.firstname,
-            "lastname": doctor.lastname,
-            "specialization": doctor.specialization,
-            "image": doctor.image,
-            "email": doctor.email,
-            "phone": doctor.phone,
-        }
-
-        return {"status": "success", "data": doctor_details}, 200
+        return {"status": "success", "data": doctor_profile_serializer.one(doctor)}, 200
 
     @jwt_required()
     def put(self):
-        current_user = get_jwt_identity()
-        logger.debug(f"Updating profile for user: {current_user}")
-
-        doctor = Doctor.query.filter_by(doctor_id=current_user).first()
+        doctor = current_doctor()
         if not doctor:
             return {"message": "Doctor not found."}, 404
+        logger.debug(f"Updating profile for user: {doctor.doctor_id}")
 
         data = request.get_json()
 
-        doctor.image = data.get('image', doctor.image)
+        if data.get('image'):
+            try:
+                doctor.image_key = save_image_data(data['image'])
+            except ImageRejected as e:
+                return {"message": str(e)}, 400
         doctor.firstname = data.get('firstname', doctor.firstname)
         doctor.lastname = data.get('lastname', doctor.lastname)
         doctor.specialization = data.get('specialization', doctor.specialization)
@@ -214,24 +317,21 @@ class DoctorProfile(Resource):
                 "firstname": doctor.firstname,
                 "lastname": doctor.lastname,
                 "specialization": doctor.specialization,
-                "image": doctor.image
+                "image": image_url(doctor.image_key)
             }
         }, 200
 
     @jwt_required()
     def post(self):
-        current_user = get_jwt_identity()
-        logger.debug(f"Creating profile for user: {current_user}")
-
-        doctor = Doctor.query.filter_by(doctor_id=current_user).first()
+        doctor = current_doctor()
         if not doctor:
             return {"message": "Doctor not found."}, 404
+        logger.debug(f"Creating profile for user: {doctor.doctor_id}")
 
         data = request.get_json()
 
         new_doctor = Doctor(
             doctor_id=uuid.uuid4(),
-            image=data.get('image', ""),
             firstname=data.get('firstname', ""),
             lastname=data.get('lastname', ""),
             specialization=data.get('specialization', "")
@@ -248,6 +348,33 @@ class DoctorProfile(Resource):
                 "firstname": new_doctor.firstname,
                 "lastname": new_doctor.lastname,
                 "specialization": new_doctor.specialization,
-                "image": new_doctor.image
+                "image": image_url(new_doctor.image_key)
             }
         }, 201
+
+
+@doctor_namespace.route("/profile/image")
+class DoctorProfileImage(Resource):
+    @jwt_required()
+    @doctor_namespace.doc(consumes=["multipart/form-data"], params={"image": {"in": "formData", "type": "file", "description": "PNG, JPEG, GIF or WebP image"}})
+    def put(self):
+        """Upload a new profile image as the multipart field "image"."""
+        doctor = current_doctor()
+        if not doctor:
+            return {"message": "Doctor not found."}, 404
+
+        upload = request.files.get("image")
+        if upload is None:
+            return {"message": "An image file is required."}, 400
+        try:
+            doctor.image_key = save_image(upload)
+        except ImageRejected as e:
+            return {"message": str(e)}, 400
+
+        db.session.commit()
+
+        return {
+            "status": "success",
+            "message": "Profile image updated successfully.",
+            "data": {"image": image_url(doctor.image_key)}
+        }, 200
@@ -2,6 +2,7 @@ from flask_restx import fields
 from app import api
 from marshmallow import Schema, fields as ma_fields, ValidationError, validates
 from datetime import datetime
+from app.doctors.models import weekday_index
 
 # RESTX API Models for Swagger documentation
 doctor_register_model = api.model('DoctorRegister', {
@@ -61,3 +62,8 @@ class DoctorAvailabilitySchema(Schema):
     def validate_days(self, value):
         if not value or not isinstance(value, list):
             raise ValidationError("days_available must be a non-empty list of strings")
+        for day in value:
+            try:
+                weekday_index(day)
+            except ValueError:
+                raise ValidationError(f"{day} is not a day of the week")
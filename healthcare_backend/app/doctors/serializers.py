@@ -0,0 +1,34 @@
+from app.images.service import image_url
+from utils.serializers import Serializer
+
+doctor_summary_serializer = Serializer(
+    doctor_id=("doctor_id", str),
+    firstname="firstname",
+    lastname="lastname",
+    specialization="specialization",
+)
+
+# Availability times keep their HH:MM:SS form and None reads "None", as before
+doctor_availability_serializer = Serializer(
+    doctor_id=("doctor_id", str),
+    availability_start=("availability_start", str),
+    availability_end=("availability_end", str),
+    days_available="days_available",
+)
+
+doctor_details_serializer = doctor_summary_serializer.extend(
+    availability_start=("availability_start", str),
+    availability_end=("availability_end", str),
+    days_available="days_available",
+)
+
+doctor_profile_serializer = Serializer(
+    doctor_id=("doctor_id", str),
+    employee_id="employee_id",
+    firstname="firstname",
+    lastname="lastname",
+    specialization="specialization",
+    image=("image_key", image_url),
+    email="email",
+    phone="phone",
+)
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from app import db
+from app.appointments.models import Appointment
+
+
+class SlotGrid:
+    """
+    Splits a daily availability window into fixed-length slots.
+
+    A day's slots are represented as an integer bitmap where bit i is the
+    slot starting i * minutes after the window opens, so marking booked
+    slots and intersecting days are plain bitwise operations.
+    """
+
+    def __init__(self, start, end, minutes):
+        self.start = start
+        self.minutes = minutes
+        self._offset = start.hour * 60 + start.minute
+        length = (end.hour * 60 + end.minute) - self._offset
+        self.size = max(length // minutes, 0)
+        self.full = (1 << self.size) - 1
+        self._labels = [
+            f"{minute // 60:02d}:{minute % 60:02d}"
+            for minute in range(self._offset, self._offset + self.size * minutes, minutes)
+        ]
+        self._times = {}
+
+    def index(self, time):
+        """Return the slot index starting at time, or None if it is not a slot boundary."""
+        delta = time.hour * 60 + time.minute - self._offset
+        if delta < 0 or delta % self.minutes or delta // self.minutes >= self.size:
+            return None
+        return delta // self.minutes
+
+    def started(self, time):
+        """Return the bitmap of slots that start at or before time."""
+        elapsed = time.hour * 60 + time.minute - self._offset
+        if elapsed < 0:
+            return 0
+        return (1 << min(elapsed // self.minutes + 1, self.size)) - 1
+
+    def between(self, start, end):
+        """Return the bitmap of slots that start at or after start and before end."""
+        return self._before(end) & ~self._before(start)
+
+    def _before(self, time):
+        elapsed = time.hour * 60 + time.minute - self._offset
+        if elapsed <= 0:
+            return 0
+        return (1 << min(-(-elapsed // self.minutes), self.size)) - 1
+
+    def times(self, mask):
+        """Return the HH:MM start times of the slots set in mask."""
+        times = self._times.get(mask)
+        if times is None:
+            times = self._times[mask] = [
+                label for i, label in enumerate(self._labels) if mask >> i & 1
+            ]
+        return list(times)
+
+
+def booked_times(doctor_id, start_date, end_date):
+    """
+    Load a doctor's appointments in the date range with one range query.
+
+    Returns:
+        dict: Booked appointment times per date.
+    """
+    rows = db.session.execute(
+        select(Appointment.date, Appointment.time).where(
+            Appointment.doctor_id == doctor_id,
+            Appointment.date >= start_date,
+            Appointment.date <= end_date,
+        )
+    )
+    booked = {}
+    for date, time in rows:
+        booked.setdefault(date, []).append(time)
+    return booked
+
+
+def free_slots(doctor, start_date, end_date, minutes, now=None, booked=None):
+    """
+    Compute a doctor's bookable slots between two dates, inclusive.
+
+    Args:
+        doctor (Doctor): The doctor, with availability set.
+        start_date (datetime.date): First day of the range.
+        end_date (datetime.date): Last day of the range.
+        minutes (int): Slot length in minutes.
+        now (datetime.datetime, optional): Slots before this moment are not
+            bookable. Defaults to the current time.
+        booked (dict, optional): The result of booked_times for the range,
+            loaded from the database when not given.
+
+    Returns:
+        list: {"date": "YYYY-MM-DD", "slots": ["HH:MM", ...]} for every
+        available day that still has free slots.
+    """
+    if not doctor.availability_start or not doctor.availability_end:
+        return []
+
+    grid = SlotGrid(doctor.availability_start, doctor.availability_end, minutes)
+    if not grid.size or not doctor.days_available_mask:
+        return []
+
+    now = now or datetime.now()
+    start_date = max(start_date, now.date())
+    if booked is None:
+        booked = booked_times(doctor.doctor_id, start_date, end_date)
+
+    days = []
+    date = start_date
+    while date <= end_date:
+        if doctor.available_on(date.weekday()):
+            free = grid.full
+            for time in booked.get(date, ()):
+                index = grid.index(time)
+                if index is not None:
+                    free &= ~(1 << index)
+            if date == now.date():
+                free &= ~grid.started(now.time())
+            if free:
+                days.append({"date": date.strftime("%Y-%m-%d"), "slots": grid.times(free)})
+        date += timedelta(days=1)
+    return days
+
+
+def booked_in_window(doctor_ids, date, window_start, window_end):
+    """
+    Load the appointments of many doctors on one day within a time window.
+
+    Args:
+        doctor_ids (Select): A select of the doctors' doctor_id, used as a
+            subquery so the query does not need a huge IN list.
+
+    Returns:
+        dict: Booked appointment times per doctor_id.
+    """
+    rows = db.session.execute(
+        select(Appointment.doctor_id, Appointment.time).where(
+            Appointment.doctor_id.in_(doctor_ids),
+            Appointment.date == date,
+            Appointment.time >= window_start,
+            Appointment.time < window_end,
+        )
+    ).all()
+    booked = {}
+    for doctor_id, time in rows:
+        booked.setdefault(doctor_id, []).append(time)
+    return booked
+
+
+def search_free_slots(doctors, doctor_ids, date, window_start, window_end, minutes, now=None, booked=None):
+    """
+    Find the free slots of many doctors on one day within a time window.
+
+    Appointments for every candidate doctor are loaded with a single query,
+    then each doctor's free slots are computed with bitmap operations.
+
+    Args:
+        doctors (list): Candidate Doctor rows.
+        doctor_ids (Select): A select of the candidates' doctor_id, used as
+            a subquery so the appointment query does not need a huge IN list.
+        date (datetime.date): The day to search.
+        window_start (datetime.time): Earliest slot start.
+        window_end (datetime.time): Slots must start before this time.
+        minutes (int): Slot length in minutes.
+        now (datetime.datetime, optional): Slots before this moment are not
+            bookable. Defaults to the current time.
+        booked (dict, optional): The result of booked_in_window for the
+            candidates, loaded from the database when not given.
+
+    Returns:
+        list: (doctor, ["HH:MM", ...]) for every doctor with a free slot.
+    """
+    now = now or datetime.now()
+    if date < now.date():
+        return []
+
+    if booked is None:
+        booked = booked_in_window(doctor_ids, date, window_start, window_end)
+
+    # Doctors mostly share a handful of availability windows, so their
+    # grids and rendered slot labels are shared too.
+    grids = {}
+    results = []
+    for doctor in doctors:
+        if not doctor.availability_start or not doctor.availability_end:
+            continue
+        if not doctor.available_on(date.weekday()):
+            continue
+
+        window = (doctor.availability_start, doctor.availability_end)
+        if window not in grids:
+            grid = SlotGrid(*window, minutes)
+            grids[window] = (grid, grid.between(window_start, window_end))
+        grid, free = grids[window]
+        for time in booked.get(doctor.doctor_id, ()):
+            index = grid.index(time)
+            if index is not None:
+                free &= ~(1 << index)
+        if date == now.date():
+            free &= ~grid.started(now.time())
+        if free:
+            results.append((doctor, grid.times(free)))
+    return results
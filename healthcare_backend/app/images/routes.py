@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+from flask import request, current_app, send_file
+from flask_restx import Namespace, Resource
+from app.images.service import blob_store, blob_mimetype, thumbnail_key
+
+image_namespace = Namespace("images", description="Profile images")
+
+
+@image_namespace.route("/<string:key>")
+class ImageResource(Resource):
+    @image_namespace.doc(params={"size": "Serve the smallest thumbnail at least this many pixels wide"})
+    @image_namespace.response(200, "Image bytes")
+    @image_namespace.response(206, "Partial image bytes for a Range request")
+    @image_namespace.response(304, "Not modified")
+    @image_namespace.response(404, "Image not found")
+    def get(self, key):
+        """
+        Serve an image, or one of its thumbnails.
+
+        Images are content addressed, so a key always names the same bytes:
+        the key is the ETag and responses may be cached indefinitely. No
+        token is needed, so <img> tags can load them; keys are SHA-256
+        digests and cannot be guessed.
+        """
+        if not blob_store.exists(key):
+            return {"status": "error", "message": "Image not found"}, 404
+
+        size = request.args.get("size", type=int)
+        if size:
+            key = thumbnail_key(key, size)
+
+        response = send_file(
+            blob_store.path(key),
+            mimetype=blob_mimetype(key),
+            etag=key,
+            conditional=True,
+            max_age=current_app.config["IMAGE_CACHE_MAX_AGE"],
+        )
+        response.cache_control.immutable = True
+        return response
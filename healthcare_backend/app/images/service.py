@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+import base64
+import binascii
+import functools
+import importlib.util
+import io
+import logging
+from flask import current_app, request
+from werkzeug.datastructures import FileStorage
+from app import api
+from utils.blob_store import BlobStore, BlobTooLarge
+
+logger = logging.getLogger(__name__)
+
+blob_store = BlobStore()
+
+SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+]
+
+
+class ImageRejected(Exception):
+    """Raised when an upload is not an accepted image."""
+
+
+def sniff_mimetype(head):
+    """Return the image MIME type for the first bytes of a file, or None."""
+    for signature, mimetype in SIGNATURES:
+        if head.startswith(signature):
+            return mimetype
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def blob_mimetype(key):
+    with blob_store.open(key) as blob:
+        return sniff_mimetype(blob.read(12)) or "application/octet-stream"
+
+
+def save_image(upload):
+    """
+    Stream an uploaded image into the blob store and render its thumbnails.
+
+    Args:
+        upload (werkzeug.datastructures.FileStorage): The uploaded file.
+
+    Returns:
+        str: The blob key to store on the model.
+
+    Raises:
+        ImageRejected: If the upload is not a PNG, JPEG, GIF or WebP image,
+            is larger than IMAGE_MAX_BYTES or has more than IMAGE_MAX_PIXELS.
+    """
+    stream = upload.stream
+    head = stream.read(12)
+    stream.seek(0)
+    if sniff_mimetype(head) is None:
+        raise ImageRejected("Only PNG, JPEG, GIF and WebP images are accepted")
+    check_dimensions(stream)
+
+    try:
+        key = blob_store.put(stream)
+    except BlobTooLarge:
+        raise ImageRejected(f"Images must be at most {blob_store.max_bytes} bytes")
+
+    make_thumbnails(key)
+    return key
+
+
+def save_image_data(value):
+    """
+    Store an image sent inline as base64 or as a data URI, as older clients do.
+
+    A URL returned by image_url is accepted too, so clients can send back
+    the profile they fetched unchanged.
+
+    Raises:
+        ImageRejected: If value is not base64 or not an accepted image.
+    """
+    key = value.rpartition("/images/")[2]
+    if key != value and blob_store.exists(key):
+        return key
+
+    if value.startswith("data:"):
+        value = value.partition(",")[2]
+    try:
+        data = base64.b64decode(value, validate=True)
+    except (binascii.Error, ValueError):
+        raise ImageRejected("Image must be an uploaded file or base64 encoded")
+    return save_image(FileStorage(io.BytesIO(data)))
+
+
+def require_pillow():
+    """
+    Fail at startup when Pillow is missing.
+
+    Without it uploads would get no thumbnails and no decompression bomb
+    check. Only looks the package up, importing it is left to the first
+    upload.
+
+    Raises:
+        RuntimeError: If Pillow is not installed.
+    """
+    if importlib.util.find_spec("PIL") is None:
+        raise RuntimeError("Pillow is required for profile images, install requirements.txt")
+
+
+@functools.cache
+def pillow_image():
+    """
+    Return Pillow's Image module.
+
+    Imported on the first upload rather than at startup, as only image
+    uploads need it.
+    """
+    from PIL import Image
+    return Image
+
+
+def check_dimensions(stream):
+    """
+    Reject an image too large to decode, before it is stored.
+
+    A small compressed file can hold a huge image, which would exhaust
+    memory when thumbnails are rendered. Only the header is read.
+
+    Raises:
+        ImageRejected: If the image has more than IMAGE_MAX_PIXELS.
+    """
+    Image = pillow_image()
+    max_pixels = current_app.config["IMAGE_MAX_PIXELS"]
+    try:
+        with Image.open(stream) as image:
+            too_large = image.width * image.height > max_pixels
+    except Image.DecompressionBombError:
+        too_large = True
+    except (OSError, ValueError):
+        # Undecodable images are stored and served without thumbnails
+        too_large = False
+    stream.seek(0)
+    if too_large:
+        raise ImageRejected(f"Images must be at most {max_pixels} pixels")
+
+
+def make_thumbnails(key):
+    """Render the IMAGE_THUMBNAIL_SIZES thumbnails of an image."""
+    Image = pillow_image()
+    for size in current_app.config["IMAGE_THUMBNAIL_SIZES"]:
+        if blob_store.exists(f"{key}-{size}"):
+            continue
+        try:
+            with blob_store.open(key) as blob, Image.open(blob) as image:
+                image.thumbnail((size, size))
+                output = io.BytesIO()
+                if image.mode in ("RGBA", "LA", "P"):
+                    image.save(output, "PNG", optimize=True)
+                else:
+                    image.convert("RGB").save(output, "JPEG", quality=85, optimize=True)
+        except (OSError, ValueError, Image.DecompressionBombError):
+            logger.warning(f"Could not render a {size}px thumbnail of image {key}", exc_info=True)
+            return
+        blob_store.put_derived(key, str(size), output.getvalue())
+
+
+def thumbnail_key(key, size):
+    """Return the key of the best stored rendition of an image for a requested size."""
+    sizes = sorted(current_app.config["IMAGE_THUMBNAIL_SIZES"])
+    for candidate in sizes:
+        if size <= candidate and blob_store.exists(f"{key}-{candidate}"):
+            return f"{key}-{candidate}"
+    return key
+
+
+def image_url(key):
+    """Return the absolute URL an image is served from, or None when there is no image."""
+    return f"{request.host_url.rstrip('/')}{api.prefix}/images/{key}" if key else None
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+import time
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from app.notifications.outbox import email_dispatcher
+
+mail_cli = AppGroup("mail", help="Outbound email queue commands.")
+
+
+@mail_cli.command("dispatch")
+@click.option("--once", is_flag=True, help="Deliver a single batch and exit.")
+def dispatch(once):
+    """Deliver queued emails from the outbox."""
+    if once:
+        sent = email_dispatcher.dispatch_pending()
+        click.echo(f"Dispatched {sent} email(s).")
+        return
+
+    email_dispatcher.start()
+    click.echo("Email dispatcher running, press CTRL+C to stop.")
+    try:
+        while True:
+            time.sleep(current_app.config["MAIL_DISPATCHER_POLL_INTERVAL"])
+    except KeyboardInterrupt:
+        email_dispatcher.stop()
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, Text, Index
+from app import db
+
+
+class EmailOutbox(db.Model):
+    """
+    Represents an outbound email waiting to be delivered by the dispatcher.
+    """
+    __tablename__ = 'email_outbox'
+    __table_args__ = (
+        Index('ix_email_outbox_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+
+    email_id = Column(Integer, primary_key=True)
+    recipient = Column(String(100), nullable=False)
+    subject = Column(String(255), nullable=False)
+    body = Column(Text, nullable=False)
+    status = Column(String(20), nullable=False, default='pending')
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<EmailOutbox {self.email_id} {self.status}>"
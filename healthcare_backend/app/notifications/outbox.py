@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from app import db
+from app.notifications.models import EmailOutbox
+from utils.mail import send_batch
+
+logger = logging.getLogger(__name__)
+
+
+def queue_email(subject, recipient, body):
+    """
+    Add an email to the outbox as part of the current database transaction.
+
+    The row is committed together with the caller's changes, so an email is
+    only ever delivered for work that was actually persisted.
+
+    Returns:
+        EmailOutbox: The queued row, or None when there is no recipient.
+    """
+    if not recipient:
+        return None
+
+    email = EmailOutbox(recipient=recipient, subject=subject, body=body)
+    db.session.add(email)
+    return email
+
+
+def outbox_metrics():
+    """Metrics collector reporting the emails waiting in the outbox."""
+    rows = (
+        db.session.query(EmailOutbox.status, func.count(), func.min(EmailOutbox.created_at))
+        .filter(EmailOutbox.status.in_(("pending", "failed")))
+        .group_by(EmailOutbox.status)
+        .all()
+    )
+    counts = {"pending": 0, "failed": 0}
+    oldest_pending = 0.0
+    for status, count, oldest in rows:
+        counts[status] = count
+        if status == "pending" and oldest is not None:
+            oldest_pending = max((datetime.utcnow() - oldest).total_seconds(), 0.0)
+    return [
+        ("email_outbox_depth", "gauge", "Emails waiting in the outbox, or given up on.",
+         [({"status": status}, count) for status, count in counts.items()]),
+        ("email_outbox_oldest_pending_seconds", "gauge", "Age of the oldest email waiting to be sent.",
+         [({}, oldest_pending)]),
+    ]
+
+
+class EmailDispatcher:
+    """
+    Delivers queued emails from the outbox in the background.
+
+    Pending rows are claimed in batches, split into chunks and sent by a pool
+    of worker threads, each chunk over a single SMTP connection. Failed emails
+    are retried with exponential backoff until MAIL_MAX_ATTEMPTS is reached.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._executor = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions["email_dispatcher"] = self
+
+    def start(self):
+        """Start the background dispatch loop if it is not already running."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.app.config["MAIL_DISPATCHER_WORKERS"],
+            thread_name_prefix="email-dispatcher",
+        )
+        self._thread = threading.Thread(target=self._run, name="email-dispatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Stop the dispatch loop and wait for in-flight batches to finish."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def wake(self):
+        """Ask the dispatch loop to poll the outbox now instead of waiting."""
+        self._wake.set()
+
+    def _run(self):
+        interval = self.app.config["MAIL_DISPATCHER_POLL_INTERVAL"]
+        while not self._stop.is_set():
+            try:
+                with self.app.app_context():
+                    sent = self.dispatch_pending()
+            except Exception:
+                logger.exception("Email dispatch failed")
+                sent = 0
+            # Drain a backlog without sleeping between full batches.
+            if sent < self.app.config["MAIL_DISPATCHER_BATCH_SIZE"]:
+                self._wake.wait(interval)
+                self._wake.clear()
+
+    def dispatch_pending(self):
+        """
+        Claim one batch of due emails and try to deliver it.
+
+        Must be called inside an application context.
+
+        Returns:
+            int: The number of emails that were claimed.
+        """
+        config = self.app.config
+        now = datetime.utcnow()
+        emails = (
+            EmailOutbox.query
+            .filter(EmailOutbox.status == "pending", EmailOutbox.next_attempt_at <= now)
+            .order_by(EmailOutbox.next_attempt_at, EmailOutbox.email_id)
+            .limit(config["MAIL_DISPATCHER_BATCH_SIZE"])
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        if not emails:
+            db.session.rollback()
+            return 0
+
+        chunk_size = config["MAIL_DISPATCHER_CONNECTION_BATCH"]
+        chunks = [emails[i:i + chunk_size] for i in range(0, len(emails), chunk_size)]
+        payloads = [[(e.subject, e.recipient, e.body) for e in chunk] for chunk in chunks]
+
+        if self._executor is not None and len(chunks) > 1:
+            results = list(self._executor.map(self._send_chunk, payloads))
+        else:
+            results = [self._send_chunk(payload) for payload in payloads]
+
+        for chunk, errors in zip(chunks, results):
+            for email, error in zip(chunk, errors):
+                self._record_result(email, error, now)
+
+        db.session.commit()
+        return len(emails)
+
+    def _send_chunk(self, payload):
+        with self.app.app_context():
+            return send_batch(payload)
+
+    def _record_result(self, email, error, now):
+        config = self.app.config
+        email.attempts += 1
+        if error is None:
+            email.status = "sent"
+            email.sent_at = now
+            email.last_error = None
+            return
+
+        email.last_error = error
+        if email.attempts >= config["MAIL_MAX_ATTEMPTS"]:
+            email.status = "failed"
+            logger.error(f"Giving up on email {email.email_id} after {email.attempts} attempts: {error}")
+            return
+
+        delay = min(
+            config["MAIL_RETRY_BACKOFF"] * 2 ** (email.attempts - 1),
+            config["MAIL_RETRY_BACKOFF_MAX"],
+        )
+        email.next_attempt_at = now + timedelta(seconds=delay)
+        logger.warning(f"Email {email.email_id} failed, retrying in {delay}s: {error}")
+
+
+email_dispatcher = EmailDispatcher()
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from app.onboarding.importer import parse_records, import_users, FORMATS
+
+users_cli = AppGroup("users", help="Patient and doctor account commands.")
+
+
+@users_cli.command("import")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--role", type=click.Choice(["patient", "doctor"]), required=True)
+@click.option("--format", type=click.Choice(FORMATS), help="Defaults to the file extension.")
+@click.option("--batch-size", type=int, help="Rows per transaction.")
+@click.option("--report", type=click.File("w"), help="Write the per-row error report here as JSON.")
+def import_command(path, role, format, batch_size, report):
+    """Register patients or doctors in bulk from a CSV or NDJSON file."""
+    format = format or ("csv" if os.path.splitext(path)[1].lower() == ".csv" else "ndjson")
+    batch_size = batch_size or current_app.config["ONBOARDING_BATCH_SIZE"]
+
+    with open(path, encoding="utf-8-sig", newline="") as lines:
+        result = import_users(role, parse_records(lines, format), batch_size=batch_size)
+
+    summary = result.to_dict()
+    click.echo(f"Imported {summary['created']} of {summary['total']} {role} record(s), {summary['rejected']} rejected.")
+    if report:
+        json.dump(summary["errors"], report, indent=2)
+    else:
+        for error in summary["errors"][:20]:
+            click.echo(f"  row {error['row']}: " + "; ".join(e["message"] for e in error["errors"]))
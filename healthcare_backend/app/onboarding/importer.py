@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+import csv
+import json
+from sqlalchemy import insert, select, or_
+from sqlalchemy.exc import DataError, IntegrityError
+from app import db
+from app.auth.passwords import password_hasher
+from app.auth.validation import (
+    required_fields, optional_fields, validate_registration, integrity_error_fields, UNIQUE_FIELD_MESSAGES,
+)
+from app.doctors.cache import mark_directory_stale
+from app.doctors.models import Doctor
+from app.patients.models import Patient
+from utils.error_list import add_error_to_list
+
+ROLE_MODELS = {
+    "patient": Patient,
+    "doctor": Doctor,
+}
+
+FORMATS = ("csv", "ndjson")
+
+
+def parse_records(lines, format):
+    """
+    Parse an import file into records.
+
+    Args:
+        lines: An iterable of text lines, such as an open file.
+        format (str): "csv", with a header row naming the fields, or "ndjson".
+
+    Yields:
+        tuple: (row number, dict of fields), or (row number, None) for a
+        line that could not be parsed. Rows are numbered from 1, not
+        counting the CSV header.
+    """
+    if format == "csv":
+        for number, record in enumerate(csv.DictReader(lines), start=1):
+            # Empty cells count as missing, like absent JSON keys
+            yield number, {key: value for key, value in record.items() if key and value}
+        return
+
+    number = 0
+    for line in lines:
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield number, record if isinstance(record, dict) else None
+
+
+def _batches(records, size):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class ImportReport:
+    """Counts of an import and the errors of every rejected row."""
+
+    def __init__(self):
+        self.total = 0
+        self.created = 0
+        self.errors = []
+
+    def reject(self, number, errors_list):
+        self.errors.append({"row": number, "errors": errors_list})
+
+    def to_dict(self):
+        return {
+            "total": self.total,
+            "created": self.created,
+            "rejected": len(self.errors),
+            "errors": sorted(self.errors, key=lambda error: error["row"]),
+        }
+
+
+def import_users(role, records, batch_size=1000):
+    """
+    Register patients or doctors in bulk.
+
+    Each batch is validated with the same rules as a single registration,
+    checked against existing users with one query, hashed across the
+    password hashing pool and inserted with a single executemany in its own
+    transaction. Invalid rows, including rows with fields other than the
+    registration and optional profile fields, values that are not strings
+    or values too long for their column, are reported and skipped; the
+    rest of the batch is still imported.
+
+    Args:
+        role (str): "patient" or "doctor".
+        records: (row number, dict) pairs, as produced by parse_records.
+        batch_size (int): Rows per transaction.
+
+    Returns:
+        ImportReport: The outcome of the import.
+    """
+    model = ROLE_MODELS[role]
+    columns = required_fields(role)
+    optional = optional_fields(role)
+    allowed = set(columns) | set(optional)
+    report = ImportReport()
+    seen = {"email": set(), "phone": set()}
+
+    for batch in _batches(records, batch_size):
+        report.total += len(batch)
+        valid = []
+        for number, data in batch:
+            if data is None:
+                report.reject(number, [{"field": None, "message": "Row could not be parsed"}])
+                continue
+            errors_list = validate_registration(data, role)
+            for field in sorted(set(data) - allowed):
+                add_error_to_list(errors_list, field, "Unknown field")
+            errors_list.extend(_value_errors(model, data, optional))
+            for field in ("email", "phone"):
+                if isinstance(data.get(field), str) and data[field] in seen[field]:
+                    add_error_to_list(errors_list, field, f"{field.capitalize()} appears more than once in this import")
+            if errors_list:
+                report.reject(number, errors_list)
+                continue
+            seen["email"].add(data["email"])
+            seen["phone"].add(data["phone"])
+            valid.append((number, data))
+
+        valid = _reject_taken(model, valid, report)
+        if not valid:
+            continue
+
+        hashes = password_hasher.hash_many(data["password"] for _, data in valid)
+        rows = []
+        for (number, data), pwhash in zip(valid, hashes):
+            row = {column: data[column] for column in columns}
+            # Every row needs the same keys for the executemany
+            row.update((field, data.get(field)) for field in optional)
+            row["password"] = pwhash
+            rows.append(row)
+
+        if model is Doctor:
+            mark_directory_stale(db.session)
+        try:
+            db.session.execute(insert(model), rows)
+            db.session.commit()
+            report.created += len(rows)
+        except (IntegrityError, DataError):
+            # Someone registered one of these users since _reject_taken, or
+            # a value the checks above let through does not fit its column;
+            # insert row by row to find out which.
+            db.session.rollback()
+            _insert_one_by_one(model, valid, rows, report)
+    return report
+
+
+def _value_errors(model, data, optional):
+    """Check the optional fields' types and every value against its column length."""
+    errors_list = []
+    for field in optional:
+        if data.get(field) is not None and not isinstance(data[field], str):
+            add_error_to_list(errors_list, field, f"{field.replace('_', ' ').capitalize()} must be a string")
+    for field, value in data.items():
+        # The password column holds its hash, not the value
+        if field == "password" or field not in model.__table__.c or not isinstance(value, str):
+            continue
+        length = getattr(model.__table__.c[field].type, "length", None)
+        if length is not None and len(value) > length:
+            add_error_to_list(
+                errors_list, field, f"{field.replace('_', ' ').capitalize()} must be at most {length} characters",
+            )
+    return errors_list
+
+
+def _reject_taken(model, valid, report):
+    if not valid:
+        return valid
+    emails = [data["email"] for _, data in valid]
+    phones = [data["phone"] for _, data in valid]
+    taken = db.session.execute(
+        select(model.email, model.phone).where(or_(model.email.in_(emails), model.phone.in_(phones)))
+    ).all()
+    taken_emails = {row.email for row in taken}
+    taken_phones = {row.phone for row in taken}
+
+    remaining = []
+    for number, data in valid:
+        errors_list = []
+        if data["email"] in taken_emails:
+            add_error_to_list(errors_list, "email", UNIQUE_FIELD_MESSAGES["email"])
+        if data["phone"] in taken_phones:
+            add_error_to_list(errors_list, "phone", UNIQUE_FIELD_MESSAGES["phone"])
+        if errors_list:
+            report.reject(number, errors_list)
+        else:
+            remaining.append((number, data))
+    return remaining
+
+
+def _insert_one_by_one(model, valid, rows, report):
+    for (number, _), row in zip(valid, rows):
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(model), [row])
+            report.created += 1
+        except (IntegrityError, DataError) as e:
+            report.reject(number, integrity_error_fields(e) or [{"field": None, "message": str(e.orig)}])
+    if model is Doctor:
+        mark_directory_stale(db.session)
+    db.session.commit()
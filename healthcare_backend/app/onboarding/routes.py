@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+import io
+from flask import request, current_app
+from flask_restx import Namespace, Resource
+from app.auth.identity import admin_required
+from app.onboarding.importer import parse_records, import_users, FORMATS
+
+onboarding_namespace = Namespace("onboarding", description="Bulk patient and doctor onboarding")
+
+ROLES = {"patients": "patient", "doctors": "doctor"}
+
+CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+}
+
+
+@onboarding_namespace.route("/<string:role>")
+class BulkImport(Resource):
+    @admin_required
+    @onboarding_namespace.doc(params={
+        "role": "patients or doctors",
+        "format": "csv or ndjson, defaults to the request or file content type",
+    })
+    @onboarding_namespace.response(200, "Import finished, see the per-row error report")
+    @onboarding_namespace.response(400, "Invalid input")
+    @onboarding_namespace.response(403, "Unauthorized, admin only")
+    def post(self, role):
+        """
+        Register patients or doctors in bulk (Admin only).
+
+        Send the records as the request body, or as a multipart upload in
+        a field named "file". CSV files need a header row with the same
+        field names as the registration endpoints. Patients may also carry
+        the profile fields address, age, weight, height and blood_group;
+        rows with any other field are rejected.
+        """
+        if role not in ROLES:
+            return {"status": "error", "message": "Role must be patients or doctors"}, 400
+
+        # Imports may be far larger than the MAX_CONTENT_LENGTH of other requests
+        request.max_content_length = current_app.config["ONBOARDING_MAX_BYTES"]
+        upload = request.files.get("file")
+        content_type = upload.mimetype if upload else request.mimetype
+        format = request.args.get("format") or CONTENT_TYPES.get(content_type)
+        if format not in FORMATS:
+            return {"status": "error", "message": "Format must be csv or ndjson"}, 400
+
+        stream = upload.stream if upload else request.stream
+        lines = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+
+        report = import_users(
+            ROLES[role],
+            parse_records(lines, format),
+            batch_size=current_app.config["ONBOARDING_BATCH_SIZE"],
+        )
+        return {
+            "status": "success" if not report.errors else "partial",
+            "data": report.to_dict(),
+        }, 200
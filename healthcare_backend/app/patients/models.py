@@ -1,8 +1,8 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, DateTime, Text
+from sqlalchemy import Column, String, DateTime
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred, undefer_group
 from app import db
 
 
@@ -13,18 +13,21 @@ class Patient(db.Model):
     __tablename__ = 'patients'
 
     patient_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True)
-    image = Column(Text, nullable=True)
-    blood_group = Column(String(10), nullable=True)
-    address = Column(String(255), nullable=True)
-    age = Column(String(3), nullable=True)
-    weight = Column(String(10), nullable=True)
-    height = Column(String(10), nullable=True)
+    # Profile details are only read by the profile endpoints, see load_profile
+    # Blob store key of the profile image, see app.images
+    image_key = deferred(Column(String(80), nullable=True), group="profile")
+    blood_group = deferred(Column(String(10), nullable=True), group="profile")
+    address = deferred(Column(String(255), nullable=True), group="profile")
+    age = deferred(Column(String(3), nullable=True), group="profile")
+    weight = deferred(Column(String(10), nullable=True), group="profile")
+    height = deferred(Column(String(10), nullable=True), group="profile")
     firstname = Column(String(100), nullable=False)
     lastname = Column(String(100), nullable=False)
     email = Column(String(100), unique=True, nullable=False)
     phone = Column(String(15), unique=True, nullable=False)
     date_of_birth = Column(DateTime, nullable=False)
-    password = Column(String(255), nullable=False)
+    # Only login needs the hash, see load_credentials
+    password = deferred(Column(String(255), nullable=False), group="credentials")
     created_at = Column(DateTime, default=datetime.utcnow)
 
     appointments = relationship("Appointment", back_populates="patient")
@@ -32,5 +35,15 @@ class Patient(db.Model):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
+    @classmethod
+    def load_profile(cls):
+        """Query option loading the deferred profile details along with the row."""
+        return undefer_group("profile")
+
+    @classmethod
+    def load_credentials(cls):
+        """Query option loading the deferred password hash along with the row."""
+        return undefer_group("credentials")
+
     def __repr__(self):
         return f"<Patient {self.firstname} {self.lastname}>"
@@ -1,9 +1,12 @@
 from flask_restx import Namespace, Resource
 from flask import request
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from app.auth.routes import UserRegister, UserLogin
 from app.patients.models import Patient
+from app.auth.identity import current_patient
+from app.images.service import save_image, save_image_data, image_url, ImageRejected
 from app import db
+from app.patients.serializers import patient_profile_serializer
 import logging
 
 logger = logging.getLogger(__name__)
@@ -27,41 +30,29 @@ class PatientLogin(UserLogin):
 class PatientProfile(Resource):
     @jwt_required()
     def get(self):
-        current_user = get_jwt_identity()
-        logger.debug(f"Fetching profile for user: {current_user}")
-
-        patient = Patient.query.filter_by(patient_id=current_user).first()
+        patient = current_patient()
         if not patient:
             return {"message": "Patient not found."}, 404
+        logger.debug(f"Fetching profile for user: {patient.patient_id}")
 
-        patient_details = {
-            "id": str(patient.patient_id),
-            "image": patient.image,
-            "name": f"{patient.firstname} {patient.lastname}",
-            "email": patient.email,
-            "phone": patient.phone,
-            "address": patient.address,
-            "age": patient.age,
-            "weight": patient.weight,
-            "height": patient.height,
-            "blood_group": patient.blood_group,
-        }
         return {
             "status": "success",
-            "data": patient_details
+            "data": patient_profile_serializer.one(patient)
         }, 200
 
     @jwt_required()
     def put(self):
-        current_user = get_jwt_identity()
-        logger.debug(f"Updating profile for user: {current_user}")
-
-        patient = Patient.query.filter_by(patient_id=current_user).first()
+        patient = current_patient()
         if not patient:
             return {"message": "Patient not found."}, 404
+        logger.debug(f"Updating profile for user: {patient.patient_id}")
 
         data = request.get_json()
-        patient.image = data.get('image', patient.image)
+        if data.get('image'):
+            try:
+                patient.image_key = save_image_data(data['image'])
+            except ImageRejected as e:
+                return {"message": str(e)}, 400
         patient.firstname = data.get('firstName', patient.firstname)
         patient.lastname = data.get('lastName', patient.lastname)
         patient.email = data.get('email', patient.email)
@@ -81,15 +72,17 @@ class PatientProfile(Resource):
 
     @jwt_required()
     def post(self):
-        current_user = get_jwt_identity()
-        logger.debug(f"Creating profile for user: {current_user}")
-
-        patient = Patient.query.filter_by(patient_id=current_user).first()
+        patient = current_patient()
         if not patient:
             return {"message": "Patient not found."}, 404
+        logger.debug(f"Creating profile for user: {patient.patient_id}")
 
         data = request.get_json()
-        patient.image = data.get('image', patient.image)
+        if data.get('image'):
+            try:
+                patient.image_key = save_image_data(data['image'])
+            except ImageRejected as e:
+                return {"message": str(e)}, 400
         patient.firstname = data.get('firstName', patient.firstname)
         patient.lastname = data.get('lastName', patient.lastname)
         patient.email = data.get('email', patient.email)
@@ -106,3 +99,30 @@ class PatientProfile(Resource):
             "status": "success",
             "message": "Profile created successfully."
         }, 201
+
+
+@patient_namespace.route("/profile/image")
+class PatientProfileImage(Resource):
+    @jwt_required()
+    @patient_namespace.doc(consumes=["multipart/form-data"], params={"image": {"in": "formData", "type": "file", "description": "PNG, JPEG, GIF or WebP image"}})
+    def put(self):
+        """Upload a new profile image as the multipart field "image"."""
+        patient = current_patient()
+        if not patient:
+            return {"message": "Patient not found."}, 404
+
+        upload = request.files.get("image")
+        if upload is None:
+            return {"message": "An image file is required."}, 400
+        try:
+            patient.image_key = save_image(upload)
+        except ImageRejected as e:
+            return {"message": str(e)}, 400
+
+        db.session.commit()
+
+        return {
+            "status": "success",
+            "message": "Profile image updated successfully.",
+            "data": {"image": image_url(patient.image_key)}
+        }, 200
@@ -0,0 +1,15 @@
+from app.images.service import image_url
+from utils.serializers import Serializer
+
+patient_profile_serializer = Serializer(
+    id=("patient_id", str),
+    image=("image_key", image_url),
+    name=(None, lambda patient: f"{patient.firstname} {patient.lastname}"),
+    email="email",
+    phone="phone",
+    address="address",
+    age="age",
+    weight="weight",
+    height="height",
+    blood_group="blood_group",
+)
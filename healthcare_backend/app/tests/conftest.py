@@ -0,0 +1,51 @@
+import pytest
+from app import create_app, db
+from utils.smtp_sink import SMTPSink
+
+
+@pytest.fixture
+def smtp_sink():
+    with SMTPSink() as sink:
+        yield sink
+
+
+def make_config(tmp_path, smtp_sink, **overrides):
+    return {
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'test.db'}",
+        "JWT_SECRET_KEY": "test-secret",
+        "CACHE_TYPE": "SimpleCache",
+        "MAIL_SERVER": smtp_sink.host,
+        "MAIL_PORT": smtp_sink.port,
+        "MAIL_USE_TLS": False,
+        "MAIL_SUPPRESS_SEND": False,
+        "MAIL_DEFAULT_SENDER": "noreply@tiberbu.test",
+        "PASSWORD_HASH_WORKERS": 0,
+        "PASSWORD_HASH_METHOD": "pbkdf2:sha256:1000",
+        "IMAGE_STORE_PATH": str(tmp_path / "blobs"),
+        **overrides,
+    }
+
+
+@pytest.fixture
+def app(tmp_path, smtp_sink):
+    app = create_app(make_config(tmp_path, smtp_sink))
+    with app.app_context():
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def replicated_app(tmp_path, smtp_sink):
+    """
+    The app with a second SQLite database standing in for a read replica.
+
+    Nothing replicates between the two, so tests can tell which database a
+    read went to by giving the replica different rows.
+    """
+    app = create_app(make_config(
+        tmp_path, smtp_sink, DATABASE_REPLICA_URIS=[f"sqlite:///{tmp_path / 'replica.db'}"],
+    ))
+    with app.app_context():
+        yield app
+        db.session.remove()
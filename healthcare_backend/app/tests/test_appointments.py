@@ -0,0 +1,385 @@
+import gzip
+import json
+import os
+import threading
+import uuid
+from datetime import datetime, date, time
+import pytest
+from sqlalchemy import MetaData, event
+from flask_jwt_extended import create_access_token
+from app import create_app, db
+from app.doctors.models import Doctor
+from app.patients.models import Patient
+from app.appointments.models import Appointment
+from app.appointments.reservations import reserve_slot, move_slot, SlotUnavailable
+from app.notifications.models import EmailOutbox
+from app.notifications.outbox import queue_email, email_dispatcher
+from app.tests.conftest import make_config
+from utils.metrics import mark_process_dead
+from utils.pagination import encode_cursor
+from utils.prefork import after_fork
+
+THREADS = 16
+
+
+@pytest.fixture
+def outbox(app):
+    EmailOutbox.__table__.create(db.engine)
+    return EmailOutbox
+
+
+def test_queued_emails_are_delivered_over_one_connection(app, outbox, smtp_sink):
+    for i in range(3):
+        queue_email("Appointment Confirmation", f"patient{i}@example.com", "Booked.")
+    db.session.commit()
+
+    assert email_dispatcher.dispatch_pending() == 3
+
+    assert sorted(m["To"] for m in smtp_sink.messages) == [
+        "patient0@example.com", "patient1@example.com", "patient2@example.com",
+    ]
+    assert smtp_sink.connections == 1
+    assert {e.status for e in outbox.query.all()} == {"sent"}
+
+
+def test_failed_email_is_retried_with_backoff(app, outbox):
+    app.config["MAIL_PORT"] = 1  # Read when the first email is sent
+    queue_email("Appointment Cancellation", "patient@example.com", "Cancelled.")
+    db.session.commit()
+
+    before = datetime.utcnow()
+    email_dispatcher.dispatch_pending()
+    email = outbox.query.one()
+
+    assert email.status == "pending"
+    assert email.attempts == 1
+    assert email.last_error
+    assert (email.next_attempt_at - before).total_seconds() >= app.config["MAIL_RETRY_BACKOFF"]
+    # Not due yet, so the next poll leaves it alone.
+    assert email_dispatcher.dispatch_pending() == 0
+
+
+def test_email_is_abandoned_after_max_attempts(app, outbox):
+    app.config["MAIL_PORT"] = 1  # Read when the first email is sent
+    app.config["MAIL_MAX_ATTEMPTS"] = 1
+    queue_email("Appointment Rescheduled", "patient@example.com", "Moved.")
+    db.session.commit()
+
+    email_dispatcher.dispatch_pending()
+
+    assert outbox.query.one().status == "failed"
+
+
+@pytest.fixture
+def appointments(app):
+    Appointment.__table__.create(db.engine)
+    return Appointment
+
+
+def test_concurrent_bookings_for_one_slot_have_exactly_one_winner(app, appointments):
+    doctor_id = uuid.uuid4()
+    slot = (date(2025, 5, 6), time(9, 30))
+    barrier = threading.Barrier(THREADS)
+    outcomes = []
+
+    def book():
+        with app.app_context():
+            barrier.wait()
+            try:
+                reserve_slot(uuid.uuid4(), doctor_id, *slot)
+                db.session.commit()
+                outcomes.append("booked")
+            except SlotUnavailable:
+                db.session.rollback()
+                outcomes.append("conflict")
+            finally:
+                db.session.remove()
+
+    threads = [threading.Thread(target=book) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert outcomes.count("booked") == 1
+    assert outcomes.count("conflict") == THREADS - 1
+    assert appointments.query.filter_by(doctor_id=doctor_id).count() == 1
+
+
+def test_rescheduling_into_a_taken_slot_is_rejected(app, appointments):
+    doctor_id = uuid.uuid4()
+    reserve_slot(uuid.uuid4(), doctor_id, date(2025, 5, 6), time(9, 0))
+    moving = reserve_slot(uuid.uuid4(), doctor_id, date(2025, 5, 6), time(10, 0))
+    db.session.commit()
+
+    with pytest.raises(SlotUnavailable):
+        move_slot(moving, date(2025, 5, 6), time(9, 0))
+
+    move_slot(moving, date(2025, 5, 6), time(11, 0))
+    db.session.commit()
+    db.session.expire_all()
+    assert db.session.get(appointments, moving.appointment_id).time == time(11, 0)
+
+
+# Lookups against the appointment table by app/appointments/routes.py and
+# app/doctors/routes.py, other than the listing, see
+# test_appointment_listing_queries_use_an_index.
+HOT_QUERIES = {
+    "doctor appointments on a day": lambda: Appointment.query.filter_by(
+        doctor_id=uuid.uuid4(), date=date(2025, 5, 6)),
+    "doctor slot": lambda: Appointment.query.filter_by(
+        doctor_id=uuid.uuid4(), date=date(2025, 5, 6), time=time(9, 0)),
+    "appointment by id": lambda: Appointment.query.filter_by(appointment_id=uuid.uuid4()),
+}
+
+
+def explain(statement, parameters):
+    with db.engine.connect() as connection:
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", tuple(parameters)).all()
+    return [row[-1] for row in rows]
+
+
+@pytest.mark.parametrize("name", HOT_QUERIES)
+def test_hot_appointment_queries_use_an_index(app, appointments, name):
+    compiled = HOT_QUERIES[name]().statement.compile(dialect=db.engine.dialect)
+    plan = explain(compiled.string, (None for _ in compiled.positiontup))
+
+    full_scans = [step for step in plan if step.startswith("SCAN")]
+    assert not full_scans, f"{name} regressed to a sequential scan: {plan}"
+
+
+@pytest.fixture
+def patient(app, appointments):
+    Patient.__table__.create(db.engine)
+    patient = Patient(
+        firstname="Jane", lastname="Doe", email="jane@example.com", phone="0712345678",
+        date_of_birth=datetime(1990, 1, 1), password="hash",
+    )
+    db.session.add(patient)
+    db.session.commit()
+    return patient
+
+
+def auth_headers(user_id, role):
+    token = create_access_token(identity=str(user_id), additional_claims={"role": role})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_appointment_listing_pages_with_a_cursor(app, patient):
+    for day in range(1, 6):
+        reserve_slot(patient.patient_id, uuid.uuid4(), date(2025, 5, day), time(9, 0))
+    reserve_slot(patient.patient_id, uuid.uuid4(), date(2025, 5, 3), time(8, 0), status="cancelled")
+    db.session.commit()
+    client = app.test_client()
+    headers = auth_headers(patient.patient_id, "patient")
+
+    pages, cursor = [], None
+    while True:
+        query = {"limit": 2, "status": "booked", "date_from": "2025-05-02"}
+        if cursor:
+            query["cursor"] = cursor
+        body = client.get("/api/v1/appointments/", query_string=query, headers=headers).get_json()
+        pages.append([a["date"] for a in body["data"]["appointments"]])
+        cursor = body["data"]["next_cursor"]
+        if not cursor:
+            break
+
+    assert pages == [["2025-05-02", "2025-05-03"], ["2025-05-04", "2025-05-05"]]
+
+
+@pytest.mark.parametrize("cursor", [
+    "not-a-cursor",
+    encode_cursor(["2025-01-01", "10:00:00"]),
+    encode_cursor(["2025-01-01", "10:00:00", 123]),
+    encode_cursor(["2025-01-01", "10:00:00", "not-a-uuid"]),
+])
+def test_appointment_listing_rejects_a_malformed_cursor(app, patient, cursor):
+    response = app.test_client().get(
+        "/api/v1/appointments/", query_string={"cursor": cursor},
+        headers=auth_headers(patient.patient_id, "patient"),
+    )
+
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("role", ["patient", "doctor"])
+def test_appointment_listing_queries_use_an_index(app, patient, role):
+    # SQLite has no sequences, so create the table without the employee_id default.
+    table = Doctor.__table__.to_metadata(MetaData())
+    table.c.employee_id.server_default = None
+    table.create(db.engine)
+    doctor = Doctor(
+        employee_id=1, firstname="Ada", lastname="Okafor", specialization="Cardiology",
+        email="ada@example.com", phone="0700000000", password="hash",
+    )
+    db.session.add(doctor)
+    db.session.commit()
+    for day in range(1, 4):
+        reserve_slot(patient.patient_id, doctor.doctor_id, date(2025, 5, day), time(9, 0))
+    db.session.commit()
+    caller = patient.patient_id if role == "patient" else doctor.doctor_id
+    client = app.test_client()
+    headers = auth_headers(caller, role)
+
+    statements = []
+    event.listen(db.engine, "before_cursor_execute", lambda *args: statements.append(args[2:4]))
+    first = client.get("/api/v1/appointments/", query_string={"limit": 1}, headers=headers).get_json()
+    client.get(
+        "/api/v1/appointments/", headers=headers, query_string={
+            "limit": 1, "status": "booked", "date_from": "2025-05-01", "date_to": "2025-05-31",
+            "cursor": first["data"]["next_cursor"],
+        },
+    )
+
+    listings = [(statement, parameters) for statement, parameters in statements if "FROM appointment" in statement]
+    assert len(listings) == 2
+    for statement, parameters in listings:
+        plan = explain(statement, parameters)
+        full_scans = [step for step in plan if step.startswith("SCAN")]
+        assert not full_scans, f"The {role} listing regressed to a sequential scan: {plan}"
+
+
+def test_export_streams_appointments_as_ndjson_and_csv(app, patient):
+    for day in range(1, 4):
+        reserve_slot(patient.patient_id, uuid.uuid4(), date(2025, 5, day), time(9, 0))
+    db.session.commit()
+    client = app.test_client()
+    headers = auth_headers(patient.patient_id, "patient")
+
+    response = client.get("/api/v1/appointments/export", headers=headers)
+    assert response.is_streamed
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [line["date"] for line in lines] == ["2025-05-01", "2025-05-02", "2025-05-03"]
+
+    response = client.get("/api/v1/appointments/export", query_string={"format": "csv"}, headers=headers)
+    rows = response.get_data(as_text=True).splitlines()
+    assert response.mimetype == "text/csv"
+    assert rows[0] == "appointmentId,patientId,doctorId,date,time,status"
+    assert len(rows) == 4
+
+
+def test_caller_is_loaded_once_per_request(app, patient):
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db.engine, "before_cursor_execute", listener)
+    db.session.expire_all()
+
+    response = app.test_client().get("/api/v1/appointments/", headers=auth_headers(patient.patient_id, "patient"))
+    event.remove(db.engine, "before_cursor_execute", listener)
+
+    assert response.status_code == 200
+    assert sum("FROM patients" in statement for statement in statements) == 1
+    assert not any("FROM doctors" in statement for statement in statements)
+
+
+def test_unknown_caller_is_rejected(app, patient):
+    response = app.test_client().get("/api/v1/appointments/", headers=auth_headers(uuid.uuid4(), "patient"))
+
+    assert response.status_code == 404
+    assert response.get_json()["message"] == "User not found"
+
+
+def test_appointment_listing_is_revalidated_and_compressed(app, patient):
+    for day in range(1, 21):
+        reserve_slot(patient.patient_id, uuid.uuid4(), date(2025, 5, day), time(9, 0))
+    db.session.commit()
+    client = app.test_client()
+    headers = auth_headers(patient.patient_id, "patient")
+
+    plain = client.get("/api/v1/appointments/", headers=headers)
+    compressed = client.get("/api/v1/appointments/", headers={**headers, "Accept-Encoding": "gzip"})
+
+    assert "Content-Encoding" not in plain.headers
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert compressed.headers["Vary"] == "Accept-Encoding"
+    assert gzip.decompress(compressed.get_data()) == plain.get_data()
+    assert compressed.headers["ETag"] == plain.headers["ETag"][:-1] + '-gzip"'
+
+    for etag in (plain.headers["ETag"], compressed.headers["ETag"]):
+        revalidated = client.get("/api/v1/appointments/", headers={**headers, "If-None-Match": etag})
+        assert revalidated.status_code == 304
+        assert revalidated.get_data() == b""
+
+    reserve_slot(patient.patient_id, uuid.uuid4(), date(2025, 5, 25), time(9, 0))
+    db.session.commit()
+    changed = client.get("/api/v1/appointments/", headers={**headers, "If-None-Match": plain.headers["ETag"]})
+    assert changed.status_code == 200
+
+
+def scrape(client):
+    response = client.get("/metrics")
+    assert response.mimetype == "text/plain"
+    samples = {}
+    for line in response.get_data(as_text=True).splitlines():
+        if line and not line.startswith("#"):
+            name, _, value = line.rpartition(" ")
+            samples[name] = float(value)
+    return samples
+
+
+def test_metrics_record_latency_and_statements_per_endpoint(app, patient, outbox):
+    client = app.test_client()
+    headers = auth_headers(patient.patient_id, "patient")
+    listing = '{endpoint="/api/v1/appointments/",method="GET"}'
+    statements = 'db_statements_total{endpoint="/api/v1/appointments/"}'
+    before = scrape(client)
+
+    client.get("/api/v1/appointments/", headers=headers)
+    client.get("/api/v1/appointments/", headers=headers)
+    queue_email("Hello", "jane@example.com", "Hi")
+    db.session.commit()
+    after = scrape(client)
+
+    assert after["http_request_duration_seconds_count" + listing] - before.get("http_request_duration_seconds_count" + listing, 0) == 2
+    assert after['http_requests_total{endpoint="/api/v1/appointments/",method="GET",status="200"}'] >= 2
+    # One page query each, the test session already holds the caller
+    assert after[statements] - before.get(statements, 0) == 2
+    assert after['email_outbox_depth{status="pending"}'] == 1
+    assert 'cache_hit_ratio{cache="doctor_details"}' in after
+
+
+def test_metrics_add_up_the_workers_of_a_preforking_server(patient, outbox, tmp_path, smtp_sink):
+    directory = str(tmp_path / "metrics")
+    server = create_app(make_config(tmp_path, smtp_sink, METRICS_MULTIPROCESS_DIR=directory, METRICS_FLUSH_INTERVAL=3600))
+    client = server.test_client()
+    headers = auth_headers(patient.patient_id, "patient")
+    count = 'http_request_duration_seconds_count{endpoint="/api/v1/appointments/",method="GET"}'
+    before = scrape(client).get(count, 0)
+
+    pid = os.fork()
+    if pid == 0:
+        try:
+            after_fork(server)
+            for _ in range(2):
+                client.get("/api/v1/appointments/", headers=headers)
+            server.extensions["metrics"].write_snapshot()
+        finally:
+            os._exit(0)
+    assert os.waitstatus_to_exitcode(os.waitpid(pid, 0)[1]) == 0
+    client.get("/api/v1/appointments/", headers=headers)
+
+    samples = scrape(client)
+    assert samples[count] - before == 3
+    assert f'db_pool_in_use{{bind="default",worker="{pid}"}}' in samples
+    assert f'db_pool_in_use{{bind="default",worker="{os.getpid()}"}}' in samples
+
+    # The exited worker's counts stay in the totals, its pool is gone
+    mark_process_dead(directory, pid)
+    samples = scrape(client)
+    assert samples[count] - before == 3
+    assert f'db_pool_in_use{{bind="default",worker="{pid}"}}' not in samples
+
+
+def test_metrics_count_the_statements_of_a_streamed_export(app, patient, outbox):
+    client = app.test_client()
+    headers = auth_headers(patient.patient_id, "patient")
+    statements = 'db_statements_total{endpoint="/api/v1/appointments/export"}'
+    before = scrape(client)
+
+    response = client.get("/api/v1/appointments/export", headers=headers)
+    response.get_data()
+    after = scrape(client)
+
+    # The export query runs while the body streams, after the request was recorded
+    assert after[statements] - before.get(statements, 0) == 1
+    assert after.get('db_statements_total{endpoint="(background)"}') == before.get('db_statements_total{endpoint="(background)"}')
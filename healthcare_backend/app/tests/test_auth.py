@@ -0,0 +1,248 @@
+import json
+from datetime import datetime
+import pytest
+from sqlalchemy import event
+from flask_jwt_extended import create_access_token
+from werkzeug.security import generate_password_hash
+from app import db
+from app.auth.passwords import password_hasher, HasherBusy
+from app.patients.models import Patient
+
+
+@pytest.fixture
+def hasher(app):
+    app.config["PASSWORD_HASH_METHOD"] = "pbkdf2:sha256:1000"
+    app.config["PASSWORD_HASH_WORKERS"] = 2
+    password_hasher.init_app(app)
+    yield password_hasher
+    password_hasher.shutdown()
+
+
+def test_passwords_are_hashed_in_worker_processes(hasher):
+    pwhash = hasher.hash("s3cret")
+
+    assert pwhash.startswith("pbkdf2:sha256:1000$")
+    assert hasher.verify(pwhash, "s3cret")
+    assert not hasher.verify(pwhash, "wrong")
+    assert hasher._executor is not None
+
+
+def test_needs_rehash_when_the_method_or_cost_changes(hasher, app):
+    assert not hasher.needs_rehash(generate_password_hash("x", "pbkdf2:sha256:1000"))
+    assert hasher.needs_rehash(generate_password_hash("x", "pbkdf2:sha256:500"))
+
+    app.config["PASSWORD_HASH_METHOD"] = "scrypt"
+    password_hasher.init_app(app)
+    assert not hasher.needs_rehash(generate_password_hash("x", "scrypt:32768:8:1"))
+
+
+def test_login_upgrades_a_stale_hash(app, hasher):
+    Patient.__table__.create(db.engine)
+    patient = Patient(
+        firstname="Jane", lastname="Doe", email="jane@example.com", phone="0712345678",
+        date_of_birth=datetime(1990, 1, 1), password=generate_password_hash("s3cret", "pbkdf2:sha256:500"),
+    )
+    db.session.add(patient)
+    db.session.commit()
+
+    response = app.test_client().post(
+        "/api/v1/patients/login", json={"email": "jane@example.com", "password": "s3cret"},
+    )
+
+    assert response.status_code == 200
+    db.session.refresh(patient)
+    assert patient.password.startswith("pbkdf2:sha256:1000$")
+    assert hasher.verify(patient.password, "s3cret")
+
+
+def test_login_that_outlasts_the_hash_timeout_is_answered_busy(app, hasher):
+    Patient.__table__.create(db.engine)
+    db.session.add(Patient(
+        firstname="Jane", lastname="Doe", email="jane@example.com", phone="0712345678",
+        date_of_birth=datetime(1990, 1, 1), password=generate_password_hash("s3cret", "pbkdf2:sha256:300000"),
+    ))
+    db.session.commit()
+    app.config["PASSWORD_HASH_TIMEOUT"] = 0.01
+
+    response = app.test_client().post(
+        "/api/v1/patients/login", json={"email": "jane@example.com", "password": "s3cret"},
+    )
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_a_timed_out_hash_holds_its_slot_until_it_finishes(app, hasher):
+    app.config["PASSWORD_HASH_MAX_PENDING"] = 1
+    slow = generate_password_hash("s3cret", "pbkdf2:sha256:300000")
+    fast = hasher.hash("s3cret")
+    app.config["PASSWORD_HASH_TIMEOUT"] = 0.01
+
+    with pytest.raises(HasherBusy):
+        hasher.verify(slow, "s3cret")
+    # The slow hash is still running, so no slot is free
+    with pytest.raises(HasherBusy):
+        hasher.verify(fast, "s3cret")
+
+    assert hasher._slots.acquire(timeout=30)
+    hasher._slots.release()
+    app.config["PASSWORD_HASH_TIMEOUT"] = 30
+    assert hasher.verify(fast, "s3cret")
+
+
+def test_a_broken_hashing_pool_is_replaced(hasher):
+    pwhash = hasher.hash("s3cret")
+    broken = hasher._executor
+    for process in list(broken._processes.values()):
+        process.kill()
+        process.join()
+
+    with pytest.raises(HasherBusy):
+        hasher.verify(pwhash, "s3cret")
+
+    assert hasher.verify(pwhash, "s3cret")
+    assert hasher._executor is not broken
+
+
+REGISTRATION = {
+    "firstname": "Jane", "lastname": "Doe", "email": "jane@example.com",
+    "phone": "0712345678", "password": "s3cret", "date_of_birth": "1990-01-01",
+}
+
+
+@pytest.fixture
+def patients(app):
+    Patient.__table__.create(db.engine)
+    return Patient
+
+
+def test_registration_checks_uniqueness_in_one_query(app, patients):
+    client = app.test_client()
+    assert client.post("/api/v1/patients/register", json=REGISTRATION).status_code == 201
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db.engine, "before_cursor_execute", listener)
+    response = client.post("/api/v1/patients/register", json=REGISTRATION)
+    event.remove(db.engine, "before_cursor_execute", listener)
+
+    assert response.status_code == 400
+    assert {e["field"] for e in response.get_json()["errors"]} == {"email", "phone"}
+    assert len(statements) == 1
+
+
+def test_registration_race_is_reported_per_field(app, patients, monkeypatch):
+    client = app.test_client()
+    client.post("/api/v1/patients/register", json=REGISTRATION)
+    # Simulate a concurrent registration committing after the uniqueness check.
+    monkeypatch.setattr("app.auth.routes.find_taken_fields", lambda *args: [])
+
+    response = client.post("/api/v1/patients/register", json=dict(REGISTRATION, phone="0787654321"))
+
+    assert response.status_code == 400
+    assert response.get_json()["errors"] == [{"field": "email", "message": "Email already in use"}]
+
+
+def admin_headers():
+    token = create_access_token(identity="admin", additional_claims={"role": "admin"})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_bulk_import_reports_errors_per_row(app, patients):
+    app.test_client().post("/api/v1/patients/register", json=REGISTRATION)
+    records = [
+        dict(REGISTRATION, email="a@example.com", phone="0700000001"),
+        dict(REGISTRATION, email="not-an-email", phone="0700000002"),
+        dict(REGISTRATION, email="a@example.com", phone="0700000003"),
+        dict(REGISTRATION, email="b@example.com", phone="0712345678"),
+        dict(REGISTRATION, email="c@example.com", phone="0700000004"),
+    ]
+    body = "\n".join(json.dumps(record) for record in records) + "\n{broken\n"
+
+    response = app.test_client().post(
+        "/api/v1/onboarding/patients", data=body,
+        content_type="application/x-ndjson", headers=admin_headers(),
+    )
+
+    report = response.get_json()["data"]
+    assert response.status_code == 200
+    assert (report["total"], report["created"], report["rejected"]) == (6, 2, 4)
+    assert [(e["row"], e["errors"][0]["field"]) for e in report["errors"]] == [
+        (2, "email"), (3, "email"), (4, "phone"), (6, None),
+    ]
+    assert patients.query.filter_by(email="c@example.com").one().password.startswith("pbkdf2:")
+
+
+def test_bulk_import_requires_an_admin(app, patients):
+    client = app.test_client()
+    client.post("/api/v1/patients/register", json=REGISTRATION)
+    patient_id = patients.query.one().patient_id
+    token = create_access_token(identity=str(patient_id), additional_claims={"role": "patient"})
+
+    response = client.post(
+        "/api/v1/onboarding/patients", data="", content_type="text/csv",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 403
+
+
+def test_bulk_import_cli_reads_csv(app, patients, tmp_path):
+    path = tmp_path / "patients.csv"
+    path.write_text(
+        "firstname,lastname,email,phone,password,date_of_birth\n"
+        "Jane,Doe,jane@example.com,0712345678,s3cret,1990-01-01\n"
+        "John,Doe,john@example.com,0787654321,s3cret,1991-02-03\n"
+        "Jim,Doe,,0711111111,s3cret,1992-03-04\n"
+    )
+
+    result = app.test_cli_runner().invoke(args=["users", "import", str(path), "--role", "patient"])
+
+    assert "Imported 2 of 3 patient record(s), 1 rejected." in result.output
+    assert "row 3: Email is required" in result.output
+    assert patients.query.count() == 2
+
+
+def test_bulk_import_keeps_profile_fields_and_rejects_unknown_ones(app, patients):
+    records = [
+        dict(REGISTRATION, blood_group="O+", address="Nairobi"),
+        dict(REGISTRATION, email="b@example.com", phone="0700000002", nickname="JD"),
+    ]
+    body = "\n".join(json.dumps(record) for record in records)
+
+    response = app.test_client().post(
+        "/api/v1/onboarding/patients", data=body,
+        content_type="application/x-ndjson", headers=admin_headers(),
+    )
+
+    report = response.get_json()["data"]
+    assert (report["created"], report["rejected"]) == (1, 1)
+    assert report["errors"] == [{"row": 2, "errors": [{"field": "nickname", "message": "Unknown field"}]}]
+    patient = patients.query.one()
+    assert (patient.blood_group, patient.address, patient.weight) == ("O+", "Nairobi", None)
+
+
+def test_bulk_import_rejects_values_of_the_wrong_type_or_length(app, patients):
+    records = [
+        dict(REGISTRATION, email="a@example.com", phone=712345678),
+        dict(REGISTRATION, email="b@example.com", phone="0700000002", password=1234),
+        dict(REGISTRATION, email=["c@example.com"], phone="0700000003"),
+        dict(REGISTRATION, email="d@example.com", phone="0700000004", age="1000"),
+        dict(REGISTRATION, email="e@example.com", phone="0700000005", firstname="J" * 101),
+        dict(REGISTRATION, email="f@example.com", phone="0700000006", weight=70),
+        dict(REGISTRATION, email="g@example.com", phone="0700000007", height=None),
+    ]
+    body = "\n".join(json.dumps(record) for record in records)
+
+    response = app.test_client().post(
+        "/api/v1/onboarding/patients", data=body,
+        content_type="application/x-ndjson", headers=admin_headers(),
+    )
+
+    report = response.get_json()["data"]
+    assert response.status_code == 200
+    assert (report["created"], report["rejected"]) == (1, 6)
+    assert [(e["row"], [error["field"] for error in e["errors"]]) for e in report["errors"]] == [
+        (1, ["phone"]), (2, ["password"]), (3, ["email"]), (4, ["age"]), (5, ["firstname"]), (6, ["weight"]),
+    ]
+    assert patients.query.one().email == "g@example.com"
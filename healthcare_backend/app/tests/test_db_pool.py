@@ -0,0 +1,31 @@
+import pytest
+from sqlalchemy import exc
+from flask_jwt_extended import create_access_token
+from app import create_app, db
+from app.tests.conftest import make_config
+
+
+def admin_headers():
+    token = create_access_token(identity="admin", additional_claims={"role": "admin"})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_pool_timeouts_are_counted_and_shown_to_admins(app, tmp_path, smtp_sink):
+    limited = create_app(make_config(
+        tmp_path, smtp_sink,
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'pool.db'}",
+        DATABASE_POOL_SIZE=1, DATABASE_POOL_MAX_OVERFLOW=0, DATABASE_POOL_TIMEOUT=0.05,
+    ))
+    with limited.app_context():
+        held = db.engine.connect()
+        with pytest.raises(exc.TimeoutError):
+            db.engine.connect()
+        held.close()
+
+        response = limited.test_client().get("/api/v1/admin/pool", headers=admin_headers())
+
+    pool = response.get_json()["data"]["pools"]["default"]
+    assert response.status_code == 200
+    assert (pool["size"], pool["in_use"], pool["timeouts"]) == (1, 0, 1)
+    assert pool["checkouts"] >= 1
+    assert app.test_client().get("/api/v1/admin/pool").status_code == 401
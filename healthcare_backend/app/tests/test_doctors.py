@@ -0,0 +1,463 @@
+import asyncio
+import json
+import re
+import uuid
+from datetime import date, datetime, time
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import MetaData, event, select
+from app import api, create_app, db, cache
+from app.appointments.models import Appointment
+from app.appointments.reservations import reserve_slot
+from app.doctors.cache import doctor_slots_cache
+from app.doctors.models import Doctor
+from app.patients.models import Patient
+from app.tests.conftest import make_config
+from app.doctors.slots import free_slots, search_free_slots
+from utils.asgi import ThreadedWsgiToAsgi
+from utils.pagination import encode_cursor
+from utils.read_cache import ReadModelCache, LRUCache, LocalInvalidationBus
+
+
+@pytest.fixture
+def appointments(app):
+    Appointment.__table__.create(db.engine)
+    return Appointment
+
+
+@pytest.fixture
+def doctor():
+    # Doctors use a Postgres sequence, so the suite works with unsaved instances.
+    return Doctor(
+        doctor_id=uuid.uuid4(), firstname="Ada", lastname="Okafor", specialization="Cardiology",
+        availability_start=time(9, 0), availability_end=time(11, 0), days_available=["Monday", "Wednesday"],
+    )
+
+
+def count_statements():
+    statements = []
+    event.listen(db.engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    return statements
+
+
+def test_free_slots_exclude_booked_and_unavailable_days(app, appointments, doctor):
+    # 2025-05-05 is a Monday
+    reserve_slot(uuid.uuid4(), doctor.doctor_id, date(2025, 5, 5), time(9, 30))
+    reserve_slot(uuid.uuid4(), doctor.doctor_id, date(2025, 5, 7), time(9, 0))
+    db.session.commit()
+    statements = count_statements()
+
+    days = free_slots(doctor, date(2025, 5, 5), date(2025, 5, 11), 30, now=datetime(2025, 5, 1))
+
+    assert days == [
+        {"date": "2025-05-05", "slots": ["09:00", "10:00", "10:30"]},
+        {"date": "2025-05-07", "slots": ["09:30", "10:00", "10:30"]},
+    ]
+    assert len(statements) == 1
+
+
+def test_free_slots_skip_the_past(app, appointments, doctor):
+    days = free_slots(doctor, date(2025, 5, 1), date(2025, 5, 5), 30, now=datetime(2025, 5, 5, 10, 10))
+
+    assert days == [{"date": "2025-05-05", "slots": ["10:30"]}]
+
+
+def test_search_finds_free_slots_for_many_doctors_in_one_query(app, appointments, doctor):
+    other = Doctor(
+        doctor_id=uuid.uuid4(), firstname="Ben", lastname="Mensah", specialization="Cardiology",
+        availability_start=time(13, 0), availability_end=time(15, 0), days_available=["Monday"],
+    )
+    # 2025-05-05 is a Monday
+    reserve_slot(uuid.uuid4(), other.doctor_id, date(2025, 5, 5), time(14, 0))
+    db.session.commit()
+    # Stands in for the doctors subquery, as the doctors table is Postgres-only.
+    doctor_ids = select(Appointment.doctor_id).where(Appointment.doctor_id.in_([doctor.doctor_id, other.doctor_id]))
+    statements = count_statements()
+
+    matches = search_free_slots(
+        [doctor, other], doctor_ids, date(2025, 5, 5), time(10, 0), time(14, 30), 30,
+        now=datetime(2025, 5, 1),
+    )
+
+    assert [(d.firstname, slots) for d, slots in matches] == [
+        ("Ada", ["10:00", "10:30"]),
+        ("Ben", ["13:00", "13:30"]),
+    ]
+    assert len(statements) == 1
+
+
+def test_days_available_round_trips_through_the_weekday_bitmask(doctor):
+    doctor.days_available = ["friday", "Monday"]
+
+    assert doctor.days_available_mask == 0b10001
+    assert doctor.days_available == ["Monday", "Friday"]
+    assert doctor.available_on(4) and not doctor.available_on(1)
+
+
+def test_weekday_filter_is_pushed_into_sql(app):
+    sql = str(Doctor.query.filter(Doctor.available_on(2)).statement.compile(
+        db.engine, compile_kwargs={"literal_binds": True}))
+
+    assert sql.endswith("WHERE doctors.days_available_mask & 4 != 0")
+
+
+def test_read_model_cache_counts_hits_and_misses_per_entity(app):
+    loads = []
+    details = ReadModelCache(cache, "test_details")
+
+    def loader(doctor_id):
+        return lambda: loads.append(doctor_id) or {"doctor_id": doctor_id}
+
+    assert details.get_or_set("a", loader("a")) == {"doctor_id": "a"}
+    assert details.get_or_set("a", loader("a")) == {"doctor_id": "a"}
+    assert details.get_or_set("b", loader("b")) == {"doctor_id": "b"}
+    details.invalidate("a")
+    details.get_or_set("a", loader("a"))
+    details.get_or_set("b", loader("b"))
+
+    assert loads == ["a", "b", "a"]
+    assert details.stats() == {"hits": 2, "misses": 3, "hit_ratio": 0.4}
+
+
+def test_concurrent_invalidations_each_get_their_own_version(app):
+    details = ReadModelCache(cache, "test_details")
+    raced = []
+
+    class Racing:
+        """Runs a second invalidation right after the first one's first cache call."""
+
+        def __init__(self, target):
+            self.target = target
+
+        def __getattr__(self, name):
+            attribute = getattr(self.target, name)
+            if not callable(attribute):
+                return Racing(attribute)
+
+            def racing(*args, **kwargs):
+                if raced:
+                    return attribute(*args, **kwargs)
+                raced.append(name)
+                result = attribute(*args, **kwargs)
+                details.invalidate("a")
+                return result
+            return racing
+
+    details.backend = Racing(cache)
+    details.invalidate("a")
+
+    assert cache.get(details._version_key("a")) == 2
+
+
+def test_committed_appointments_invalidate_the_doctors_cached_slots(app, appointments, doctor):
+    loads = []
+
+    def cached_slots():
+        return doctor_slots_cache.get_or_set(
+            doctor.doctor_id, lambda: loads.append(1) or {}, variant="2025-05-05:2025-05-11")
+
+    cached_slots()
+    reserve_slot(uuid.uuid4(), doctor.doctor_id, date(2025, 5, 5), time(9, 0))
+    db.session.rollback()
+    cached_slots()
+    assert len(loads) == 1
+
+    reserve_slot(uuid.uuid4(), doctor.doctor_id, date(2025, 5, 5), time(9, 0))
+    db.session.commit()
+    cached_slots()
+    assert len(loads) == 2
+
+    db.session.add(Appointment(patient_id=uuid.uuid4(), doctor_id=doctor.doctor_id,
+                               date=date(2025, 5, 5), time=time(10, 0)))
+    db.session.commit()
+    cached_slots()
+    assert len(loads) == 3
+
+
+def test_local_cache_is_bounded_and_expires():
+    local = LRUCache(maxsize=2, ttl=60)
+    local.set("a", 1)
+    local.set("b", 2)
+    local.get("a")
+    local.set("c", 3)
+
+    assert local.get("b") is None
+    assert local.get("a") == 1 and local.get("c") == 3
+    assert local.stats()["evictions"] == 1
+
+    local.ttl = -1
+    local.set("d", 4)
+    assert local.get("d") is None
+
+
+def test_invalidations_reach_the_local_cache_of_every_worker(app):
+    bus = LocalInvalidationBus()
+    workers = [ReadModelCache(cache, "test_slots") for _ in range(2)]
+    for worker in workers:
+        worker.use_local_cache(LRUCache(), bus)
+    version = {"value": 1}
+
+    def read(worker):
+        return worker.get_or_set("doctor", lambda: dict(version), variant="week")
+
+    assert [read(w) for w in workers] == [{"value": 1}, {"value": 1}]
+    version["value"] = 2
+    assert [read(w) for w in workers] == [{"value": 1}, {"value": 1}]
+    assert all(w.stats()["local"]["hits"] == 1 for w in workers)
+
+    workers[0].invalidate("doctor")
+
+    assert [read(w) for w in workers] == [{"value": 2}, {"value": 2}]
+
+
+@pytest.fixture
+def doctors(app):
+    # SQLite has no sequences, so create the table without the employee_id default.
+    table = Doctor.__table__.to_metadata(MetaData())
+    table.c.employee_id.server_default = None
+    table.create(db.engine)
+    return Doctor
+
+
+@pytest.fixture
+def client(app, doctors, doctor):
+    Patient.__table__.create(db.engine)
+    patient = Patient(
+        firstname="Jane", lastname="Doe", email="jane@example.com", phone="0712345678",
+        date_of_birth=datetime(1990, 1, 1), password="hash",
+    )
+    doctor.employee_id, doctor.email, doctor.phone, doctor.password = 1, "ada@example.com", "0700000000", "hash"
+    db.session.add_all([patient, doctor])
+    db.session.commit()
+    token = create_access_token(identity=str(patient.patient_id), additional_claims={"role": "patient"})
+    client = app.test_client()
+    client.environ_base["HTTP_AUTHORIZATION"] = f"Bearer {token}"
+    return client
+
+
+def selected_columns(statements, table):
+    # Subqueries of other tables' selects, e.g. of the search's bookings, are skipped
+    for statement in statements:
+        if statement.startswith("SELECT") and f"FROM {table}" in statement:
+            columns = set(re.findall(rf"\b{table}\.(\w+) AS", statement.split("FROM")[0]))
+            if columns:
+                return columns
+    return None
+
+
+SUMMARY = {"doctor_id", "firstname", "lastname", "specialization"}
+AVAILABILITY = {"doctor_id", "availability_start", "availability_end", "days_available_mask"}
+
+
+@pytest.mark.parametrize("path, columns", [
+    ("/api/v1/doctors/", SUMMARY),
+    ("/api/v1/doctors/{id}", SUMMARY | AVAILABILITY),
+    ("/api/v1/doctors/availability/{id}", AVAILABILITY),
+    ("/api/v1/doctors/{id}/slots", AVAILABILITY),
+    ("/api/v1/doctors/search?day=Monday", SUMMARY | AVAILABILITY),
+])
+def test_doctor_endpoints_select_only_the_columns_they_use(client, appointments, doctor, path, columns):
+    path = path.format(id=doctor.doctor_id)
+    db.session.expunge_all()
+    statements = count_statements()
+
+    assert client.get(path).status_code == 200
+
+    assert selected_columns(statements, "doctors") == columns
+    # The caller is looked up without their password hash or profile details
+    assert selected_columns(statements, "patients") == {
+        "patient_id", "firstname", "lastname", "email", "phone", "date_of_birth", "created_at",
+    }
+
+
+def add_doctors(*names):
+    added = []
+    for n, (firstname, lastname, specialization) in enumerate(names, start=10):
+        added.append(Doctor(
+            employee_id=n, firstname=firstname, lastname=lastname, specialization=specialization,
+            email=f"doctor{n}@example.com", phone=f"07000000{n}", password="hash",
+        ))
+    db.session.add_all(added)
+    db.session.commit()
+    return added
+
+
+def test_directory_pages_through_a_prefix_search(client):
+    add_doctors(
+        ("Bola", "Adeyemi", "Cardiology"), ("Carl", "Cardoso", "Dermatology"),
+        ("Dina", "Zulu", "Cardiology"), ("Eve", "Mwangi", "Neurology"),
+    )
+
+    pages, cursor = [], None
+    while True:
+        query = {"q": "CARD", "limit": 2}
+        if cursor:
+            query["cursor"] = cursor
+        body = client.get("/api/v1/doctors/", query_string=query).get_json()
+        pages.append([doctor["lastname"] for doctor in body["data"]])
+        cursor = body["next_cursor"]
+        if not cursor:
+            break
+
+    # Ada Okafor from the doctor fixture is a cardiologist too
+    assert pages == [["Adeyemi", "Cardoso"], ["Okafor", "Zulu"]]
+    assert client.get("/api/v1/doctors/", query_string={"q": "100%"}).get_json()["data"] == []
+
+
+@pytest.mark.parametrize("cursor", [
+    "not-a-cursor",
+    encode_cursor(["okafor", "ada"]),
+    encode_cursor(["okafor", "ada", 123]),
+    encode_cursor([1, 2, str(uuid.uuid4())]),
+    encode_cursor(["okafor", "ada", "not-a-uuid"]),
+])
+def test_directory_rejects_a_malformed_cursor(client, cursor):
+    assert client.get("/api/v1/doctors/", query_string={"cursor": cursor}).status_code == 400
+
+
+def test_directory_first_page_is_cached_and_revalidated_with_etag(client, doctor):
+    first = client.get("/api/v1/doctors/")
+    etag = first.headers["ETag"]
+
+    statements = count_statements()
+    assert client.get("/api/v1/doctors/", headers={"If-None-Match": etag}).status_code == 304
+    assert selected_columns(statements, "doctors") is None
+
+    add_doctors(("Bola", "Adeyemi", "Cardiology"))
+    changed = client.get("/api/v1/doctors/", headers={"If-None-Match": etag})
+
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert [d["lastname"] for d in changed.get_json()["data"]] == ["Adeyemi", "Okafor"]
+
+
+def test_directory_revalidates_a_compressed_etag_without_building_the_page(app, client, doctor):
+    app.config["COMPRESS_MIN_BYTES"] = 0
+    first = client.get("/api/v1/doctors/", headers={"Accept-Encoding": "gzip"})
+    assert first.headers["Content-Encoding"] == "gzip"
+    assert first.headers["ETag"].endswith('-gzip"')
+
+    statements = count_statements()
+    again = client.get("/api/v1/doctors/", headers={"Accept-Encoding": "gzip", "If-None-Match": first.headers["ETag"]})
+
+    assert again.status_code == 304
+    assert selected_columns(statements, "doctors") is None
+
+
+@pytest.mark.parametrize("path", ["/api/v1/doctors/{id}", "/api/v1/doctors/availability/{id}"])
+def test_doctor_read_models_revalidate_without_serializing(client, doctor, monkeypatch, path):
+    path = path.format(id=doctor.doctor_id)
+    first = client.get(path)
+    assert first.headers["ETag"]
+
+    rendered = []
+    output_json = api.representations["application/json"]
+    monkeypatch.setitem(api.representations, "application/json", lambda *args, **kwargs: rendered.append(1) or output_json(*args, **kwargs))
+    again = client.get(path, headers={"If-None-Match": first.headers["ETag"]})
+
+    assert again.status_code == 304
+    assert again.headers["ETag"] == first.headers["ETag"]
+    assert rendered == []
+
+    db.session.get(Doctor, doctor.doctor_id).availability_end = time(12, 0)
+    db.session.commit()
+    changed = client.get(path, headers={"If-None-Match": first.headers["ETag"]})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != first.headers["ETag"]
+
+
+def test_asgi_mode_serves_async_views_concurrently(tmp_path, smtp_sink):
+    # A pool this small times out if a request holds its own connection
+    # while its lookups wait for theirs
+    limited = create_app(make_config(
+        tmp_path, smtp_sink, DATABASE_POOL_SIZE=2, DATABASE_POOL_MAX_OVERFLOW=0, DATABASE_POOL_TIMEOUT=2,
+    ))
+    with limited.app_context():
+        table = Doctor.__table__.to_metadata(MetaData())
+        table.c.employee_id.server_default = None
+        table.create(db.engine)
+        Patient.__table__.create(db.engine)
+        Appointment.__table__.create(db.engine)
+        patient = Patient(
+            firstname="Jane", lastname="Doe", email="jane@example.com", phone="0712345678",
+            date_of_birth=datetime(1990, 1, 1), password="hash",
+        )
+        doctor = Doctor(
+            doctor_id=uuid.uuid4(), employee_id=1, firstname="Ada", lastname="Okafor", specialization="Cardiology",
+            email="ada@example.com", phone="0700000000", password="hash",
+            availability_start=time(9, 0), availability_end=time(11, 0), days_available=["Monday"],
+        )
+        db.session.add_all([patient, doctor])
+        db.session.commit()
+        # 2099-05-04 is a Monday
+        reserve_slot(patient.patient_id, doctor.doctor_id, date(2099, 5, 4), time(9, 30))
+        db.session.commit()
+        token = create_access_token(identity=str(patient.patient_id), additional_claims={"role": "patient"})
+        path = f"/api/v1/doctors/{doctor.doctor_id}/slots"
+        db.session.remove()
+
+    application = ThreadedWsgiToAsgi(limited, threads=4)
+    query = "start_date=2099-05-04&end_date=2099-05-10"
+
+    async def get():
+        messages = []
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            messages.append(message)
+
+        await application({
+            "type": "http", "http_version": "1.1", "method": "GET", "scheme": "http", "root_path": "",
+            "path": path, "query_string": query.encode(), "server": ("localhost", 80),
+            "headers": [(b"host", b"localhost"), (b"authorization", f"Bearer {token}".encode())],
+        }, receive, send)
+        return messages[0]["status"], json.loads(b"".join(m.get("body", b"") for m in messages[1:]))
+
+    async def get_many():
+        return await asyncio.gather(*(get() for _ in range(8)))
+
+    responses = asyncio.run(get_many())
+    application.executor.shutdown()
+
+    assert [status for status, _ in responses] == [200] * 8
+    assert all(body == responses[0][1] for _, body in responses)
+    assert responses[0][1]["data"]["days"][0] == {"date": "2099-05-04", "slots": ["09:00", "10:00", "10:30"]}
+
+
+def test_read_model_caches_are_filled_from_the_primary(replicated_app, doctor):
+    replica = db.engines["replica_0"]
+    table = Doctor.__table__.to_metadata(MetaData())
+    table.c.employee_id.server_default = None
+    for engine in (db.engine, replica):
+        for model_table in (table, Patient.__table__, Appointment.__table__):
+            model_table.create(engine)
+    patient = Patient(
+        firstname="Jane", lastname="Doe", email="jane@example.com", phone="0712345678",
+        date_of_birth=datetime(1990, 1, 1), password="hash",
+    )
+    doctor.employee_id, doctor.email, doctor.phone, doctor.password = 1, "ada@example.com", "0700000000", "hash"
+    db.session.add_all([patient, doctor])
+    db.session.commit()
+    # The replica lags behind the primary
+    with replica.begin() as connection:
+        connection.execute(Patient.__table__.insert(), [dict(db.session.execute(select(Patient.__table__)).mappings().one())])
+        row = dict(db.session.execute(select(Doctor.__table__)).mappings().one(), lastname="Lagging")
+        connection.execute(Doctor.__table__.insert(), [row])
+
+    token = create_access_token(identity=str(patient.patient_id), additional_claims={"role": "patient"})
+    client = replicated_app.test_client()
+    client.environ_base["HTTP_AUTHORIZATION"] = f"Bearer {token}"
+    doctor_id = doctor.doctor_id
+    db.session.remove()
+
+    details = client.get(f"/api/v1/doctors/{doctor_id}").get_json()["data"]
+    directory = client.get("/api/v1/doctors/").get_json()["data"]
+
+    assert details["lastname"] == "Okafor"
+    assert [d["lastname"] for d in directory] == ["Okafor"]
+    # Other reads still go to the replica
+    db.session.remove()
+    search = client.get("/api/v1/doctors/search?day=Monday").get_json()["data"]
+    assert [d["lastname"] for d in search["doctors"]] == ["Lagging"]
@@ -0,0 +1,204 @@
+import base64
+import io
+import os
+import struct
+import zlib
+from datetime import datetime
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event, select
+from app import create_app, db, cache
+from app.images import service
+from app.patients.models import Patient
+from app.tests.conftest import make_config
+from utils import serializers
+
+
+def png_bytes(width, height, rows=None):
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    if rows is None:
+        rows = b"".join(b"\x00" + b"\xff\x00\x00" * width for _ in range(height))
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(rows))
+        + chunk(b"IEND", b"")
+    )
+
+
+@pytest.fixture
+def patient(app):
+    Patient.__table__.create(db.engine)
+    patient = Patient(
+        firstname="Jane", lastname="Doe", email="jane@example.com", phone="0712345678",
+        date_of_birth=datetime(1990, 1, 1), password="hash",
+    )
+    db.session.add(patient)
+    db.session.commit()
+    return patient
+
+
+@pytest.fixture
+def client(app, patient):
+    token = create_access_token(identity=str(patient.patient_id), additional_claims={"role": "patient"})
+    client = app.test_client()
+    client.environ_base["HTTP_AUTHORIZATION"] = f"Bearer {token}"
+    return client
+
+
+def upload(client, data, filename="me.png"):
+    return client.put(
+        "/api/v1/patients/profile/image",
+        data={"image": (io.BytesIO(data), filename)},
+        content_type="multipart/form-data",
+    )
+
+
+def test_profile_image_is_stored_by_reference_and_served_with_etag_and_range(client, patient):
+    image = png_bytes(600, 400)
+
+    response = upload(client, image)
+    url = response.get_json()["data"]["image"]
+
+    assert response.status_code == 200
+    db.session.refresh(patient)
+    assert url == f"http://localhost/api/v1/images/{patient.image_key}"
+    assert client.get("/api/v1/patients/profile").get_json()["data"]["image"] == url
+
+    served = client.get(url)
+    assert served.data == image
+    assert served.mimetype == "image/png"
+    assert served.headers["ETag"] == f'"{patient.image_key}"'
+    assert "immutable" in served.headers["Cache-Control"]
+
+    assert client.get(url, headers={"If-None-Match": served.headers["ETag"]}).status_code == 304
+
+    partial = client.get(url, headers={"Range": "bytes=0-7"})
+    assert partial.status_code == 206
+    assert partial.data == image[:8]
+
+
+def test_identical_uploads_are_stored_once(client, patient):
+    first = upload(client, png_bytes(10, 10)).get_json()["data"]["image"]
+    second = upload(client, png_bytes(10, 10), filename="copy.png").get_json()["data"]["image"]
+
+    assert first == second
+
+
+def test_non_images_are_rejected(client, patient):
+    response = upload(client, b"<script>alert(1)</script>", filename="me.png")
+
+    assert response.status_code == 400
+    db.session.refresh(patient)
+    assert patient.image_key is None
+
+
+def test_images_too_large_to_decode_are_rejected_before_they_are_stored(app, client, patient):
+    # A 20000x10000 header over a tiny payload, as in a decompression bomb
+    bomb = png_bytes(20000, 10000, rows=b"\x00")
+
+    response = upload(client, bomb)
+
+    assert response.status_code == 400
+    assert not [name for _, _, names in os.walk(app.config["IMAGE_STORE_PATH"]) for name in names]
+
+
+def test_the_app_refuses_to_start_without_pillow(tmp_path, smtp_sink, monkeypatch):
+    monkeypatch.setattr(service.importlib.util, "find_spec", lambda name: None)
+
+    with pytest.raises(RuntimeError, match="Pillow"):
+        create_app(make_config(tmp_path, smtp_sink))
+
+
+def test_oversize_request_bodies_are_refused_unread(app, client, patient):
+    app.config["MAX_CONTENT_LENGTH"] = 1024
+
+    assert upload(client, png_bytes(600, 400)).status_code == 413
+
+
+def test_thumbnails_are_served_for_smaller_sizes(client, patient):
+    url = upload(client, png_bytes(600, 400)).get_json()["data"]["image"]
+
+    thumbnail = client.get(url, query_string={"size": 100})
+
+    assert thumbnail.headers["ETag"].endswith('-128"')
+    assert thumbnail.mimetype == "image/jpeg"
+    assert service.pillow_image().open(io.BytesIO(thumbnail.data)).size == (128, 85)
+
+
+def test_inline_base64_images_are_moved_to_the_blob_store(client, patient):
+    image = png_bytes(10, 10)
+
+    response = client.put("/api/v1/patients/profile", json={
+        "image": "data:image/png;base64," + base64.b64encode(image).decode(),
+    })
+    profile = client.get("/api/v1/patients/profile").get_json()["data"]
+
+    assert response.status_code == 200
+    assert client.get(profile["image"]).data == image
+    # Sending the fetched profile back unchanged keeps the image
+    assert client.put("/api/v1/patients/profile", json=profile).status_code == 200
+    assert client.get("/api/v1/patients/profile").get_json()["data"]["image"] == profile["image"]
+
+
+def test_profile_never_selects_the_password_hash(client, patient):
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db.engine, "before_cursor_execute", listener)
+    db.session.expunge_all()
+
+    response = client.get("/api/v1/patients/profile")
+    event.remove(db.engine, "before_cursor_execute", listener)
+
+    assert response.status_code == 200
+    assert len(statements) == 2  # The caller, then their deferred profile details
+    assert not any("patients.password" in statement for statement in statements)
+
+
+@pytest.mark.skipif(serializers.orjson is None, reason="orjson is not installed")
+def test_profile_renders_the_same_with_orjson_and_stdlib_json(app, client, patient):
+    fast = client.get("/api/v1/patients/profile")
+    app.config["ORJSON_ENABLED"] = False
+    slow = client.get("/api/v1/patients/profile")
+
+    assert fast.get_json() == slow.get_json()
+    assert fast.get_json()["data"] == {
+        "id": str(patient.patient_id), "image": None, "name": "Jane Doe", "email": "jane@example.com",
+        "phone": "0712345678", "address": None, "age": None, "weight": None, "height": None, "blood_group": None,
+    }
+    assert fast.mimetype == "application/json"
+
+
+def test_reads_go_to_the_replica_unless_the_caller_just_wrote(replicated_app):
+    replica = db.engines["replica_0"]
+    Patient.__table__.create(db.engine)
+    Patient.__table__.create(replica)
+    patient = Patient(
+        firstname="Jane", lastname="Doe", email="jane@example.com", phone="0712345678",
+        date_of_birth=datetime(1990, 1, 1), password="hash",
+    )
+    db.session.add(patient)
+    db.session.commit()
+    with replica.begin() as connection:
+        row = dict(db.session.execute(select(Patient.__table__)).mappings().one(), firstname="Lagging")
+        connection.execute(Patient.__table__.insert(), [row])
+
+    token = create_access_token(identity=str(patient.patient_id), additional_claims={"role": "patient"})
+    client = replicated_app.test_client()
+    client.environ_base["HTTP_AUTHORIZATION"] = f"Bearer {token}"
+
+    def profile_name():
+        db.session.remove()  # A fresh session per request, as outside tests
+        return client.get("/api/v1/patients/profile").get_json()["data"]["name"]
+
+    assert profile_name() == "Lagging Doe"
+
+    assert client.put("/api/v1/patients/profile", json={"firstName": "Janet"}).status_code == 200
+    # The write went to the primary, and the caller now reads from it
+    assert profile_name() == "Janet Doe"
+    assert profile_name() == "Janet Doe"
+
+    cache.clear()  # The pin expires
+    assert profile_name() == "Lagging Doe"
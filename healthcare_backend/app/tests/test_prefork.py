@@ -0,0 +1,24 @@
+import os
+from app import db
+from app.notifications.outbox import email_dispatcher
+from utils.prefork import after_fork, before_fork
+
+
+def test_forked_workers_do_not_inherit_connections_or_threads(app):
+    with db.engine.connect() as connection:
+        connection.exec_driver_sql("SELECT 1")
+    email_dispatcher.start()
+
+    before_fork(app)
+
+    assert db.engine.pool.checkedin() == 0
+    assert email_dispatcher._thread is None
+    pid = os.fork()
+    if pid == 0:
+        try:
+            after_fork(app)
+            with db.engine.connect() as connection:
+                connection.exec_driver_sql("SELECT 1")
+        finally:
+            os._exit(0 if db.engine.pool.checkedin() == 1 else 1)
+    assert os.waitstatus_to_exitcode(os.waitpid(pid, 0)[1]) == 0
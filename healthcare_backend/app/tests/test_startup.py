@@ -0,0 +1,48 @@
+import json
+import os
+import subprocess
+import sys
+from app import create_app
+from app.tests.conftest import make_config
+
+# Generous for a cold start, which takes well under a second; it catches
+# an expensive import or setup step creeping into create_app()
+STARTUP_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", 2.0))
+
+# Loaded on first use, see utils.mail, app.images.service and the flask db command
+LAZY_MODULES = ["flask_mail", "PIL", "alembic", "flask_migrate"]
+
+COLD_START = f"""
+import json, sys, time
+started = time.perf_counter()
+from app import create_app
+create_app({{
+    "TESTING": True,
+    "SQLALCHEMY_DATABASE_URI": "sqlite://",
+    "JWT_SECRET_KEY": "test-secret",
+    "CACHE_TYPE": "SimpleCache",
+}})
+print(json.dumps([time.perf_counter() - started, [name for name in {LAZY_MODULES!r} if name in sys.modules]]))
+"""
+
+
+def cold_start():
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    result = subprocess.run([sys.executable, "-c", COLD_START], cwd=root, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def test_cold_start_stays_within_its_budget():
+    # The best of three runs, the first one also writes bytecode caches
+    runs = [cold_start() for _ in range(3)]
+
+    assert min(seconds for seconds, _ in runs) < STARTUP_BUDGET_SECONDS
+    assert runs[-1][1] == []
+
+
+def test_api_docs_can_be_turned_off(tmp_path, smtp_sink):
+    app = create_app(make_config(tmp_path, smtp_sink, API_DOCS_ENABLED=False))
+    client = app.test_client()
+
+    assert client.get("/api/v1/docs").status_code == 404
+    assert client.get("/api/v1/swagger.json").status_code == 404
@@ -0,0 +1,4 @@
+"""ASGI entry point, e.g. ``uvicorn asgi:application --workers 4``."""
+from app import create_asgi_app
+
+application = create_asgi_app()
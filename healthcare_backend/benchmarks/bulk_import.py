@@ -0,0 +1,76 @@
+"""
+Records per minute of the bulk onboarding import.
+
+Generates an NDJSON file of patients and imports it through the same code
+path as `flask users import`, against a SQLite stand-in database:
+
+    python benchmarks/bulk_import.py --records 10000 --workers 4
+
+Point --database-uri at a scratch Postgres database with the patients table
+to measure it there instead.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db  # noqa: E402
+from app.auth.passwords import password_hasher  # noqa: E402
+from app.onboarding.importer import parse_records, import_users  # noqa: E402
+from app.patients.models import Patient  # noqa: E402
+
+
+def write_records(path, count):
+    with open(path, "w") as out:
+        for i in range(count):
+            out.write(json.dumps({
+                "firstname": "Bench",
+                "lastname": f"Patient{i}",
+                "email": f"patient{i}@example.com",
+                "phone": f"07{i:08d}",
+                "password": f"password-{i}",
+                "date_of_birth": "1990-01-01",
+            }) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=10_000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--method", default="scrypt:32768:8:1")
+    parser.add_argument("--database-uri")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": args.database_uri or f"sqlite:///{os.path.join(tmp, 'import.db')}",
+            "JWT_SECRET_KEY": "benchmark",
+            "CACHE_TYPE": "SimpleCache",
+            "PASSWORD_HASH_METHOD": args.method,
+            "PASSWORD_HASH_WORKERS": args.workers,
+        })
+        path = os.path.join(tmp, "patients.ndjson")
+        write_records(path, args.records)
+
+        with app.app_context():
+            if not args.database_uri:
+                Patient.__table__.create(db.engine)
+            started = time.perf_counter()
+            with open(path) as lines:
+                report = import_users("patient", parse_records(lines, "ndjson"), batch_size=args.batch_size)
+            elapsed = time.perf_counter() - started
+            password_hasher.shutdown()
+
+        print(f"{args.method}, {args.workers} hashing workers, {os.cpu_count()} CPUs")
+        print(f"Imported {report.created} of {report.total} in {elapsed:.1f}s, "
+              f"{report.created / elapsed * 60:,.0f} records/min")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Bytes on the wire for the doctor directory and appointment listing pages.
+
+Fetches a full page of each endpoint without compression, with gzip, with
+brotli (when installed) and as a revalidation with If-None-Match, against
+a SQLite stand-in database:
+
+    python benchmarks/bytes_on_wire.py --limit 200
+
+Only bytes are measured. The appointment listing still builds and
+serializes its page to hash it on a revalidation, so its 304s save
+bandwidth, not CPU; the directory answers them from its cached ETag.
+"""
+import argparse
+import os
+import sys
+import time
+import uuid
+from datetime import date, datetime, timedelta, time as dt_time
+from sqlalchemy import MetaData
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+from app import create_app, db  # noqa: E402
+from app.appointments.models import Appointment  # noqa: E402
+from app.doctors.models import Doctor  # noqa: E402
+from app.patients.models import Patient  # noqa: E402
+from utils.http import brotli  # noqa: E402
+
+PATIENT_ID = uuid.UUID("5b1d7c2e-a4f3-4c8e-9d6b-0e2f1a3c5d7b")
+SPECIALIZATIONS = ["Cardiology", "Dermatology", "Neurology", "Oncology", "Paediatrics", "Radiology"]
+
+
+def make_id(n):
+    # A leading hex letter keeps SQLite from coercing an all-digit UUID to a number.
+    return uuid.UUID(int=(0xA << 124) | n)
+
+
+def populate(rows):
+    # employee_id comes from a Postgres sequence, SQLite gets a plain column.
+    doctors = Doctor.__table__.to_metadata(MetaData())
+    doctors.c.employee_id.server_default = None
+    doctors.create(db.engine)
+    Patient.__table__.create(db.engine)
+    Appointment.__table__.create(db.engine)
+
+    db.session.add(Patient(
+        patient_id=PATIENT_ID, firstname="Bench", lastname="Mark", email="bench@example.com",
+        phone="0700000000", date_of_birth=datetime(1990, 1, 1), password="x",
+    ))
+    db.session.execute(doctors.insert(), [{
+        "doctor_id": make_id(i), "employee_id": i + 1, "firstname": f"Firstname{i}", "lastname": f"Lastname{i}",
+        "specialization": SPECIALIZATIONS[i % len(SPECIALIZATIONS)], "email": f"doctor{i}@example.com",
+        "phone": f"07{i:08d}", "password": "x", "days_available_mask": 0,
+    } for i in range(rows)])
+    start = date(2025, 1, 1)
+    db.session.execute(Appointment.__table__.insert(), [{
+        "appointment_id": make_id(i), "patient_id": PATIENT_ID, "doctor_id": make_id(i % rows),
+        "date": start + timedelta(days=i // 16), "time": dt_time(8 + i % 16 // 2, 30 * (i % 2)), "status": "booked",
+    } for i in range(rows)])
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--limit", type=int, default=200, help="Page size of both endpoints")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    app = create_app({
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": "sqlite://",
+        "JWT_SECRET_KEY": "benchmark",
+        "CACHE_TYPE": "SimpleCache",
+        "DOCTOR_DIRECTORY_MAX_PAGE_SIZE": args.limit,
+        "APPOINTMENTS_MAX_PAGE_SIZE": args.limit,
+    })
+    with app.app_context():
+        populate(args.limit)
+        token = create_access_token(identity=str(PATIENT_ID), additional_claims={"role": "patient"})
+        client = app.test_client()
+        client.environ_base["HTTP_AUTHORIZATION"] = f"Bearer {token}"
+
+        encodings = ["identity", "gzip"] + (["br"] if brotli is not None else [])
+        for url in ("/api/v1/doctors/", "/api/v1/appointments/"):
+            query = {"limit": args.limit}
+            etag = client.get(url, query_string=query).headers["ETag"]
+            for encoding in encodings + ["revalidate"]:
+                headers = {"If-None-Match": etag} if encoding == "revalidate" else {"Accept-Encoding": encoding}
+                started = time.perf_counter()
+                for _ in range(args.repeat):
+                    response = client.get(url, query_string=query, headers=headers)
+                elapsed = (time.perf_counter() - started) / args.repeat
+                print(
+                    f"{url:24s} {encoding:10s} {response.status_code} "
+                    f"{len(response.get_data()):8d} bytes {elapsed * 1000:8.2f} ms/request"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Peak RSS of the streaming appointment export versus materializing every row.
+
+Each mode runs in a fresh subprocess against the same SQLite stand-in database
+so the peak resident set sizes are comparable:
+
+    python benchmarks/export_rss.py --rows 1000000
+
+Point --database-uri at a scratch Postgres database to measure it there instead.
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import date, datetime, timedelta, time as dt_time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+from app import create_app, db  # noqa: E402
+from app.appointments.models import Appointment  # noqa: E402
+from app.patients.models import Patient  # noqa: E402
+from app.appointments.serializers import appointment_serializer  # noqa: E402
+
+PATIENT_ID = uuid.UUID("5b1d7c2e-a4f3-4c8e-9d6b-0e2f1a3c5d7b")
+
+
+def make_id(n):
+    # A leading hex letter keeps SQLite from coercing an all-digit UUID to a number.
+    return uuid.UUID(int=(0xA << 124) | n)
+
+
+def make_app(database_uri):
+    return create_app({
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": database_uri,
+        "JWT_SECRET_KEY": "benchmark",
+        "CACHE_TYPE": "SimpleCache",
+    })
+
+
+def populate(database_uri, rows):
+    app = make_app(database_uri)
+    with app.app_context():
+        Patient.__table__.create(db.engine)
+        Appointment.__table__.create(db.engine)
+        db.session.add(Patient(
+            patient_id=PATIENT_ID, firstname="Bench", lastname="Mark", email="bench@example.com",
+            phone="0700000000", date_of_birth=datetime(1990, 1, 1), password="x",
+        ))
+        db.session.commit()
+
+        start, batch = date(2020, 1, 1), []
+        for i in range(rows):
+            batch.append({
+                "appointment_id": make_id(i),
+                "patient_id": PATIENT_ID,
+                "doctor_id": make_id(i % 50),
+                "date": start + timedelta(days=i // 16),
+                "time": dt_time(8 + i % 16 // 2, 30 * (i % 2)),
+                "status": "booked",
+            })
+            if len(batch) == 10000:
+                db.session.execute(Appointment.__table__.insert(), batch)
+                batch = []
+        if batch:
+            db.session.execute(Appointment.__table__.insert(), batch)
+        db.session.commit()
+
+
+def measure(database_uri, mode):
+    app = make_app(database_uri)
+    with app.app_context():
+        headers = {"Authorization": f"Bearer {create_access_token(identity=str(PATIENT_ID), additional_claims={'role': 'patient'})}"}
+        client = app.test_client()
+        started = time.perf_counter()
+        total = 0
+
+        if mode == "stream":
+            response = client.get("/api/v1/appointments/export", headers=headers, buffered=False)
+            for chunk in response.response:
+                total += len(chunk)
+            response.close()
+        else:
+            appointments = Appointment.query.filter_by(patient_id=PATIENT_ID).all()
+            total = len(app.json.dumps(appointment_serializer.many(appointments)))
+
+        elapsed = time.perf_counter() - started
+        peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"{mode:12s} {elapsed:8.2f}s {total / 1e6:10.1f} MB out {peak_mb:10.1f} MB peak RSS")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--database-uri")
+    parser.add_argument("--mode", choices=["stream", "materialize"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        measure(args.database_uri, args.mode)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_uri = args.database_uri or f"sqlite:///{os.path.join(tmp, 'export.db')}"
+        print(f"Populating {args.rows} appointments...")
+        populate(database_uri, args.rows)
+        for mode in ("stream", "materialize"):
+            subprocess.run(
+                [sys.executable, __file__, "--mode", mode, "--database-uri", database_uri],
+                check=True,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Import time profile of an app cold start.
+
+Runs create_app() in a fresh interpreter under `python -X importtime` and
+reports the slowest imports by cumulative time (a module and everything
+it imported first), the total per top-level package and the wall time of
+the import and of create_app itself:
+
+    python benchmarks/import_time.py --top 25
+
+Pass --raw to write the unprocessed -X importtime log to a file, e.g. for
+tuna (https://github.com/nschloe/tuna).
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COLD_START = """
+import time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+create_app({
+    "TESTING": True,
+    "SQLALCHEMY_DATABASE_URI": "sqlite://",
+    "JWT_SECRET_KEY": "benchmark",
+    "CACHE_TYPE": "SimpleCache",
+})
+print(f"{imported - started} {time.perf_counter() - imported}")
+"""
+
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def profile():
+    """Return the (self us, cumulative us, depth, module) rows and the two wall times."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", COLD_START],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            own, cumulative, indent, module = match.groups()
+            rows.append((int(own), int(cumulative), len(indent) // 2, module))
+    import_seconds, create_seconds = map(float, result.stdout.split()[-2:])
+    return rows, import_seconds, create_seconds, result.stderr
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--raw", help="Write the -X importtime log to this file")
+    args = parser.parse_args()
+
+    # A first run compiles the bytecode caches, which are not part of a cold start
+    profile()
+    rows, import_seconds, create_seconds, log = profile()
+    if args.raw:
+        with open(args.raw, "w") as raw:
+            raw.write(log)
+
+    print(f"import app {import_seconds * 1000:.0f} ms, create_app() {create_seconds * 1000:.0f} ms\n")
+    print("Slowest imports, cumulative ms:")
+    for own, cumulative, depth, module in sorted(rows, key=lambda row: -row[1])[:args.top]:
+        print(f"  {cumulative / 1000:8.1f}  {own / 1000:8.1f} self  {'  ' * depth}{module}")
+
+    packages = {}
+    for own, _, _, module in rows:
+        package = module.split(".")[0]
+        packages[package] = packages.get(package, 0) + own
+    print("\nBy top-level package, ms:")
+    for package, own in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {own / 1000:8.1f}  {package}")
+
+
+if __name__ == "__main__":
+    main()
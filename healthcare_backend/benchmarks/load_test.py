@@ -0,0 +1,186 @@
+"""
+Requests per second and tail latency of the sync and ASGI serving modes.
+
+Starts the app once per mode in a server process pinned to the same CPU
+cores, then drives the doctor slots endpoint (an async view in ASGI mode)
+with concurrent keep-alive clients from this process:
+
+    sync  the threaded Werkzeug server, every handler blocking its thread
+    asgi  uvicorn with create_asgi_app(), needs uvicorn
+
+The database is a SQLite stand-in, so --latency-ms adds a sleep to every
+SQL statement to stand in for the round trip to Postgres:
+
+    python benchmarks/load_test.py --cores 2 --clients 64 --seconds 10 --latency-ms 5
+"""
+import argparse
+import http.client
+import logging
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta, time as dt_time
+from sqlalchemy import MetaData
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+from app import create_app, create_asgi_app, db  # noqa: E402
+from app.appointments.models import Appointment  # noqa: E402
+from app.doctors.models import Doctor  # noqa: E402
+from app.patients.models import Patient  # noqa: E402
+
+DOCTOR_ID = uuid.UUID("a3c5d7b9-1e2f-4a6b-8c0d-2e4f6a8b0c1d")
+PATIENT_ID = uuid.UUID("5b1d7c2e-a4f3-4c8e-9d6b-0e2f1a3c5d7b")
+
+
+def config(database):
+    return {
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{database}",
+        "JWT_SECRET_KEY": "benchmark",
+        "CACHE_TYPE": "SimpleCache",
+        "METRICS_ENABLED": False,
+        "MAIL_DISPATCHER_AUTOSTART": False,
+    }
+
+
+def populate(app):
+    with app.app_context():
+        # employee_id comes from a Postgres sequence, SQLite gets a plain column.
+        doctors = Doctor.__table__.to_metadata(MetaData())
+        doctors.c.employee_id.server_default = None
+        doctors.create(db.engine)
+        Patient.__table__.create(db.engine)
+        Appointment.__table__.create(db.engine)
+        db.session.add(Patient(
+            patient_id=PATIENT_ID, firstname="Bench", lastname="Mark", email="bench@example.com",
+            phone="0700000001", date_of_birth=datetime(1990, 1, 1), password="x",
+        ))
+        db.session.execute(doctors.insert(), [{
+            "doctor_id": DOCTOR_ID, "employee_id": 1, "firstname": "Bench", "lastname": "Mark",
+            "specialization": "Cardiology", "email": "doctor@example.com", "phone": "0700000000", "password": "x",
+            "availability_start": dt_time(8, 0), "availability_end": dt_time(17, 0),
+            "days_available_mask": 0b11111,  # Monday to Friday
+        }])
+        db.session.commit()
+        # A patient, so every request looks its caller up like real traffic does
+        return create_access_token(identity=str(PATIENT_ID), additional_claims={"role": "patient"})
+
+
+def serve(mode, port, database, latency_ms):
+    """Run one server, called in the child process."""
+    if latency_ms:
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+        event.listen(Engine, "before_cursor_execute", lambda *args: time.sleep(latency_ms / 1000))
+
+    if mode == "sync":
+        from werkzeug.serving import make_server
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)  # Like uvicorn's log_level below
+        make_server("127.0.0.1", port, create_app(config(database)), threaded=True).serve_forever()
+    else:
+        import uvicorn
+        uvicorn.run(create_asgi_app(config(database)), host="127.0.0.1", port=port, log_level="warning")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+def drive(port, path, token, clients, seconds):
+    stop = time.perf_counter() + seconds
+    latencies = [[] for _ in range(clients)]
+    errors = []
+
+    def client(i):
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        headers = {"Authorization": f"Bearer {token}"}
+        while time.perf_counter() < stop:
+            started = time.perf_counter()
+            try:
+                connection.request("GET", path, headers=headers)
+                response = connection.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException) as error:
+                errors.append(error)
+                connection.close()
+                continue
+            if response.status == 200:
+                latencies[i].append(time.perf_counter() - started)
+            else:
+                errors.append(response.status)
+        connection.close()
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    timings = sorted(latency for client_latencies in latencies for latency in client_latencies)
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))] if timings else float("nan")
+    return len(timings) / elapsed, p99, len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", default="sync,asgi")
+    parser.add_argument("--cores", type=int, default=2, help="CPU cores each server is pinned to")
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--latency-ms", type=float, default=5, help="Sleep added to every SQL statement")
+    parser.add_argument("--serve", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--database", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port, args.database, args.latency_ms)
+        return
+
+    cores = sorted(os.sched_getaffinity(0))[:args.cores]
+    start = date.today() + timedelta(days=1)
+    path = f"/api/v1/doctors/{DOCTOR_ID}/slots?start_date={start}&end_date={start + timedelta(days=6)}"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database = os.path.join(tmp, "load.db")
+        token = populate(create_app(config(database)))
+        print(f"{args.clients} clients, {args.latency_ms} ms per statement, servers pinned to CPUs {cores}")
+        for mode in args.modes.split(","):
+            port = free_port()
+            server = subprocess.Popen(
+                [sys.executable, __file__, "--serve", mode, "--port", str(port),
+                 "--database", database, "--latency-ms", str(args.latency_ms)],
+                preexec_fn=lambda: os.sched_setaffinity(0, cores),
+            )
+            try:
+                wait_for(port)
+                drive(port, path, token, args.clients, 1)  # Warm up
+                rate, p99, errors = drive(port, path, token, args.clients, args.seconds)
+            finally:
+                server.terminate()
+                server.wait()
+            print(f"{mode:>5}: {rate:8.1f} req/s  p99 {p99 * 1000:7.1f} ms  {errors} errors")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Logins per second against the password hashing pool size.
+
+Concurrent clients log the same patient in over and over through the real
+login endpoint, backed by a SQLite stand-in database. Pool size 0 hashes on
+the request threads, which is how logins behaved before the pool existed:
+
+    python benchmarks/login_throughput.py --clients 16 --seconds 5 --pools 0,1,2,4,8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db  # noqa: E402
+from app.auth.passwords import password_hasher  # noqa: E402
+from app.patients.models import Patient  # noqa: E402
+
+EMAIL = "bench@example.com"
+PASSWORD = "benchmark-password"
+
+
+def run(app, clients, seconds):
+    stop = time.perf_counter() + seconds
+    counts = [0] * clients
+    errors = []
+
+    def client(i):
+        http = app.test_client()
+        while time.perf_counter() < stop:
+            response = http.post("/api/v1/patients/login", json={"email": EMAIL, "password": PASSWORD})
+            if response.status_code == 200:
+                counts[i] += 1
+            else:
+                errors.append(response.status_code)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / (time.perf_counter() - started), len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--pools", default=f"0,1,2,4,{os.cpu_count()}")
+    parser.add_argument("--method", default="scrypt:32768:8:1")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(tmp, 'login.db')}",
+            "JWT_SECRET_KEY": "benchmark",
+            "CACHE_TYPE": "SimpleCache",
+            "PASSWORD_HASH_METHOD": args.method,
+            "PASSWORD_HASH_WORKERS": 0,
+        })
+        with app.app_context():
+            Patient.__table__.create(db.engine)
+            db.session.add(Patient(
+                firstname="Bench", lastname="Mark", email=EMAIL, phone="0700000000",
+                date_of_birth=datetime(1990, 1, 1), password=password_hasher.hash(PASSWORD),
+            ))
+            db.session.commit()
+
+        print(f"{args.method}, {args.clients} clients, {os.cpu_count()} CPUs")
+        for workers in (int(size) for size in args.pools.split(",")):
+            app.config["PASSWORD_HASH_WORKERS"] = workers
+            rate, errors = run(app, args.clients, args.seconds)
+            password_hasher.shutdown()
+            label = "inline" if workers == 0 else f"{workers} workers"
+            print(f"{label:12s} {rate:8.1f} logins/s {errors:6d} errors")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Serialization throughput of appointment listings.
+
+Serializes the same appointments with the dict literal the routes used
+to build by hand and with the shared appointment serializer, then encodes
+the result with the stdlib json module and with orjson (when installed):
+
+    python benchmarks/serialization.py --rows 10000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import date, timedelta, time as dt_time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from app.appointments.models import Appointment  # noqa: E402
+from app.appointments.serializers import appointment_serializer  # noqa: E402
+from utils.serializers import orjson  # noqa: E402
+
+
+def by_hand(appointments):
+    return [
+        {
+            "appointmentId": str(appointment.appointment_id),
+            "patientId": str(appointment.patient_id),
+            "doctorId": str(appointment.doctor_id),
+            "date": appointment.date.strftime("%Y-%m-%d"),
+            "time": appointment.time.strftime("%H:%M"),
+            "status": appointment.status,
+        }
+        for appointment in appointments
+    ]
+
+
+def best_of(repeat, fn, *args):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    # Mapped classes need their registry configured, which create_app does
+    create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": "sqlite://", "CACHE_TYPE": "SimpleCache"})
+    start = date(2025, 1, 1)
+    appointments = [
+        Appointment(
+            appointment_id=uuid.uuid4(), patient_id=uuid.uuid4(), doctor_id=uuid.uuid4(),
+            date=start + timedelta(days=i // 16), time=dt_time(8 + i % 16 // 2, 30 * (i % 2)), status="booked",
+        )
+        for i in range(args.rows)
+    ]
+
+    def report(name, seconds):
+        print(f"{name:28s} {seconds * 1000:8.2f} ms {args.rows / seconds:12,.0f} rows/s")
+
+    elapsed, body = best_of(args.repeat, by_hand, appointments)
+    report("dicts by hand", elapsed)
+    elapsed, body = best_of(args.repeat, appointment_serializer.many, appointments)
+    report("appointment_serializer", elapsed)
+    assert body == by_hand(appointments)
+
+    elapsed, _ = best_of(args.repeat, json.dumps, body)
+    report("encode with json", elapsed)
+    if orjson is not None:
+        elapsed, _ = best_of(args.repeat, orjson.dumps, body)
+        report("encode with orjson", elapsed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Startup time and per-worker memory of gunicorn with and without preloading.
+
+Starts gunicorn with gunicorn.conf.py against a SQLite stand-in database,
+times how long it takes to answer its first request, warms every worker up
+and then reads each worker's memory from /proc (Linux only):
+
+    rss      resident memory, counting pages shared with other processes
+    pss      resident memory with shared pages split between their sharers
+    private  pages only this worker uses, what each extra worker costs
+
+With preloading the workers share the master's imported modules and app
+copy-on-write, so their private memory is a fraction of their RSS:
+
+    python benchmarks/server_memory.py --workers 4
+"""
+import argparse
+import http.client
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PORT = 5077
+
+
+def memory(pid):
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as rollup:
+        for line in rollup:
+            name, _, value = line.partition(":")
+            if value.strip().endswith("kB"):
+                fields[name] = int(value.split()[0])
+    return {
+        "rss": fields["Rss"],
+        "pss": fields["Pss"],
+        "private": fields["Private_Clean"] + fields["Private_Dirty"],
+    }
+
+
+def children(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as listing:
+        return [int(child) for child in listing.read().split()]
+
+
+def get(path):
+    connection = http.client.HTTPConnection("127.0.0.1", PORT, timeout=5)
+    try:
+        connection.request("GET", path)
+        response = connection.getresponse()
+        response.read()
+        return response.status
+    finally:
+        connection.close()
+
+
+def measure(preload, workers, database):
+    env = {
+        **os.environ,
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{database}",
+        "JWT_SECRET_KEY": "benchmark",
+        "MAIL_DISPATCHER_AUTOSTART": "False",
+        "CACHE_L1_ENABLED": "False",  # No Redis to broadcast invalidations
+        "GUNICORN_BIND": f"127.0.0.1:{PORT}",
+        "GUNICORN_PRELOAD": str(preload),
+        "WEB_CONCURRENCY": str(workers),
+    }
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "wsgi:application"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            try:
+                get("/metrics")
+                break
+            except OSError:
+                if server.poll() is not None:
+                    raise RuntimeError("gunicorn exited, run it by hand to see why")
+                time.sleep(0.01)
+        first_response = time.perf_counter() - started
+
+        # Fresh connections spread the requests over every worker
+        for _ in range(workers * 50):
+            get("/api/v1/docs")
+        time.sleep(1)
+        return first_response, memory(server.pid), [memory(pid) for pid in children(server.pid)]
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database = os.path.join(tmp, "server.db")
+        print(f"{args.workers} workers, memory in MB")
+        for preload in (False, True):
+            first_response, master, workers = measure(preload, args.workers, database)
+            mean = {field: sum(worker[field] for worker in workers) / len(workers) / 1024 for field in master}
+            total = (master["pss"] + sum(worker["pss"] for worker in workers)) / 1024
+            print(
+                f"preload={preload!s:5}  first response {first_response:5.2f} s  "
+                f"per worker rss {mean['rss']:5.1f} pss {mean['pss']:5.1f} private {mean['private']:5.1f}  "
+                f"total pss {total:6.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
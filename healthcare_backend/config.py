@@ -22,6 +22,83 @@ class Config:
     MAIL_PASSWORD = os.getenv("MAIL_PASSWORD")
     MAIL_DEFAULT_SENDER = os.getenv("MAIL_DEFAULT_SENDER")
 
+    # Email outbox dispatcher
+    MAIL_DISPATCHER_AUTOSTART = os.getenv("MAIL_DISPATCHER_AUTOSTART", "True") == "True"
+    MAIL_DISPATCHER_WORKERS = int(os.getenv("MAIL_DISPATCHER_WORKERS", 4))
+    MAIL_DISPATCHER_POLL_INTERVAL = float(os.getenv("MAIL_DISPATCHER_POLL_INTERVAL", 2))
+    MAIL_DISPATCHER_BATCH_SIZE = int(os.getenv("MAIL_DISPATCHER_BATCH_SIZE", 100))
+    MAIL_DISPATCHER_CONNECTION_BATCH = int(os.getenv("MAIL_DISPATCHER_CONNECTION_BATCH", 25))
+    MAIL_MAX_ATTEMPTS = int(os.getenv("MAIL_MAX_ATTEMPTS", 5))
+    MAIL_RETRY_BACKOFF = int(os.getenv("MAIL_RETRY_BACKOFF", 30))  # Seconds before the first retry
+    MAIL_RETRY_BACKOFF_MAX = int(os.getenv("MAIL_RETRY_BACKOFF_MAX", 3600))
+
+    # Appointment slots
+    APPOINTMENT_SLOT_MINUTES = int(os.getenv("APPOINTMENT_SLOT_MINUTES", 30))
+    SLOT_SEARCH_MAX_DAYS = int(os.getenv("SLOT_SEARCH_MAX_DAYS", 31))
+
+    # Database connection pool, see utils.db_pool
+    DATABASE_POOL_SIZE = int(os.getenv("DATABASE_POOL_SIZE", 10))  # Per worker process
+    DATABASE_POOL_MAX_OVERFLOW = int(os.getenv("DATABASE_POOL_MAX_OVERFLOW", 5))
+    DATABASE_POOL_TIMEOUT = float(os.getenv("DATABASE_POOL_TIMEOUT", 10))  # Seconds to wait for a free connection
+    DATABASE_POOL_PRE_PING = os.getenv("DATABASE_POOL_PRE_PING", "True") == "True"
+    DATABASE_POOL_RECYCLE = int(os.getenv("DATABASE_POOL_RECYCLE", 1800))  # Seconds, below the server's idle timeout
+    DATABASE_POOL_SLOW_CHECKOUT_MS = int(os.getenv("DATABASE_POOL_SLOW_CHECKOUT_MS", 100))  # Longer waits are logged
+    DATABASE_STATEMENT_TIMEOUT = int(os.getenv("DATABASE_STATEMENT_TIMEOUT", 30000))  # Milliseconds, Postgres only, 0 for none
+
+    # Read replicas for GET requests, see utils.db_routing
+    DATABASE_REPLICA_URIS = [uri for uri in os.getenv("DATABASE_REPLICA_URIS", "").split(",") if uri]
+    DATABASE_REPLICA_PIN_SECONDS = int(os.getenv("DATABASE_REPLICA_PIN_SECONDS", 10))  # Reads stay on the primary after a write, above the usual lag
+
+    # Pagination
+    APPOINTMENTS_PAGE_SIZE = int(os.getenv("APPOINTMENTS_PAGE_SIZE", 50))
+    APPOINTMENTS_MAX_PAGE_SIZE = int(os.getenv("APPOINTMENTS_MAX_PAGE_SIZE", 200))
+    DOCTOR_DIRECTORY_PAGE_SIZE = int(os.getenv("DOCTOR_DIRECTORY_PAGE_SIZE", 50))
+    DOCTOR_DIRECTORY_MAX_PAGE_SIZE = int(os.getenv("DOCTOR_DIRECTORY_MAX_PAGE_SIZE", 200))
+
+    # Password hashing
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")  # werkzeug method string with its cost
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))  # 0 hashes on the request thread
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", 64))
+    PASSWORD_HASH_TIMEOUT = float(os.getenv("PASSWORD_HASH_TIMEOUT", 10))  # Seconds
+
+    # Bulk onboarding
+    ONBOARDING_BATCH_SIZE = int(os.getenv("ONBOARDING_BATCH_SIZE", 1000))  # Rows per transaction
+    ONBOARDING_MAX_BYTES = int(os.getenv("ONBOARDING_MAX_BYTES", 100 * 1024 * 1024))  # Import request bodies
+
+    # Request bodies larger than this are refused with 413 before they are
+    # read, room for a base64 encoded image of IMAGE_MAX_BYTES
+    MAX_CONTENT_LENGTH = int(os.getenv("MAX_CONTENT_LENGTH", 8 * 1024 * 1024))
+
+    # Profile images
+    IMAGE_STORE_PATH = os.getenv("IMAGE_STORE_PATH")  # Defaults to instance/blobs
+    IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", 5 * 1024 * 1024))
+    IMAGE_MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", 40_000_000))  # Width times height
+    IMAGE_THUMBNAIL_SIZES = [int(size) for size in os.getenv("IMAGE_THUMBNAIL_SIZES", "128,512").split(",")]  # Pixels
+    IMAGE_CACHE_MAX_AGE = int(os.getenv("IMAGE_CACHE_MAX_AGE", 365 * 24 * 3600))  # Seconds
+
+    # Swagger UI at /api/v1/docs and its swagger.json, off under gunicorn.conf.py
+    API_DOCS_ENABLED = os.getenv("API_DOCS_ENABLED", "True") == "True"
+
+    # ASGI serving, see asgi.py
+    # Concurrent requests per worker process. An async view holds up to two
+    # connections at once, keep twice this within the pool size plus overflow.
+    ASGI_THREADS = int(os.getenv("ASGI_THREADS", 7))
+
+    # Metrics
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True") == "True"
+    METRICS_PATH = os.getenv("METRICS_PATH", "/metrics")  # Scraped by Prometheus, keep it off the public ingress
+    # Shared by the workers of one server to add up their metrics, set by gunicorn.conf.py
+    METRICS_MULTIPROCESS_DIR = os.getenv("METRICS_MULTIPROCESS_DIR")
+    METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", 1.0))  # Seconds, how stale other workers' metrics may be
+
+    # Response rendering
+    ORJSON_ENABLED = os.getenv("ORJSON_ENABLED", "True") == "True"  # Used when orjson is installed
+
+    # Response compression
+    COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", 1024))  # Smaller bodies are sent as is
+    COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", 6))
+    COMPRESS_BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", 5))  # Used when brotli is installed
+
     # Redis Config
     CACHE_TYPE = "redis"
     CACHE_REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
@@ -30,3 +107,8 @@ class Config:
     CACHE_REDIS_URL = f"redis://{CACHE_REDIS_HOST}:{CACHE_REDIS_PORT}/{CACHE_REDIS_DB}"
     CACHE_DEFAULT_TIMEOUT = 300  # Cache timeout in seconds (5 minutes)
 
+    # In-process cache in front of Redis for doctor read models
+    CACHE_L1_ENABLED = os.getenv("CACHE_L1_ENABLED", "True") == "True"
+    CACHE_L1_MAXSIZE = int(os.getenv("CACHE_L1_MAXSIZE", 1024))  # Entries per read model
+    CACHE_L1_TTL = int(os.getenv("CACHE_L1_TTL", 30))  # Seconds, bounds staleness if a message is lost
+    CACHE_INVALIDATION_CHANNEL = os.getenv("CACHE_INVALIDATION_CHANNEL", "cache-invalidation")
@@ -0,0 +1,77 @@
+"""
+Gunicorn settings for production, picked up from the working directory:
+
+    gunicorn wsgi:application
+
+The app is created once in the master and forked into the workers, which
+share its memory copy-on-write. Worker and thread counts follow the CPUs
+the server may run on, WEB_CONCURRENCY and GUNICORN_THREADS override them.
+
+Reloading: with preloading, code is only read by the master, so SIGHUP
+restarts the workers gracefully but keeps the old code. To deploy new code
+send SIGUSR2, which starts a new master next to the old one, then SIGTERM
+to the old master once the new workers are up; in-flight requests get
+graceful_timeout seconds to finish.
+"""
+import gc
+import glob
+import os
+import tempfile
+
+from utils.metrics import mark_process_dead
+from utils.prefork import after_fork, before_fork
+
+# Production serves no API docs unless API_DOCS_ENABLED says otherwise
+os.environ.setdefault("API_DOCS_ENABLED", "False")
+
+# The workers add up their metrics through snapshot files, see utils.metrics.
+# Prometheus then scrapes /metrics through the server as usual.
+if not os.getenv("METRICS_MULTIPROCESS_DIR"):
+    os.environ["METRICS_MULTIPROCESS_DIR"] = tempfile.mkdtemp(prefix="gunicorn-metrics-")
+
+cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', 5000)}")
+preload_app = os.getenv("GUNICORN_PRELOAD", "True") == "True"
+
+# One process per CPU for the Python work, threads cover the database,
+# Redis and SMTP waits. Keep threads within DATABASE_POOL_SIZE plus
+# DATABASE_POOL_MAX_OVERFLOW so requests do not queue for a connection.
+worker_class = "gthread"
+workers = int(os.getenv("WEB_CONCURRENCY", cpus))
+threads = int(os.getenv("GUNICORN_THREADS", 8))
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 60))  # Seconds before a stuck worker is restarted
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
+
+
+def on_starting(server):
+    # Counts of a previous server's workers would be added to this one's
+    for path in glob.glob(os.path.join(os.environ["METRICS_MULTIPROCESS_DIR"], "*.json")):
+        os.remove(path)
+
+
+def pre_fork(server, worker):
+    if server.cfg.preload_app:
+        before_fork(server.app.wsgi())
+        # Keep the cyclic GC from touching, and so copying, the shared objects
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    # Without preloading the worker creates its own app after this hook
+    if server.cfg.preload_app:
+        after_fork(server.app.wsgi())
+
+
+def worker_exit(server, worker):
+    # Deliver what the dispatcher already claimed before the worker goes
+    server.app.wsgi().extensions["email_dispatcher"].stop(timeout=graceful_timeout)
+
+
+def child_exit(server, worker):
+    mark_process_dead(os.environ["METRICS_MULTIPROCESS_DIR"], worker.pid)
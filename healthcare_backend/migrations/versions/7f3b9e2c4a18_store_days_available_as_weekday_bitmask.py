@@ -0,0 +1,65 @@
+"""Store days_available as a weekday bitmask
+
+Revision ID: 7f3b9e2c4a18
+Revises: e5a7c2d91f04
+Create Date: 2025-04-17 11:45:52.378014
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7f3b9e2c4a18'
+down_revision = 'e5a7c2d91f04'
+branch_labels = None
+depends_on = None
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+doctors = sa.table(
+    'doctors',
+    sa.column('doctor_id', sa.UUID()),
+    sa.column('days_available', sa.String(length=100)),
+    sa.column('days_available_mask', sa.SmallInteger()),
+)
+
+
+def upgrade():
+    with op.batch_alter_table('doctors', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('days_available_mask', sa.SmallInteger(), server_default='0', nullable=False))
+
+    # Convert the comma separated day names, ignoring anything that is not a weekday
+    connection = op.get_bind()
+    rows = connection.execute(
+        sa.select(doctors.c.doctor_id, doctors.c.days_available).where(doctors.c.days_available.isnot(None))
+    ).all()
+    for doctor_id, days_available in rows:
+        mask = 0
+        for day in days_available.split(','):
+            if day.strip().lower() in WEEKDAYS:
+                mask |= 1 << WEEKDAYS.index(day.strip().lower())
+        connection.execute(
+            doctors.update().where(doctors.c.doctor_id == doctor_id).values(days_available_mask=mask)
+        )
+
+    with op.batch_alter_table('doctors', schema=None) as batch_op:
+        batch_op.drop_column('days_available')
+
+
+def downgrade():
+    with op.batch_alter_table('doctors', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('days_available', sa.String(length=100), nullable=True))
+
+    connection = op.get_bind()
+    rows = connection.execute(
+        sa.select(doctors.c.doctor_id, doctors.c.days_available_mask).where(doctors.c.days_available_mask != 0)
+    ).all()
+    for doctor_id, mask in rows:
+        days = ','.join(day.capitalize() for n, day in enumerate(WEEKDAYS) if mask >> n & 1)
+        connection.execute(
+            doctors.update().where(doctors.c.doctor_id == doctor_id).values(days_available=days)
+        )
+
+    with op.batch_alter_table('doctors', schema=None) as batch_op:
+        batch_op.drop_column('days_available_mask')
@@ -0,0 +1,27 @@
+"""Add unique doctor slot constraint to appointments
+
+Revision ID: b81d3f6a5c20
+Revises: 4c1f0e9a2b7d
+Create Date: 2025-04-15 10:03:27.114902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b81d3f6a5c20'
+down_revision = '4c1f0e9a2b7d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing double bookings must be resolved before this constraint can be added.
+    with op.batch_alter_table('appointment', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_appointment_doctor_slot', ['doctor_id', 'date', 'time'])
+
+
+def downgrade():
+    with op.batch_alter_table('appointment', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_appointment_doctor_slot', type_='unique')
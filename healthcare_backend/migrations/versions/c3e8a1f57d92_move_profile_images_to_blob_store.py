@@ -0,0 +1,95 @@
+"""Move profile images to the blob store
+
+Revision ID: c3e8a1f57d92
+Revises: 7f3b9e2c4a18
+Create Date: 2025-04-18 09:12:37.604113
+
+"""
+import base64
+import binascii
+import io
+import logging
+from alembic import op
+import sqlalchemy as sa
+from flask import current_app
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3e8a1f57d92'
+down_revision = '7f3b9e2c4a18'
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger("alembic.env")
+
+TABLES = {
+    'patients': 'patient_id',
+    'doctors': 'doctor_id',
+}
+
+
+def _table(name, id_column):
+    return sa.table(
+        name,
+        sa.column(id_column, sa.UUID()),
+        sa.column('image', sa.Text()),
+        sa.column('image_key', sa.String(length=80)),
+    )
+
+
+def _decode(image):
+    # Images were sent either as bare base64 or as a data URI
+    if image.startswith('data:'):
+        image = image.partition(',')[2]
+    try:
+        return base64.b64decode(image, validate=True)
+    except (binascii.Error, ValueError):
+        return None
+
+
+def upgrade():
+    blob_store = current_app.extensions['blob_store']
+    connection = op.get_bind()
+
+    for name, id_column in TABLES.items():
+        with op.batch_alter_table(name, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('image_key', sa.String(length=80), nullable=True))
+
+        table = _table(name, id_column)
+        rows = connection.execute(
+            sa.select(table.c[id_column], table.c.image).where(table.c.image.isnot(None), table.c.image != '')
+        ).all()
+        for row_id, image in rows:
+            data = _decode(image)
+            if data is None:
+                logger.warning(f"Dropping undecodable image of {name} {row_id}")
+                continue
+            connection.execute(
+                table.update().where(table.c[id_column] == row_id).values(image_key=blob_store.put(io.BytesIO(data)))
+            )
+
+        with op.batch_alter_table(name, schema=None) as batch_op:
+            batch_op.drop_column('image')
+
+
+def downgrade():
+    blob_store = current_app.extensions['blob_store']
+    connection = op.get_bind()
+
+    for name, id_column in TABLES.items():
+        with op.batch_alter_table(name, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('image', sa.Text(), nullable=True))
+
+        table = _table(name, id_column)
+        rows = connection.execute(
+            sa.select(table.c[id_column], table.c.image_key).where(table.c.image_key.isnot(None))
+        ).all()
+        for row_id, key in rows:
+            if not blob_store.exists(key):
+                continue
+            with blob_store.open(key) as blob:
+                image = base64.b64encode(blob.read()).decode()
+            connection.execute(table.update().where(table.c[id_column] == row_id).values(image=image))
+
+        with op.batch_alter_table(name, schema=None) as batch_op:
+            batch_op.drop_column('image_key')
@@ -0,0 +1,39 @@
+"""Add doctor directory indexes
+
+Revision ID: d9f2b6e4c1a3
+Revises: c3e8a1f57d92
+Create Date: 2025-04-19 10:03:44.218976
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9f2b6e4c1a3'
+down_revision = 'c3e8a1f57d92'
+branch_labels = None
+depends_on = None
+
+PREFIX_COLUMNS = ['firstname', 'lastname', 'specialization']
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index('ix_doctors_directory_order', 'doctors',
+                        [sa.text('lower(lastname)'), sa.text('lower(firstname)'), 'doctor_id'],
+                        unique=False, postgresql_concurrently=True)
+        # text_pattern_ops serves LIKE 'prefix%' whatever the database collation
+        for column in PREFIX_COLUMNS:
+            op.create_index(f'ix_doctors_lower_{column}_prefix', 'doctors',
+                            [sa.text(f'lower({column}) text_pattern_ops')],
+                            unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for column in reversed(PREFIX_COLUMNS):
+            op.drop_index(f'ix_doctors_lower_{column}_prefix', table_name='doctors',
+                          postgresql_concurrently=True)
+        op.drop_index('ix_doctors_directory_order', table_name='doctors',
+                      postgresql_concurrently=True)
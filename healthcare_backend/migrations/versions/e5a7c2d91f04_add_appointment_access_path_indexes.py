@@ -0,0 +1,31 @@
+"""Add appointment access path indexes
+
+Revision ID: e5a7c2d91f04
+Revises: b81d3f6a5c20
+Create Date: 2025-04-15 14:21:09.630551
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a7c2d91f04'
+down_revision = 'b81d3f6a5c20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # doctor_id and (doctor_id, date) lookups are served by uq_appointment_doctor_slot.
+    # Built concurrently so a large appointment table stays writable meanwhile.
+    with op.get_context().autocommit_block():
+        op.create_index('ix_appointment_patient_id_date_time', 'appointment',
+                        ['patient_id', 'date', 'time'], unique=False,
+                        postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_appointment_patient_id_date_time', table_name='appointment',
+                      postgresql_concurrently=True)
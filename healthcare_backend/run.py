@@ -1,10 +1,9 @@
-"""This is the main entry point for the application."""
+"""Development server, see wsgi.py and gunicorn.conf.py for production."""
+import os
 from app import create_app
-from config import Config
 
 app = create_app()
-print(Config.JWT_TOKEN_LOCATION)
 
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    app.run(host="0.0.0.0", port=int(os.getenv("PORT", 5000)), debug=os.getenv("FLASK_DEBUG", "True") == "True")
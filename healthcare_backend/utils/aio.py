@@ -0,0 +1,42 @@
+import asyncio
+import threading
+from flask import current_app
+
+
+def _call_slots(app):
+    # One slot per pooled connection, so calls queue here rather than time
+    # out in the pool
+    slots = app.extensions.get("blocking_call_slots")
+    if slots is None:
+        size = app.config["DATABASE_POOL_SIZE"] + app.config["DATABASE_POOL_MAX_OVERFLOW"]
+        slots = app.extensions.setdefault("blocking_call_slots", threading.BoundedSemaphore(size))
+    return slots
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """
+    Await a blocking database or cache call on a worker thread.
+
+    The call runs in its own application context, so it gets its own
+    database session and pooled connection, and several can be awaited at
+    once with asyncio.gather. ORM instances it returns are detached, so it
+    must load every attribute the caller uses. At most DATABASE_POOL_SIZE
+    plus DATABASE_POOL_MAX_OVERFLOW calls run at once per process.
+
+    The caller should close the request's session first, e.g. after the
+    JWT user lookup, or it keeps a connection checked out while it waits.
+
+    Example:
+        db.session.close()
+        doctor, booked = await asyncio.gather(
+            run_blocking(load_doctor, doctor_id),
+            run_blocking(booked_times, doctor_id, start, end),
+        )
+    """
+    app = current_app._get_current_object()
+
+    def call():
+        with _call_slots(app), app.app_context():
+            return fn(*args, **kwargs)
+
+    return await asyncio.to_thread(call)
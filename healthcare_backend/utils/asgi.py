@@ -0,0 +1,54 @@
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+
+logger = logging.getLogger(__name__)
+
+# The undecorated WsgiToAsgiInstance.run_wsgi_app
+_run_wsgi_app = WsgiToAsgiInstance.__dict__["run_wsgi_app"].func
+
+
+class ThreadedWsgiToAsgi(WsgiToAsgi):
+    """
+    Serves a WSGI app to an ASGI server, running requests on a thread pool.
+
+    asgiref's WsgiToAsgi runs every request on one shared thread, so a slow
+    request holds up all the others. Here up to threads requests run at
+    once while the server's event loop keeps accepting connections, and
+    async views run their coroutines on that loop. Lifespan events run
+    on_shutdown callbacks and stop the pool.
+    """
+
+    def __init__(self, wsgi_application, threads, on_shutdown=()):
+        super().__init__(wsgi_application)
+        self.executor = ThreadPoolExecutor(threads, thread_name_prefix="asgi-request")
+        self.on_shutdown = list(on_shutdown)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        instance = WsgiToAsgiInstance(self.wsgi_application, self.duplicate_header_limit)
+        instance.run_wsgi_app = sync_to_async(
+            functools.partial(_run_wsgi_app, instance),
+            thread_sensitive=False,
+            executor=self.executor,
+        )
+        await instance(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                for callback in self.on_shutdown:
+                    try:
+                        await sync_to_async(callback, thread_sensitive=False)()
+                    except Exception:
+                        logger.exception("Shutdown callback failed")
+                self.executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
@@ -0,0 +1,103 @@
+import hashlib
+import os
+import re
+import tempfile
+
+CHUNK_SIZE = 64 * 1024
+KEY_RE = re.compile(r"^[0-9a-f]{64}(-[a-z0-9]+)?$")
+
+
+class BlobTooLarge(Exception):
+    """Raised when a stream is longer than the store's size limit."""
+
+
+class BlobStore:
+    """
+    A content-addressed blob store on the local filesystem.
+
+    Blobs are written to a temporary file while being hashed, then renamed
+    to their SHA-256 digest, so identical uploads are stored once and a
+    key always names the same bytes. Files are fanned out over two levels
+    of directories to keep directory listings short.
+
+    Derived blobs, such as thumbnails, are stored under "<digest>-<suffix>".
+    """
+
+    def __init__(self, root=None, max_bytes=None):
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def init_app(self, app):
+        self.root = app.config.get("IMAGE_STORE_PATH") or os.path.join(app.instance_path, "blobs")
+        self.max_bytes = app.config.get("IMAGE_MAX_BYTES")
+        os.makedirs(self.root, exist_ok=True)
+        app.extensions["blob_store"] = self
+
+    def path(self, key):
+        """
+        Return the file path of a blob.
+
+        Raises:
+            ValueError: If key is not a valid blob key.
+        """
+        if not KEY_RE.match(key):
+            raise ValueError(f"Invalid blob key: {key}")
+        return os.path.join(self.root, key[:2], key[2:4], key)
+
+    def exists(self, key):
+        try:
+            return os.path.exists(self.path(key))
+        except ValueError:
+            return False
+
+    def put(self, stream):
+        """
+        Store the bytes read from a binary stream.
+
+        Returns:
+            str: The blob key, the hex SHA-256 digest of the content.
+
+        Raises:
+            BlobTooLarge: If the stream is longer than max_bytes.
+        """
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+                    size += len(chunk)
+                    if self.max_bytes and size > self.max_bytes:
+                        raise BlobTooLarge()
+                    digest.update(chunk)
+                    out.write(chunk)
+            key = digest.hexdigest()
+            self._commit(tmp_path, key)
+            return key
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def put_derived(self, key, suffix, data):
+        """Store bytes derived from blob key, such as a thumbnail, and return their key."""
+        derived_key = f"{key}-{suffix}"
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                out.write(data)
+            self._commit(tmp_path, derived_key)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return derived_key
+
+    def _commit(self, tmp_path, key):
+        path = self.path(key)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # The rename is atomic, so readers never see a partial blob
+        os.replace(tmp_path, path)
+
+    def open(self, key):
+        return open(self.path(key), "rb")
@@ -0,0 +1,26 @@
+import click
+
+
+class LazyGroup(click.Group):
+    """
+    A command group that is only built when it is run.
+
+    Lets a CLI command group with expensive imports, such as Flask-Migrate's
+    `flask db`, be registered without slowing down every app start. load is
+    called once, when the group is invoked, and returns the group that then
+    parses the arguments and runs in its place. Until then only help is
+    known, for `flask --help`.
+
+    Example:
+        app.cli.add_command(LazyGroup("db", load_migrate_cli, help="Perform database migrations."))
+    """
+
+    def __init__(self, name, load, **kwargs):
+        super().__init__(name, **kwargs)
+        self._load = load
+        self._group = None
+
+    def make_context(self, info_name, args, parent=None, **extra):
+        if self._group is None:
+            self._group = self._load()
+        return self._group.make_context(info_name, args, parent=parent, **extra)
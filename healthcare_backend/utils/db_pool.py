@@ -0,0 +1,172 @@
+import logging
+import threading
+import time
+from flask import current_app
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+
+def _in_memory(uri):
+    return uri in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in uri
+
+
+def engine_options(config):
+    """
+    Build SQLALCHEMY_ENGINE_OPTIONS from the DATABASE_POOL_* settings.
+
+    In-memory SQLite databases keep Flask-SQLAlchemy's single shared
+    connection. The statement timeout is only applied to Postgres.
+
+    Returns:
+        dict: Keyword arguments for create_engine.
+    """
+    uri = config.get("SQLALCHEMY_DATABASE_URI") or ""
+    if _in_memory(uri):
+        return {}
+
+    options = {
+        "poolclass": MonitoredQueuePool,
+        "pool_size": config["DATABASE_POOL_SIZE"],
+        "max_overflow": config["DATABASE_POOL_MAX_OVERFLOW"],
+        "pool_timeout": config["DATABASE_POOL_TIMEOUT"],
+        "pool_pre_ping": config["DATABASE_POOL_PRE_PING"],
+        "pool_recycle": config["DATABASE_POOL_RECYCLE"],
+    }
+    if uri.startswith("postgresql") and config["DATABASE_STATEMENT_TIMEOUT"]:
+        options["connect_args"] = {"options": f"-c statement_timeout={config['DATABASE_STATEMENT_TIMEOUT']}"}
+    return options
+
+
+class PoolStats:
+    """Checkout counters of one connection pool, kept across pool recreation."""
+
+    def __init__(self, slow_checkout=0.1):
+        self.slow_checkout = slow_checkout
+        self.checkouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.slow_checkouts = 0
+        self.timeouts = 0
+        self.overflow_checkouts = 0
+        self.peak_in_use = 0
+        self._lock = threading.Lock()
+
+    def record_checkout(self, pool, waited):
+        in_use, overflow = pool.checkedout(), pool.overflow()
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+            self.peak_in_use = max(self.peak_in_use, in_use)
+            if overflow > 0 and in_use > pool.size():
+                self.overflow_checkouts += 1
+            if waited >= self.slow_checkout:
+                self.slow_checkouts += 1
+        if waited >= self.slow_checkout:
+            logger.warning(
+                f"Waited {waited * 1000:.0f} ms for a database connection "
+                f"({in_use} in use, pool size {pool.size()}, overflow {max(overflow, 0)})"
+            )
+
+    def record_timeout(self, pool):
+        with self._lock:
+            self.timeouts += 1
+        logger.error(f"Timed out waiting for a database connection ({pool.checkedout()} in use, pool size {pool.size()})")
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "wait_seconds": self.wait_seconds,
+                "max_wait_seconds": self.max_wait_seconds,
+                "slow_checkouts": self.slow_checkouts,
+                "timeouts": self.timeouts,
+                "overflow_checkouts": self.overflow_checkouts,
+                "peak_in_use": self.peak_in_use,
+            }
+
+
+class MonitoredQueuePool(QueuePool):
+    """
+    A QueuePool that times every checkout, including connecting and pre-ping.
+
+    Checkouts slower than its stats' slow_checkout are logged as warnings and
+    pool timeouts as errors.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.stats.record_timeout(self)
+            raise
+        self.stats.record_checkout(self, time.perf_counter() - started)
+        return connection
+
+    def recreate(self):
+        # Engine.dispose() swaps in a new pool, the counters carry over
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def status_dict(self):
+        """Return the pool's current occupancy and its checkout counters."""
+        return {
+            "size": self.size(),
+            "in_use": self.checkedout(),
+            "idle": self.checkedin(),
+            "overflow": max(self.overflow(), 0),
+            "max_overflow": self._max_overflow,
+            "timeout": self._timeout,
+            **self.stats.to_dict(),
+        }
+
+
+def pool_status(engines):
+    """
+    Return the status of every monitored pool.
+
+    Args:
+        engines (dict): Engines by bind key, as in db.engines.
+
+    Returns:
+        dict: Pool status by bind name, "default" for the main database.
+    """
+    return {
+        bind or "default": engine.pool.status_dict()
+        for bind, engine in engines.items()
+        if isinstance(engine.pool, MonitoredQueuePool)
+    }
+
+
+def configure_pools(app):
+    """Apply the app's slow checkout threshold to its monitored pools."""
+    with app.app_context():
+        for engine in app.extensions["sqlalchemy"].engines.values():
+            if isinstance(engine.pool, MonitoredQueuePool):
+                engine.pool.stats.slow_checkout = app.config["DATABASE_POOL_SLOW_CHECKOUT_MS"] / 1000
+
+
+def pool_metrics():
+    """Metrics collector reporting the occupancy and checkout waits of every pool."""
+    pools = pool_status(current_app.extensions["sqlalchemy"].engines)
+
+    def samples(field):
+        return [({"bind": bind}, status[field]) for bind, status in pools.items()]
+
+    return [
+        ("db_pool_size", "gauge", "Connections kept open by the pool.", samples("size")),
+        ("db_pool_in_use", "gauge", "Connections checked out.", samples("in_use")),
+        ("db_pool_overflow", "gauge", "Connections open beyond the pool size.", samples("overflow")),
+        ("db_pool_checkouts_total", "counter", "Connection checkouts.", samples("checkouts")),
+        ("db_pool_wait_seconds_total", "counter", "Time spent waiting for a connection.", samples("wait_seconds")),
+        ("db_pool_timeouts_total", "counter", "Checkouts that timed out.", samples("timeouts")),
+        ("db_pool_overflow_checkouts_total", "counter", "Checkouts served by an overflow connection.", samples("overflow_checkouts")),
+    ]
@@ -0,0 +1,135 @@
+import contextlib
+import itertools
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+def replica_binds(config):
+    """
+    Return SQLALCHEMY_BINDS entries for the DATABASE_REPLICA_URIS.
+
+    Replicas are ordinary binds named replica_0, replica_1, ... that no model
+    is mapped to; RoutingSession picks them for reads. They share the
+    primary's engine options.
+    """
+    return {f"replica_{n}": uri for n, uri in enumerate(config["DATABASE_REPLICA_URIS"])}
+
+
+class RoutingSession(Session):
+    """
+    A session that sends the reads of read-only requests to a replica.
+
+    The primary is used outside requests, for requests other than GET, HEAD
+    and OPTIONS, for DML and locking selects, once the session has pending
+    changes or has written anything during the request, inside
+    ReplicaRouter.primary() and for callers pinned by a recent write, see
+    ReplicaRouter.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        engines = self._db.engines
+        if bind is not None or engine is not engines.get(None) or not has_request_context():
+            return engine
+
+        if clause is not None and (getattr(clause, "is_dml", False) or getattr(clause, "_for_update_arg", None) is not None):
+            g.db_wrote = True
+            return engine
+        if self._flushing or not self._is_clean():
+            return engine
+
+        if g.get("db_primary"):
+            return engine
+        replica = current_app.extensions["db_router"].replica_for_request(engines)
+        return engine if replica is None else replica
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _record_write(session, flush_context):
+    if has_request_context():
+        g.db_wrote = True
+
+
+class ReplicaRouter:
+    """
+    Decides per request whether reads may go to a replica.
+
+    Replication lag means a caller could read an older state right after
+    their own write, e.g. miss an appointment they just booked. So a request
+    that wrote pins its caller's reads to the primary for
+    DATABASE_REPLICA_PIN_SECONDS. Pins are kept in the shared cache, so they
+    hold across worker processes.
+    """
+
+    def __init__(self, app=None, cache=None):
+        self.app = None
+        self.cache = cache
+        self._next = itertools.count()
+        if app is not None:
+            self.init_app(app, cache)
+
+    def init_app(self, app, cache):
+        self.app = app
+        self.cache = cache
+        app.extensions["db_router"] = self
+        app.before_request(self._reset)
+        app.after_request(self._pin_writer)
+
+    def set_caller(self, identity):
+        """Record the authenticated caller of the current request."""
+        if has_request_context():
+            g.db_caller = identity
+
+    @contextlib.contextmanager
+    def primary(self):
+        """Send the reads of the current request to the primary within the block."""
+        if not has_request_context():
+            yield
+            return
+        previous = g.get("db_primary", False)
+        g.db_primary = True
+        try:
+            yield
+        finally:
+            g.db_primary = previous
+
+    def _pin_key(self, identity):
+        return f"db-pin:{identity}"
+
+    def is_pinned(self, identity):
+        return bool(self.cache.get(self._pin_key(identity)))
+
+    def replica_for_request(self, engines):
+        """
+        Return the replica engine this request reads from, or None for the primary.
+
+        The choice is made once per request and kept, so a request never
+        mixes the states of two replicas.
+        """
+        if "db_replica" not in g:
+            g.db_replica = None
+            replicas = [engine for key, engine in engines.items() if key and key.startswith("replica_")]
+            caller = g.get("db_caller")
+            if replicas and request.method in READ_METHODS and not (caller and self.is_pinned(caller)):
+                # Round robin across requests
+                g.db_replica = replicas[next(self._next) % len(replicas)]
+        if g.get("db_wrote"):
+            return None
+        return g.db_replica
+
+    def _reset(self):
+        # g outlives a request when an app context was already pushed, as in tests
+        for name in ("db_caller", "db_primary", "db_replica", "db_wrote"):
+            g.pop(name, None)
+
+    def _pin_writer(self, response):
+        caller = g.get("db_caller")
+        if g.get("db_wrote") and caller and response.status_code < 400:
+            self.cache.set(self._pin_key(caller), 1, timeout=current_app.config["DATABASE_REPLICA_PIN_SECONDS"])
+        return response
+
+
+db_router = ReplicaRouter()
@@ -0,0 +1,123 @@
+import gzip
+import hashlib
+import json
+from flask import request, Response
+
+try:
+    import brotli
+except ImportError:  # Responses fall back to gzip
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {"application/json", "application/x-ndjson", "text/csv", "text/plain", "text/html"}
+
+# A compressed representation needs its own strong ETag, derived from the
+# identity one by suffix, so the same validator still matches on revalidation.
+ENCODING_SUFFIXES = {"br": "-br", "gzip": "-gzip"}
+
+
+def _matches(etag):
+    candidates = {etag} | {etag + suffix for suffix in ENCODING_SUFFIXES.values()}
+    return any(candidate in request.if_none_match for candidate in candidates)
+
+
+def content_etag(value):
+    """
+    Return a strong ETag of a JSON serializable value.
+
+    Meant to be computed once when a read model is built and cached with
+    it, so that not_modified() can answer revalidations from the cache.
+    """
+    return hashlib.sha1(json.dumps(value, sort_keys=True).encode()).hexdigest()
+
+
+def not_modified(etag):
+    """
+    Return a 304 response if the client already holds the representation with etag.
+
+    Lets handlers that know their ETag up front, e.g. from a cached read
+    model, answer a revalidation without building or serializing the body.
+
+    Returns:
+        Response: The 304 response, or None when the body must be sent.
+    """
+    if request.method in ("GET", "HEAD") and _matches(etag):
+        return Response(status=304, headers={"ETag": f'"{etag}"'})
+    return None
+
+
+class ResponseLayer:
+    """
+    Adds ETags, conditional GET and compression to every API response.
+
+    - GET responses without an ETag get a strong one hashed from the body,
+      and answer a matching If-None-Match with 304.
+    - Bodies of at least COMPRESS_MIN_BYTES are compressed with brotli when
+      it is installed and accepted, else gzip.
+
+    Streamed responses (exports) and files (images) are left alone.
+
+    Hashing the body means it was built and serialized first, so for most
+    endpoints a 304 saves bytes on the wire but not CPU. Endpoints serving
+    cached read models (the doctor directory, details and availability)
+    keep an ETag with the model and call not_modified() before building
+    the response instead.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.after_request(self.process_response)
+        app.extensions["response_layer"] = self
+
+    def process_response(self, response):
+        if response.direct_passthrough or response.is_streamed:
+            return response
+        if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+            return response
+
+        if request.method in ("GET", "HEAD") and response.status_code == 200:
+            etag, _ = response.get_etag()
+            if etag is None:
+                etag = hashlib.sha256(response.get_data()).hexdigest()[:32]
+                response.set_etag(etag)
+            if "Cache-Control" not in response.headers:
+                # Authenticated data: clients may store it but must revalidate
+                response.headers["Cache-Control"] = "private, no-cache"
+            if _matches(etag):
+                response.status_code = 304
+                response.set_data(b"")
+                return response
+
+        return self.compress(response)
+
+    def compress(self, response):
+        config = self.app.config
+        if response.status_code < 200 or response.status_code in (204, 304):
+            return response
+        if "Content-Encoding" in response.headers or response.content_length < config["COMPRESS_MIN_BYTES"]:
+            return response
+
+        response.vary.add("Accept-Encoding")
+        accepted = request.accept_encodings
+        if brotli is not None and accepted["br"]:
+            encoding = "br"
+            body = brotli.compress(response.get_data(), quality=config["COMPRESS_BROTLI_QUALITY"])
+        elif accepted["gzip"]:
+            encoding = "gzip"
+            body = gzip.compress(response.get_data(), compresslevel=config["COMPRESS_GZIP_LEVEL"])
+        else:
+            return response
+
+        response.set_data(body)
+        response.headers["Content-Encoding"] = encoding
+        etag, weak = response.get_etag()
+        if etag is not None:
+            response.set_etag(etag + ENCODING_SUFFIXES[encoding], weak)
+        return response
+
+
+response_layer = ResponseLayer()
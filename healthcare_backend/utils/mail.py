@@ -1,23 +1,64 @@
-
-from flask_mail import Message, Mail
 from flask import current_app
 
-mail = Mail()
+
+def get_mail():
+    """
+    Return the app's Flask-Mail state, setting Flask-Mail up on first use.
+
+    Most processes never send mail themselves, the email dispatcher does,
+    so Flask-Mail is not imported when the app is created.
+    """
+    state = current_app.extensions.get("mail")
+    if state is None:
+        from flask_mail import Mail
+        state = Mail().init_app(current_app)
+    return state
+
+
+def build_message(subject, recipient, body):
+    """Build a message using the configured default sender."""
+    from flask_mail import Message
+    return Message(
+        subject=subject,
+        recipients=[recipient],
+        body=body,
+        sender=current_app.config["MAIL_DEFAULT_SENDER"]
+    )
+
 
 def send_email(subject, recipient, body):
     """Send an email to a user."""
     if not recipient:
-        return False 
+        return False
 
     try:
-        msg = Message(
-            subject=subject,
-            recipients=[recipient],
-            body=body,
-            sender=current_app.config["MAIL_DEFAULT_SENDER"]
-        )
-        mail.send(msg)
+        get_mail().send(build_message(subject, recipient, body))
         return True
     except Exception as e:
         print(f"Email sending failed: {e}")
         return False
+
+
+def send_batch(emails):
+    """
+    Send several emails over a single SMTP connection.
+
+    Args:
+        emails (list): (subject, recipient, body) tuples.
+
+    Returns:
+        list: One entry per email, None when it was sent or the error message.
+    """
+    results = []
+    try:
+        with get_mail().connect() as connection:
+            for subject, recipient, body in emails:
+                try:
+                    connection.send(build_message(subject, recipient, body))
+                    results.append(None)
+                except Exception as e:
+                    results.append(str(e))
+    except Exception as e:
+        # The connection itself failed: everything not yet sent failed with it.
+        results.extend([str(e)] * (len(emails) - len(results)))
+    return results
@@ -0,0 +1,347 @@
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Statements run outside a request, e.g. by the email dispatcher or a CLI command
+BACKGROUND = "(background)"
+
+# Label of the process a per-process collector's sample comes from
+WORKER_LABEL = "worker"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """A monotonically increasing value per label set."""
+
+    type = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+
+    def inc(self, label_values, amount=1):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        for label_values, value in sorted(self._values.items()):
+            yield self.name, tuple(zip(self.labels, label_values)), value
+
+
+class Histogram:
+    """Observations counted into cumulative buckets per label set."""
+
+    type = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._values = {}
+
+    def observe(self, label_values, value):
+        series = self._values.get(label_values)
+        if series is None:
+            # One count per bucket plus +Inf, then the sum
+            series = self._values[label_values] = [0] * (len(self.buckets) + 1) + [0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def samples(self):
+        for label_values, series in sorted(self._values.items()):
+            labels = tuple(zip(self.labels, label_values))
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                cumulative += count
+                le = bound if bound == "+Inf" else _format_value(float(bound))
+                yield self.name + "_bucket", labels + (("le", le),), cumulative
+            yield self.name + "_sum", labels, series[-1]
+            yield self.name + "_count", labels, cumulative
+
+
+class Metrics:
+    """
+    Per endpoint request and SQL metrics, exposed in the Prometheus text format.
+
+    Every request records its latency, status and the number and duration of
+    the SQL statements it ran, labelled with its URL rule. Collectors add
+    values computed at scrape time, such as cache hit ratios.
+
+    Metrics are kept per process. Under a preforking server each scrape
+    reaches one worker, so with METRICS_MULTIPROCESS_DIR set every worker
+    writes its metrics to a snapshot file there, at most
+    METRICS_FLUSH_INTERVAL seconds old, and a scrape adds up the snapshots
+    of every worker that ever ran, so totals stay monotonic across scrapes
+    and worker restarts. Collectors registered as per_process, e.g. pool
+    occupancy, are exported for every live worker with a worker label; see
+    mark_process_dead().
+
+    Statements a streamed response runs after its view returned, such as
+    those of the appointment export, are added to the endpoint's statement
+    totals; the per request statement histogram and the latency only
+    cover the time until the view returned.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._lock = threading.Lock()
+        self._collectors = []
+        self._directory = None
+        self._snapshot = None
+        self._flusher_pid = None
+        self.requests = Counter(
+            "http_requests_total", "Requests handled.", ("endpoint", "method", "status"),
+        )
+        self.latency = Histogram(
+            "http_request_duration_seconds", "Request latency.", ("endpoint", "method"),
+        )
+        self.statements_per_request = Histogram(
+            "http_request_db_statements", "SQL statements run per request.", ("endpoint",), STATEMENT_BUCKETS,
+        )
+        self.statements = Counter(
+            "db_statements_total", "SQL statements run.", ("endpoint",),
+        )
+        self.statement_seconds = Counter(
+            "db_statement_duration_seconds_total", "Time spent running SQL statements.", ("endpoint",),
+        )
+        self._metrics = [self.requests, self.latency, self.statements_per_request, self.statements, self.statement_seconds]
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions["metrics"] = self
+        if not app.config["METRICS_ENABLED"]:
+            return
+        self._directory = app.config["METRICS_MULTIPROCESS_DIR"]
+        self._snapshot = self._flusher_pid = None
+        if self._directory:
+            os.makedirs(self._directory, exist_ok=True)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.add_url_rule(app.config["METRICS_PATH"], "metrics", self.export)
+        if not event.contains(Engine, "before_cursor_execute", self._before_cursor_execute):
+            event.listen(Engine, "before_cursor_execute", self._before_cursor_execute)
+            event.listen(Engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def register_collector(self, collector, per_process=False):
+        """
+        Add a callable run at every scrape.
+
+        It returns (name, type, help, samples) tuples, samples being
+        (labels dict, value) pairs. A per_process collector reports on the
+        process it runs in, e.g. its connection pools; with several
+        workers it runs in each of them, in an app context, when their
+        snapshot is written.
+        """
+        if collector not in (registered for registered, _ in self._collectors):
+            self._collectors.append((collector, per_process))
+
+    def _start_request(self):
+        g.pop("metrics_endpoint", None)
+        g.metrics_started = time.perf_counter()
+        g.metrics_statements = 0
+        g.metrics_statement_seconds = 0.0
+
+    def _finish_request(self, response):
+        self._ensure_flusher()
+        started = g.pop("metrics_started", None)
+        if started is None:
+            return response
+        endpoint = request.url_rule.rule if request.url_rule is not None else "(unmatched)"
+        # For the statements of a streamed body, run after this
+        g.metrics_endpoint = endpoint
+        elapsed = time.perf_counter() - started
+        statements, statement_seconds = g.metrics_statements, g.metrics_statement_seconds
+        with self._lock:
+            self.requests.inc((endpoint, request.method, str(response.status_code)))
+            self.latency.observe((endpoint, request.method), elapsed)
+            self.statements_per_request.observe((endpoint,), statements)
+            self.statements.inc((endpoint,), statements)
+            self.statement_seconds.inc((endpoint,), statement_seconds)
+        return response
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["metrics_started"].pop()
+        endpoint = BACKGROUND
+        if has_request_context():
+            if "metrics_started" in g:
+                g.metrics_statements += 1
+                g.metrics_statement_seconds += elapsed
+                return
+            endpoint = g.get("metrics_endpoint", BACKGROUND)
+        with self._lock:
+            self.statements.inc((endpoint,))
+            self.statement_seconds.inc((endpoint,), elapsed)
+
+    def _ensure_flusher(self):
+        # Started in each worker on its first request, threads do not survive a fork
+        if not self._directory or self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            if self._flusher_pid is not None:
+                # Forked from a process with a snapshot of its own, which already holds these counts
+                for metric in self._metrics:
+                    metric._values.clear()
+            self._snapshot = os.path.join(self._directory, f"{os.getpid()}-{uuid.uuid4().hex[:8]}.json")
+            self._flusher_pid = os.getpid()
+        interval = self.app.config["METRICS_FLUSH_INTERVAL"]
+
+        def flush():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.write_snapshot()
+                except Exception:
+                    logger.exception("Could not write the metrics snapshot")
+
+        threading.Thread(target=flush, name="metrics-flusher", daemon=True).start()
+
+    def _collect(self, per_process):
+        collected = []
+        for collector, collector_per_process in self._collectors:
+            if collector_per_process != per_process:
+                continue
+            try:
+                collected.extend(collector())
+            except Exception:
+                logger.exception(f"Metrics collector {collector.__name__} failed")
+        return collected
+
+    def write_snapshot(self):
+        """Write this process's metrics to its file in METRICS_MULTIPROCESS_DIR."""
+        if self._snapshot is None:
+            return
+        with self.app.app_context():
+            collected = self._collect(per_process=True)
+        with self._lock:
+            values = {metric.name: [[list(key), value] for key, value in metric._values.items()] for metric in self._metrics}
+        snapshot = {"pid": os.getpid(), "metrics": values, "collected": collected}
+        # Replaced in one step, so a scrape never reads half a file
+        partial = self._snapshot + ".tmp"
+        with open(partial, "w") as output:
+            json.dump(snapshot, output)
+        os.replace(partial, self._snapshot)
+
+    def _snapshots(self):
+        snapshots = []
+        for path in glob.glob(os.path.join(self._directory, "*.json")):
+            try:
+                with open(path) as snapshot:
+                    snapshots.append(json.load(snapshot))
+            except (OSError, ValueError):
+                logger.warning(f"Skipping unreadable metrics snapshot {path}")
+        return snapshots
+
+    def _aggregate(self, snapshots):
+        """Return copies of the metrics with the values of every snapshot added up."""
+        totals = []
+        for metric in self._metrics:
+            total = Counter(metric.name, metric.help, metric.labels) if metric.type == "counter" else Histogram(
+                metric.name, metric.help, metric.labels, metric.buckets,
+            )
+            for snapshot in snapshots:
+                for key, value in snapshot["metrics"].get(metric.name, ()):
+                    key = tuple(key)
+                    if metric.type == "counter":
+                        total._values[key] = total._values.get(key, 0) + value
+                    else:
+                        series = total._values.setdefault(key, [0] * len(value))
+                        total._values[key] = [a + b for a, b in zip(series, value)]
+            totals.append(total)
+        return totals
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format."""
+        lines = []
+
+        def write(name, type, help, samples):
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {type}")
+            for sample_name, labels, value in samples:
+                lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+
+        def write_collected(collected, extra_labels=()):
+            for name, type, help, samples in collected:
+                write(name, type, help, [(name, tuple(labels.items()) + extra_labels, value) for labels, value in samples])
+
+        self._ensure_flusher()
+        if self._snapshot is not None:
+            self.write_snapshot()
+            snapshots = self._snapshots()
+            for metric in self._aggregate(snapshots):
+                write(metric.name, metric.type, metric.help, list(metric.samples()))
+            # Grouped by name, the exposition format wants one block per metric
+            per_worker = {}
+            for snapshot in snapshots:
+                for name, type, help, samples in snapshot.get("collected", ()):
+                    entry = per_worker.setdefault(name, (name, type, help, []))
+                    entry[3].extend(({**labels, WORKER_LABEL: snapshot["pid"]}, value) for labels, value in samples)
+            write_collected(per_worker.values())
+        else:
+            with self._lock:
+                for metric in self._metrics:
+                    write(metric.name, metric.type, metric.help, list(metric.samples()))
+            write_collected(self._collect(per_process=True))
+        write_collected(self._collect(per_process=False))
+        return "\n".join(lines) + "\n"
+
+    def export(self):
+        return Response(
+            self.render(), content_type="text/plain; version=0.0.4; charset=utf-8", headers={"Cache-Control": "no-store"},
+        )
+
+
+def mark_process_dead(directory, pid):
+    """
+    Drop the per-process samples of a worker that exited.
+
+    Its counters stay in the totals, which would otherwise go down. Meant
+    for gunicorn's child_exit hook.
+    """
+    for path in glob.glob(os.path.join(directory, f"{pid}-*.json")):
+        try:
+            with open(path) as snapshot:
+                data = json.load(snapshot)
+            data["collected"] = []
+            with open(path + ".tmp", "w") as output:
+                json.dump(data, output)
+            os.replace(path + ".tmp", path)
+        except (OSError, ValueError):
+            logger.warning(f"Could not mark metrics snapshot {path} dead", exc_info=True)
+
+
+metrics = Metrics()
@@ -0,0 +1,60 @@
+import base64
+import json
+
+
+def encode_cursor(values):
+    """
+    Encode the sort key of the last returned row as an opaque cursor.
+
+    Args:
+        values (list): JSON serializable sort key values.
+
+    Returns:
+        str: A URL safe cursor string.
+    """
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor, types):
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Args:
+        cursor (str): The cursor sent back by the client.
+        types (tuple): The expected type of each sort key value, e.g.
+            (str, str) for a cursor of two strings.
+
+    Returns:
+        list: The sort key values.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+    if not isinstance(values, list) or len(values) != len(types):
+        raise ValueError("Invalid cursor")
+    # A crafted cursor may hold e.g. a number where a UUID string belongs
+    if not all(isinstance(value, type_) for value, type_ in zip(values, types)):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def parse_limit(value, default, maximum):
+    """
+    Parse a page size query parameter.
+
+    Raises:
+        ValueError: If the value is not a positive integer.
+    """
+    if value is None:
+        return default
+    limit = int(value)
+    if limit < 1:
+        raise ValueError("limit must be a positive integer")
+    return min(limit, maximum)
@@ -0,0 +1,39 @@
+from utils.read_cache import RedisInvalidationBus
+
+
+def _engines(app):
+    with app.app_context():
+        return list(app.extensions["sqlalchemy"].engines.values())
+
+
+def before_fork(app):
+    """
+    Quiesce an app created in a preforking server's master process.
+
+    Only the forking thread survives in a child, so the email dispatcher and
+    the cache invalidation listener are stopped rather than left to die
+    holding locks, and pooled connections are closed so no worker shares a
+    socket with another. Safe to call before every fork.
+    """
+    app.extensions["email_dispatcher"].stop()
+    bus = app.extensions.get("cache_invalidation_bus")
+    if isinstance(bus, RedisInvalidationBus):
+        bus.close()
+    for engine in _engines(app):
+        engine.dispose()
+
+
+def after_fork(app):
+    """
+    Restart a preloaded app's background work in a forked worker.
+
+    Any connection still inherited from the master is dropped from the pool
+    without being closed, which would also close it for the master.
+    """
+    for engine in _engines(app):
+        engine.dispose(close=False)
+    bus = app.extensions.get("cache_invalidation_bus")
+    if isinstance(bus, RedisInvalidationBus):
+        bus.listen()
+    if app.config["MAIL_DISPATCHER_AUTOSTART"] and not app.testing:
+        app.extensions["email_dispatcher"].start()
@@ -0,0 +1,274 @@
+import contextlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """
+    A thread-safe, size bounded in-process cache with a time to live.
+
+    Values are returned as stored, so callers must treat them as read-only.
+    """
+
+    def __init__(self, maxsize=1024, ttl=30):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def evict(self, match):
+        """Drop every entry whose key satisfies match(key)."""
+        with self._lock:
+            for key in [key for key in self._entries if match(key)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class LocalInvalidationBus:
+    """
+    In-process stand-in for RedisInvalidationBus.
+
+    Every subscriber receives every message synchronously, which lets tests
+    model several workers inside one process.
+    """
+
+    def __init__(self):
+        self._subscribers = []
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+
+    def publish(self, name, entity_id):
+        for callback in list(self._subscribers):
+            callback(name, entity_id)
+
+    def close(self):
+        self._subscribers.clear()
+
+
+class RedisInvalidationBus:
+    """
+    Broadcasts cache invalidations to every worker through Redis pub/sub.
+
+    A daemon thread listens on the channel and hands each message to the
+    subscribers registered in this process.
+    """
+
+    def __init__(self, client, channel):
+        self.client = client
+        self.channel = channel
+        self._subscribers = []
+        self._pubsub = None
+        self._thread = None
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+        self.listen()
+
+    def listen(self):
+        """Start the listener thread, e.g. again in a forked worker after close()."""
+        if self._thread is None and self._subscribers:
+            self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            self._pubsub.subscribe(**{self.channel: self._handle})
+            self._thread = self._pubsub.run_in_thread(sleep_time=1, daemon=True)
+
+    def _handle(self, message):
+        data = message["data"]
+        name, _, entity_id = (data.decode() if isinstance(data, bytes) else data).partition("\x00")
+        for callback in list(self._subscribers):
+            callback(name, entity_id)
+
+    def publish(self, name, entity_id):
+        try:
+            self.client.publish(self.channel, f"{name}\x00{entity_id}")
+        except Exception:
+            # Other workers fall back to their local TTL
+            logger.exception("Failed to publish cache invalidation")
+
+    def close(self):
+        if self._thread is not None:
+            self._thread.stop()
+            self._pubsub.close()
+            self._thread = None
+
+
+class ReadModelCache:
+    """
+    Caches read models (plain dicts and lists) per entity.
+
+    Keys look like "<name>:v<schema>:<entity_id>:<version>[:<variant>]":
+
+    - schema is bumped in code whenever the cached shape changes, so a
+      deploy never reads entries written by older code;
+    - version is a per-entity counter kept in the backend, bumped by
+      invalidate(), which retires every variant of the entity at once.
+
+    An optional in-process LRUCache can sit in front of the backend. Local
+    entries skip the backend round trip entirely and are kept coherent
+    across workers by broadcasting invalidations on a bus; their TTL bounds
+    staleness should a message be lost.
+
+    Loaders run inside load_context(), e.g. to read from the primary
+    database: an entry filled from a lagging replica would be served
+    until it expires.
+
+    Hit and miss counts are kept per process.
+    """
+
+    def __init__(self, backend, name, schema=1, timeout=300, load_context=contextlib.nullcontext):
+        self.backend = backend
+        self.name = name
+        self.schema = schema
+        self.timeout = timeout
+        self.load_context = load_context
+        self.local = None
+        self.bus = None
+        self.hits = 0
+        self.misses = 0
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def use_local_cache(self, local, bus):
+        """
+        Put an in-process cache in front of the backend.
+
+        Args:
+            local (LRUCache): The per-process cache, or None to disable it.
+            bus: A RedisInvalidationBus or LocalInvalidationBus shared by
+                every worker.
+        """
+        self.local = local
+        self.bus = bus
+        if bus is not None:
+            bus.subscribe(self._on_invalidation)
+
+    def _on_invalidation(self, name, entity_id):
+        if name == self.name:
+            self._evict_local(entity_id)
+
+    def _evict_local(self, entity_id):
+        if self.local is not None:
+            with self._lock:
+                self._generation += 1
+            self.local.evict(lambda key: key[0] == entity_id)
+
+    def _version_key(self, entity_id):
+        return f"{self.name}:version:{entity_id}"
+
+    def _key(self, entity_id, version, variant):
+        key = f"{self.name}:v{self.schema}:{entity_id}:{version}"
+        return f"{key}:{variant}" if variant is not None else key
+
+    def get_or_set(self, entity_id, loader, variant=None):
+        """
+        Return the cached read model for an entity, loading it on a miss.
+
+        Args:
+            entity_id: The entity the read model belongs to.
+            loader (callable): Builds the read model. A None result is
+                returned without being cached.
+            variant (str, optional): Distinguishes several read models of
+                the same entity, such as different date ranges.
+        """
+        local = self.local
+        if local is not None:
+            local_key = (str(entity_id), variant)
+            value = local.get(local_key)
+            if value is not None:
+                self._count(hit=True)
+                return value
+            generation = self._generation
+
+        version = self.backend.get(self._version_key(entity_id)) or 0
+        key = self._key(entity_id, version, variant)
+
+        value = self.backend.get(key)
+        if value is not None:
+            self._count(hit=True)
+        else:
+            self._count(hit=False)
+            with self.load_context():
+                value = loader()
+            if value is None:
+                return None
+            self.backend.set(key, value, timeout=self.timeout)
+
+        # Skip the local store if an invalidation arrived while loading
+        if local is not None and generation == self._generation:
+            local.set(local_key, value)
+        return value
+
+    def invalidate(self, entity_id):
+        """Retire every cached read model of an entity, in every worker."""
+        version_key = self._version_key(entity_id)
+        # Flask-Caching does not pass inc through, so go to the cachelib
+        # backend. On Redis inc is an atomic INCR, so concurrent
+        # invalidations each get a version of their own. Versions never
+        # expire, otherwise an old version number could be reused.
+        client = getattr(self.backend, "cache", self.backend)
+        client.add(version_key, 0, timeout=0)
+        client.inc(version_key)
+        self._evict_local(str(entity_id))
+        if self.bus is not None:
+            self.bus.publish(self.name, str(entity_id))
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self):
+        """Return the hit and miss counts and the hit ratio."""
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        stats = {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / total if total else 0.0,
+        }
+        if self.local is not None:
+            stats["local"] = self.local.stats()
+        return stats
@@ -0,0 +1,79 @@
+from operator import attrgetter
+from flask import current_app, make_response
+from flask_restx.representations import output_json as stdlib_output_json
+
+try:
+    import orjson
+except ImportError:  # Responses fall back to the stdlib json encoder
+    orjson = None
+
+
+def iso_date(value):
+    """Format a date as YYYY-MM-DD."""
+    return value.isoformat()
+
+
+def hours_minutes(value):
+    """Format a time as HH:MM."""
+    return value.isoformat("minutes")
+
+
+def _getter(attribute, convert):
+    if attribute is None:
+        return convert or (lambda obj: obj)
+    get = attrgetter(attribute)
+    if convert is None:
+        return get
+    return lambda obj: convert(get(obj))
+
+
+class Serializer:
+    """
+    Turns model instances into response dicts.
+
+    Fields are given as key=attribute or key=(attribute, convert), where
+    convert turns the attribute value into a JSON value. An attribute of
+    None passes the instance itself to convert. Each field gets its getter
+    when the serializer is declared, so serializing does no lookups by name.
+
+    Example:
+        Serializer(id=("patient_id", str), email="email")
+    """
+
+    def __init__(self, **fields):
+        self.fields = {key: spec if isinstance(spec, tuple) else (spec, None) for key, spec in fields.items()}
+        getters = tuple((key, _getter(attribute, convert)) for key, (attribute, convert) in self.fields.items())
+
+        def one(obj):
+            """Serialize one instance."""
+            return {key: get(obj) for key, get in getters}
+
+        self.one = one
+
+    def many(self, objs):
+        """Serialize an iterable of instances into a list."""
+        return list(map(self.one, objs))
+
+    def extend(self, **fields):
+        """Return a serializer with this one's fields followed by fields."""
+        return Serializer(**self.fields, **fields)
+
+
+def output_json(data, code, headers=None):
+    """
+    Render an API response body as JSON with orjson.
+
+    Registered on the Api in place of the stdlib based representation. Falls
+    back to it when orjson is not installed, ORJSON_ENABLED is off, or the
+    app is in debug mode where responses are pretty printed.
+    """
+    if orjson is None or not current_app.config["ORJSON_ENABLED"] or current_app.debug:
+        return stdlib_output_json(data, code, headers)
+    try:
+        body = orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE)
+    except TypeError:
+        # A value orjson has no encoding for, e.g. a Decimal
+        return stdlib_output_json(data, code, headers)
+    response = make_response(body, code)
+    response.headers.extend(headers or {})
+    return response
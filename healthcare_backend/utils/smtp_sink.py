@@ -0,0 +1,120 @@
+"""
+A local stand-in SMTP server that accepts every message and keeps it in memory.
+
+Used by the test suite and handy for local development:
+
+    python -m utils.smtp_sink --port 1025
+"""
+import argparse
+import socketserver
+import threading
+from email import message_from_bytes
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        sink = self.server.sink
+        mail_from, rcpt_tos = None, []
+        self.reply("220 smtp-sink ready")
+
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors="replace").strip()
+            verb = command[:4].upper()
+
+            if verb in ("HELO", "EHLO"):
+                self.reply("250 smtp-sink")
+            elif verb == "MAIL":
+                mail_from, rcpt_tos = command.split(":", 1)[1].strip(), []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                rcpt_tos.append(command.split(":", 1)[1].strip())
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                for data_line in iter(self.rfile.readline, b""):
+                    if data_line in (b".\r\n", b".\n"):
+                        break
+                    data.append(data_line[1:] if data_line.startswith(b"..") else data_line)
+                sink.record(mail_from, rcpt_tos, b"".join(data))
+                self.reply("250 OK queued")
+            elif verb == "RSET":
+                mail_from, rcpt_tos = None, []
+                self.reply("250 OK")
+            elif verb == "NOOP":
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                sink.connections += 1
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class SMTPSink:
+    """
+    In-memory SMTP server running on a background thread.
+
+    Attributes:
+        messages (list): Received messages as email.message.Message objects.
+        connections (int): Number of SMTP sessions that ended with QUIT.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.messages = []
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._server = socketserver.ThreadingTCPServer((host, port), _SMTPHandler)
+        self._server.daemon_threads = True
+        self._server.sink = self
+        self._thread = None
+
+    @property
+    def host(self):
+        return self._server.server_address[0]
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def record(self, mail_from, rcpt_tos, data):
+        message = message_from_bytes(data)
+        message.envelope_from = mail_from
+        message.envelope_to = rcpt_tos
+        with self._lock:
+            self.messages.append(message)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local SMTP sink.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1025)
+    args = parser.parse_args()
+
+    sink = SMTPSink(args.host, args.port)
+    print(f"SMTP sink listening on {sink.host}:{sink.port}")
+    try:
+        sink._server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"Received {len(sink.messages)} message(s).")